@@ -0,0 +1,212 @@
+"""
+Accessible Names
+Computes the names assistive technology announces for elements, once per element
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+# String types get_text() returns; comments, script, style and template
+# strings are never part of a name
+TEXT_TYPES = (NavigableString, CData)
+
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.I)
+
+# Elements and roles named from their content when they are the element
+# being named; other elements only contribute content to an ancestor's name
+NAME_FROM_CONTENT_TAGS = frozenset({
+    "a", "button", "summary", "option", "caption", "legend", "td", "th",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+})
+NAME_FROM_CONTENT_ROLES = frozenset({
+    "button", "link", "heading", "menuitem", "menuitemcheckbox", "menuitemradio", "tab",
+    "option", "checkbox", "radio", "switch", "treeitem", "cell", "gridcell",
+    "columnheader", "rowheader", "tooltip",
+})
+
+# Form controls named by their <label> elements
+LABELABLE_TAGS = frozenset({"input", "select", "textarea"})
+
+# <input> types that are buttons, with the name browsers give them without a value
+BUTTON_INPUT_DEFAULTS = {"submit": "Submit", "reset": "Reset", "button": ""}
+
+# <input> types whose value is their text, read when embedded in another name
+TEXTBOX_INPUT_TYPES = frozenset({"", "text", "search", "email", "tel", "url", "number"})
+
+
+def _collapse(text: str) -> str:
+    return " ".join(text.split())
+
+
+def is_hidden(tag: Tag) -> bool:
+    """Whether an element is excluded from the accessibility tree by its own markup"""
+    return (
+        tag.get("aria-hidden", "").lower() == "true"
+        or tag.has_attr("hidden")
+        or tag.name == "template"
+        or (tag.name == "input" and tag.get("type", "").lower() == "hidden")
+        or HIDDEN_STYLE.search(tag.get("style", "")) is not None
+    )
+
+
+class AccessibleNames:
+    """
+    Accessible names and text of one document, computed once per element
+
+    Follows the steps of the W3C accname algorithm that markup alone
+    decides: aria-labelledby (resolved by id), aria-label, <label> for
+    form controls, alt and button values, content (with embedded control
+    values and child image alt text, skipping hidden descendants) and
+    finally the title attribute. Placeholders are not names. CSS is not
+    evaluated, so only inline display:none and visibility:hidden hide
+    content, and adjacent inline text is joined without spaces like
+    get_text().
+
+    One instance is shared by every check of a request, so an element's
+    name is computed once however many checks read it.
+    """
+
+    def __init__(self, soup: BeautifulSoup):
+        self.soup = soup
+        self._names: Dict[int, str] = {}
+        self._texts: Dict[int, str] = {}
+        self._ids: Optional[Dict[str, Tag]] = None
+        self._labels: Dict[str, List[Tag]] = defaultdict(list)
+
+    def index(self) -> None:
+        """
+        Index elements by id and labels by their for attribute
+
+        Done on first use; call it before detaching parts of the document
+        so references into them still resolve.
+        """
+        if self._ids is not None:
+            return
+        self._ids = {}
+        for tag in self.soup.find_all(id=True):
+            self._ids.setdefault(tag["id"], tag)
+        for label in self.soup.find_all("label", attrs={"for": True}):
+            self._labels[label["for"]].append(label)
+
+    def element_by_id(self, element_id: str) -> Optional[Tag]:
+        self.index()
+        return self._ids.get(element_id)
+
+    def name(self, tag: Tag) -> str:
+        """Accessible name of an element, with whitespace collapsed"""
+        key = id(tag)
+        name = self._names.get(key)
+        if name is None:
+            name = self._names[key] = _collapse(self._compute(tag, tag, {key}, False))
+        return name
+
+    def text(self, tag: Tag) -> str:
+        """Text content of an element, with whitespace collapsed"""
+        key = id(tag)
+        text = self._texts.get(key)
+        if text is None:
+            text = self._texts[key] = _collapse(tag.get_text())
+        return text
+
+    def _labels_of(self, tag: Tag) -> List[Tag]:
+        self.index()
+        labels = list(self._labels.get(tag.get("id"), ())) if tag.get("id") else []
+        wrapping = tag.find_parent("label")
+        if wrapping is not None and all(label is not wrapping for label in labels):
+            labels.append(wrapping)
+        return labels
+
+    def _compute(self, tag: Tag, root: Tag, visited: Set[int], referenced: bool = False,
+                 direct: bool = False) -> str:
+        """
+        One recursion of the accname algorithm
+
+        root is the element being named. referenced is true inside an
+        aria-labelledby target or label, where aria-labelledby is no longer
+        followed; direct is true for the target itself, which is read even
+        if hidden.
+        """
+        is_root = tag is root
+        if not is_root and not direct and is_hidden(tag):
+            return ""
+
+        if not referenced:
+            parts = []
+            for element_id in tag.get("aria-labelledby", "").split():
+                target = self.element_by_id(element_id)
+                if target is not None and id(target) not in visited:
+                    visited.add(id(target))
+                    parts.append(self._compute(target, root, visited, True, True))
+            if any(part.strip() for part in parts):
+                return " ".join(parts)
+
+        aria_label = tag.get("aria-label", "").strip()
+        if aria_label:
+            return aria_label
+
+        name = tag.name
+        input_type = tag.get("type", "").lower() if name == "input" else None
+
+        # A control inside another element's name contributes its value
+        if not is_root and name in LABELABLE_TAGS:
+            return self._control_value(tag, input_type) or tag.get("title", "")
+
+        if input_type in BUTTON_INPUT_DEFAULTS:
+            value = tag.get("value", "").strip()
+            return value or BUTTON_INPUT_DEFAULTS[input_type] or tag.get("title", "")
+
+        if is_root and name in LABELABLE_TAGS:
+            labels = [
+                self._compute(label, root, visited | {id(label)}, True, True)
+                for label in self._labels_of(tag) if id(label) not in visited
+            ]
+            if any(label.strip() for label in labels):
+                return " ".join(labels)
+
+        if name == "img" or input_type == "image":
+            alt = tag.get("alt", "").strip()
+            if alt:
+                return alt
+
+        if (not is_root or name in NAME_FROM_CONTENT_TAGS
+                or tag.get("role", "").lower() in NAME_FROM_CONTENT_ROLES):
+            parts = []
+            for child in tag.children:
+                if type(child) in TEXT_TYPES:
+                    parts.append(child)
+                elif isinstance(child, Tag) and child is not root:
+                    if child.name == "br":
+                        parts.append(" ")
+                        continue
+                    part = self._compute(child, root, visited, referenced)
+                    # Names from attributes are separate words from the text around them
+                    if part and (child.name in LABELABLE_TAGS or child.name == "img"
+                                 or child.get("aria-label", "").strip()):
+                        part = f" {part} "
+                    parts.append(part)
+            content = "".join(parts)
+            if content.strip():
+                return content
+
+        return tag.get("title", "")
+
+    @staticmethod
+    def _control_value(tag: Tag, input_type: Optional[str]) -> str:
+        """Value of a form control embedded in a label or other name"""
+        if tag.name == "textarea":
+            return tag.get_text()
+        if tag.name == "select":
+            options = tag.find_all("option")
+            chosen = next((option for option in options if option.has_attr("selected")),
+                          options[0] if options else None)
+            return chosen.get_text() if chosen is not None else ""
+        if input_type in TEXTBOX_INPUT_TYPES or input_type == "range":
+            return tag.get("value", "")
+        if input_type in BUTTON_INPUT_DEFAULTS:
+            return tag.get("value", "") or BUTTON_INPUT_DEFAULTS[input_type]
+        if input_type == "image":
+            return tag.get("alt", "")
+        return ""
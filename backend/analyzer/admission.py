@@ -0,0 +1,242 @@
+"""
+Admission Control
+Limits concurrent analyses and estimated memory in flight, per client and overall
+"""
+
+import asyncio
+import hmac
+import ipaddress
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Mapping, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request could not be admitted within the allowed wait"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ClientIdentifier:
+    """
+    Decide which admission bucket a request belongs to, from what a client can't forge
+
+    A request carrying a configured API key (X-API-Key or a Bearer token)
+    is the client named for that key. Otherwise the client is its IP:
+    the peer address, or, when the peer is a trusted proxy, the nearest
+    untrusted address in X-Forwarded-For. Only a trusted proxy may also
+    put the request in a class (e.g. "dashboard" for the dashboard's own
+    route) with class_header, giving ids like "dashboard:203.0.113.7"
+    whose limit is configured once for the class.
+    """
+
+    def __init__(self, api_keys: Optional[Dict[str, str]] = None, trusted_proxies: str = "",
+                 class_header: str = "X-Client-Class"):
+        self.api_keys = api_keys or {}
+        self.trusted_proxies = [
+            ipaddress.ip_network(entry.strip(), strict=False) for entry in trusted_proxies.split(",") if entry.strip()
+        ]
+        self.class_header = class_header
+
+    @staticmethod
+    def parse_api_keys(spec: str) -> Dict[str, str]:
+        """Parse 'client=key,client=key' into a key -> client dictionary"""
+        keys = {}
+        for entry in spec.split(","):
+            client, sep, key = entry.partition("=")
+            if sep and client.strip() and key.strip():
+                keys[key.strip()] = client.strip()
+        return keys
+
+    def is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def identify(self, headers: Mapping[str, str], peer: Optional[str]) -> str:
+        """The client id for a request's headers and peer address"""
+        client = self._api_client(headers)
+        if client:
+            return client
+
+        address = peer or "unknown"
+        if not self.is_trusted(address):
+            return address
+
+        # Walk the proxy chain from our side; the first hop we don't trust is the client
+        hops: List[str] = [hop.strip() for hop in headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+        while hops and self.is_trusted(address):
+            address = hops.pop()
+        client_class = headers.get(self.class_header, "").strip()
+        return f"{client_class}:{address}" if client_class else address
+
+    def _api_client(self, headers: Mapping[str, str]) -> Optional[str]:
+        if not self.api_keys:
+            return None
+        key = headers.get("X-API-Key", "").strip()
+        authorization = headers.get("Authorization", "")
+        if not key and authorization[:7].lower() == "bearer ":
+            key = authorization[7:].strip()
+        if not key:
+            return None
+        for known, client in self.api_keys.items():
+            if hmac.compare_digest(known.encode(), key.encode()):
+                return client
+        return None
+
+
+class AdmissionTicket:
+    """Reservation held by an admitted request"""
+
+    def __init__(self, controller: "AdmissionController", client_id: str, estimated_bytes: int):
+        self.controller = controller
+        self.client_id = client_id
+        self.estimated_bytes = estimated_bytes
+
+    def resize(self, estimated_bytes: int) -> None:
+        """Replace the memory estimate once the real body size is known"""
+        self.controller._adjust_memory(estimated_bytes - self.estimated_bytes)
+        self.estimated_bytes = estimated_bytes
+
+    async def reserve(self, estimated_bytes: int) -> None:
+        """
+        Replace the memory estimate before a body is read
+
+        A larger estimate waits until it fits; a smaller one wakes waiters.
+
+        Raises:
+            AdmissionRejected: if memory didn't free up within max_wait
+        """
+        await self.controller._reserve(self, estimated_bytes)
+
+
+class AdmissionController:
+    """
+    Gate in front of the analysis pipeline
+
+    A request is admitted when a concurrency slot is free, its estimated
+    memory fits in the global budget and its client is under its own limit.
+    Requests that can't be admitted within max_wait are rejected.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_memory_bytes: int = 256 * 1024 * 1024,
+                 max_wait: float = 2.0, client_default_limit: int = 2,
+                 client_limits: Optional[Dict[str, int]] = None, retry_after: int = 5):
+        self.max_concurrent = max_concurrent
+        self.max_memory_bytes = max_memory_bytes
+        self.max_wait = max_wait
+        self.client_default_limit = client_default_limit
+        self.client_limits = client_limits or {}
+        self.retry_after = retry_after
+
+        self.active = 0
+        self.memory_in_flight = 0
+        self.rejected = 0
+        self._client_active: Dict[str, int] = {}
+        self._condition: Optional[asyncio.Condition] = None
+
+    @staticmethod
+    def parse_client_limits(spec: str) -> Dict[str, int]:
+        """Parse 'client=limit,client=limit' into a dictionary"""
+        limits = {}
+        for entry in spec.split(","):
+            if "=" not in entry:
+                continue
+            client, limit = entry.split("=", 1)
+            limits[client.strip()] = int(limit)
+        return limits
+
+    def client_limit(self, client_id: str) -> int:
+        """The limit for a client id, else for its class (the part before ':'), else the default"""
+        if client_id in self.client_limits:
+            return self.client_limits[client_id]
+        client_class, sep, _ = client_id.partition(":")
+        if sep and client_class in self.client_limits:
+            return self.client_limits[client_class]
+        return self.client_default_limit
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "memory_in_flight": self.memory_in_flight,
+            "rejected": self.rejected
+        }
+
+    def _can_admit(self, client_id: str, estimated_bytes: int) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        if self._client_active.get(client_id, 0) >= self.client_limit(client_id):
+            return False
+        # A single oversized request is still admitted when nothing else runs
+        if self.active and self.memory_in_flight + estimated_bytes > self.max_memory_bytes:
+            return False
+        return True
+
+    def _adjust_memory(self, delta: int) -> None:
+        self.memory_in_flight = max(0, self.memory_in_flight + delta)
+
+    async def _wait(self, ready: Callable[[], bool], deadline: float, client_id: str) -> None:
+        """Wait on the condition (held by the caller) until ready() or the deadline"""
+        while not ready():
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(self._condition.wait(), remaining)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                logger.warning("Admission rejected for client %s", client_id)
+                raise AdmissionRejected("Server is busy, please retry later", self.retry_after)
+
+    async def _reserve(self, ticket: AdmissionTicket, estimated_bytes: int) -> None:
+        extra = estimated_bytes - ticket.estimated_bytes
+        async with self._condition:
+            if extra > 0:
+                # As on admission, a request running alone may go over the budget
+                await self._wait(
+                    lambda: self.active == 1 or self.memory_in_flight + extra <= self.max_memory_bytes,
+                    time.monotonic() + self.max_wait, ticket.client_id
+                )
+            ticket.resize(estimated_bytes)
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def admit(self, client_id: str, estimated_bytes: int) -> AsyncIterator[AdmissionTicket]:
+        """
+        Wait for capacity and hold it for the duration of the block
+
+        Raises:
+            AdmissionRejected: if capacity didn't free up within max_wait
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        deadline = time.monotonic() + self.max_wait
+        async with self._condition:
+            await self._wait(lambda: self._can_admit(client_id, estimated_bytes), deadline, client_id)
+
+            self.active += 1
+            self.memory_in_flight += estimated_bytes
+            self._client_active[client_id] = self._client_active.get(client_id, 0) + 1
+
+        ticket = AdmissionTicket(self, client_id, estimated_bytes)
+        try:
+            yield ticket
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._adjust_memory(-ticket.estimated_bytes)
+                remaining_for_client = self._client_active.get(client_id, 1) - 1
+                if remaining_for_client:
+                    self._client_active[client_id] = remaining_for_client
+                else:
+                    self._client_active.pop(client_id, None)
+                self._condition.notify_all()
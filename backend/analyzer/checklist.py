@@ -6,6 +6,8 @@ Converts analysis results into WCAG checklist format
 from typing import List, Dict, Any
 import logging
 
+from analyzer.results import CheckResult, ChecklistItem
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,7 +57,7 @@ class ChecklistGenerator:
         }
     }
     
-    def generate(self, rule_results: Dict[str, Any], ml_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    def generate(self, rule_results: Dict[str, CheckResult], ml_results: Dict[str, Any]) -> List[ChecklistItem]:
         """
         Generate checklist from analysis results
         
@@ -69,9 +71,9 @@ class ChecklistGenerator:
                 continue
             
             result = rule_results[check_key]
-            total = result.get("total", 0)
-            failed = result.get("failed", 0)
-            passed = result.get("passed", 0)
+            total = result.total
+            failed = result.failed
+            passed = result.passed
             
             # Determine status
             if total == 0:
@@ -87,18 +89,17 @@ class ChecklistGenerator:
             # Generate fix suggestion
             fix = self._generate_fix(check_key, result, ml_results)
             
-            checklist_item = {
-                "check": check_info["check"],
-                "wcag": check_info["wcag"],
-                "description": check_info["description"],
-                "status": status,
-                "severity": severity,
-                "total": total,
-                "passed": passed,
-                "failed": failed,
-                "count": failed,
-                "fix": fix
-            }
+            checklist_item = ChecklistItem(
+                check=check_info["check"],
+                wcag=check_info["wcag"],
+                description=check_info["description"],
+                status=status,
+                severity=severity,
+                total=total,
+                passed=passed,
+                failed=failed,
+                fix=fix
+            )
             
             checklist.append(checklist_item)
         
@@ -119,16 +120,15 @@ class ChecklistGenerator:
         # Low severity checks (often need manual review)
         return "Low"
     
-    def _generate_fix(self, check_key: str, result: Dict[str, Any], ml_results: Dict[str, Any]) -> str:
+    def _generate_fix(self, check_key: str, result: CheckResult, ml_results: Dict[str, Any]) -> str:
         """Generate fix suggestion based on check type"""
-        issues = result.get("issues", [])
+        issues = result.issues
         
         if not issues:
             return "No issues found"
         
         # Get first issue as example
-        first_issue = issues[0] if issues else {}
-        fix_suggestion = first_issue.get("fix", "Review and fix accessibility issues")
+        fix_suggestion = issues[0].fix
         
         # Enhance with ML insights
         if check_key == "images" and "alt_text_quality" in ml_results:
@@ -0,0 +1,682 @@
+"""
+Command-line interface
+Runs the analysis pipeline over URL lists, sitemaps and saved HTML outside the API
+
+Usage:
+    python -m analyzer run --urls urls.txt --output results.jsonl --workers 8
+    python -m analyzer run --sitemap https://example.com/sitemap.xml --previous last.jsonl -o new.jsonl
+    python -m analyzer run --html-dir pages/ --output results.jsonl --resume
+    python -m analyzer run --sitemap sitemap.xml -o results.jsonl --dedupe-templates
+    python -m analyzer rescore results.jsonl --profile candidate.json
+    python -m analyzer enqueue --queue audit.db --sitemap https://example.com/sitemap.xml
+    python -m analyzer worker --queue audit.db --workers 8
+    python -m analyzer status --queue audit.db --export results.jsonl
+    python -m analyzer warc crawl-*.warc.gz --output results.jsonl --workers 8
+    python -m analyzer reanalyze --snapshots snapshots/ --site example.com --latest -o results.jsonl
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from functools import partial
+from multiprocessing import Pool, Process
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple
+import logging
+
+from analyzer.logs import configure_logging, shutdown_logging
+
+if TYPE_CHECKING:
+    from analyzer.scorer import ScoreColumns
+
+logger = logging.getLogger(__name__)
+
+# A task is (kind, source) where kind is "url" or "file"
+Task = Tuple[str, str]
+
+
+# --------------------------------------------------
+# Inputs
+# --------------------------------------------------
+def read_url_list(path: str) -> Iterator[Task]:
+    """Yield URL tasks from a file with one URL per line"""
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield ("url", line)
+
+
+def read_sitemap(source: str, last_audits: Optional[Dict[str, datetime]] = None) -> Iterator[Task]:
+    """Yield URL tasks from a sitemap or sitemap index (path or URL), skipping unchanged pages"""
+    from analyzer.sitemap import SitemapReader
+
+    last_audited = last_audits.get if last_audits else None
+    reader = SitemapReader(last_audited=last_audited)
+    for entry in reader.read(source):
+        yield ("url", entry.url)
+    if reader.skipped:
+        print(f"Skipped {reader.skipped} pages unchanged since their last audit", file=sys.stderr)
+
+
+def read_html_dir(path: str) -> Iterator[Task]:
+    """Yield file tasks for every .html/.htm file below a directory"""
+    for file_path in sorted(Path(path).rglob("*")):
+        if file_path.suffix.lower() in (".html", ".htm") and file_path.is_file():
+            yield ("file", str(file_path))
+
+
+def load_last_audits(path: str) -> Dict[str, datetime]:
+    """Map each source in a previous output file to the time it was audited"""
+    from analyzer.sitemap import parse_lastmod
+
+    audits: Dict[str, datetime] = {}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+                audited = parse_lastmod(record["metadata"]["timestamp"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            if audited:
+                audits[record["source"]] = audited
+    return audits
+
+
+def load_completed(output_path: str) -> Set[str]:
+    """
+    Return the sources analyzed successfully in a partial output file
+
+    A trailing line cut off by an interrupted run is truncated so the
+    file can be appended to. Error records are dropped from the file, so
+    their pages are retried rather than reported twice.
+    """
+    completed: Set[str] = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, "rb") as handle:
+        data = handle.read()
+    end = data.rfind(b"\n") + 1
+
+    kept = []
+    for line in data[:end].splitlines(keepends=True):
+        try:
+            record = json.loads(line)
+            source = record["source"]
+        except (ValueError, KeyError, TypeError):
+            kept.append(line)
+            continue
+        if "error" not in record:
+            completed.add(source)
+            kept.append(line)
+
+    if len(kept) != len(data[:end].splitlines()):
+        # Written aside and renamed, so a second interruption can't lose finished pages
+        partial = output_path + ".resume"
+        with open(partial, "wb") as handle:
+            handle.writelines(kept)
+        os.replace(partial, output_path)
+    elif end != len(data):
+        with open(output_path, "rb+") as handle:
+            handle.truncate(end)
+    return completed
+
+
+# --------------------------------------------------
+# Worker
+# --------------------------------------------------
+def bytes_read(result: Dict[str, Any]) -> int:
+    """Size of a page as read, before prefiltering (pages served from the cache count their stored HTML)"""
+    metadata = result["metadata"]
+    return metadata.get("received_bytes", metadata.get("html_size", 0))
+
+
+_template_registry = None
+_snapshot_store = None
+
+
+def get_template_registry():
+    """Return this worker process's template registry, backed by the shared cache"""
+    from analyzer.shared_cache import get_shared_cache
+    from analyzer.templates import TemplateRegistry
+
+    global _template_registry
+    if _template_registry is None:
+        _template_registry = TemplateRegistry(get_shared_cache())
+    return _template_registry
+
+
+def process_task(task: Task, dedupe_templates: bool = False) -> Tuple[Dict[str, Any], int]:
+    """
+    Analyze one page in a worker process
+
+    Returns:
+        Tuple of (output record, HTML bytes read)
+    """
+    from analyzer.pipeline import analyze_content, analyze_url
+    from analyzer.prefilter import PREFILTER_ENABLED, prefilter_html
+    from analyzer.utils import normalize_url
+    from analyzer.logs import bind_request_id
+    from analyzer.shared_cache import get_shared_cache
+    from analyzer.tracing import start_trace
+
+    kind, source = task
+    templates = get_template_registry() if dedupe_templates else None
+    with bind_request_id(source), start_trace("crawl.page", kind=kind, source=source) as trace:
+        try:
+            if kind == "file":
+                raw = Path(source).read_bytes()
+                content = prefilter_html(raw) if PREFILTER_ENABLED else raw
+                result = analyze_content(content, Path(source).resolve().as_uri(), get_shared_cache(),
+                                         received_bytes=len(raw), templates=templates)
+            else:
+                result = analyze_url(normalize_url(source), get_shared_cache(), templates=templates)
+            trace.set("score", result["overall_score"])
+            return {"source": source, **result}, bytes_read(result)
+        except Exception as e:
+            trace.set("error", str(e))
+            return {"source": source, "error": str(e)}, 0
+
+
+def process_warc_range(part: Tuple[str, int, int], dedupe_templates: bool = False) -> List[Tuple[Dict[str, Any], int]]:
+    """
+    Analyze the HTML responses in one byte range of a WARC archive
+
+    Bodies of uncompressed archives go to the pipeline as views of the
+    memory-mapped file.
+
+    Returns:
+        (output record, HTML bytes read) per response
+    """
+    from analyzer.pipeline import analyze_content
+    from analyzer.prefilter import PREFILTER_ENABLED, prefilter_html
+    from analyzer.logs import bind_request_id
+    from analyzer.scraper import WebScraper
+    from analyzer.shared_cache import get_shared_cache
+    from analyzer.tracing import start_trace
+    from analyzer.warc import WarcArchive, html_responses
+
+    path, start, end = part
+    templates = get_template_registry() if dedupe_templates else None
+    results = []
+    with WarcArchive(path) as archive:
+        for record, body in html_responses(archive, start, end):
+            uri = record.target_uri
+            origin = {"file": path, "offset": record.offset, "date": record.date}
+            with bind_request_id(uri), start_trace("warc.record", source=uri, offset=record.offset) as trace:
+                try:
+                    if len(body) > WebScraper.MAX_CONTENT_SIZE:
+                        raise ValueError(f"Content too large: {len(body)} bytes")
+                    content = prefilter_html(body) if PREFILTER_ENABLED else body
+                    result = analyze_content(content, uri, get_shared_cache(),
+                                             received_bytes=len(body), templates=templates)
+                    trace.set("score", result["overall_score"])
+                    results.append(({"source": uri, "warc": origin, **result}, bytes_read(result)))
+                except Exception as e:
+                    trace.set("error", str(e))
+                    results.append(({"source": uri, "warc": origin, "error": str(e)}, 0))
+            del body
+    return results
+
+
+def process_snapshot(snapshot: Dict[str, Any], root: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Analyze one stored snapshot again, without network access
+
+    Returns:
+        Tuple of (output record, HTML bytes read)
+    """
+    from analyzer.pipeline import analyze_content
+    from analyzer.logs import bind_request_id
+    from analyzer.snapshots import SnapshotStore
+    from analyzer.tracing import start_trace
+
+    global _snapshot_store
+    if _snapshot_store is None or _snapshot_store.root != root:
+        _snapshot_store = SnapshotStore(root)
+
+    url = snapshot["url"]
+    origin = {"hash": snapshot["hash"], "captured_at": snapshot["captured_at"]}
+    with bind_request_id(url), start_trace("snapshot.reanalyze", source=url) as trace:
+        try:
+            content = _snapshot_store.get(snapshot["hash"])
+            if content is None:
+                raise ValueError(f"Snapshot {snapshot['hash']} is missing from the store")
+            # No shared cache: re-analysis is usually run to see what changed in the checks
+            result = analyze_content(content, url)
+            trace.set("score", result["overall_score"])
+            return {"source": url, "snapshot": origin, **result}, bytes_read(result)
+        except Exception as e:
+            trace.set("error", str(e))
+            return {"source": url, "snapshot": origin, "error": str(e)}, 0
+
+
+# --------------------------------------------------
+# Commands
+# --------------------------------------------------
+def collect_tasks(args: argparse.Namespace) -> Iterator[Task]:
+    for path in args.urls or []:
+        yield from read_url_list(path)
+    last_audits = load_last_audits(args.previous) if args.previous else None
+    for source in args.sitemap or []:
+        yield from read_sitemap(source, last_audits)
+    for path in args.html_dir or []:
+        yield from read_html_dir(path)
+
+
+class TemplateReport:
+    """
+    Collects template regions across the pages of a run
+
+    Page records keep only the ids of their regions; each region's issues
+    are reported once, with the pages it appears on.
+    """
+
+    def __init__(self):
+        self.templates: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Move a page record's template details into the report"""
+        refs = record.pop("templates", None)
+        if refs is None:
+            return
+        record["templates"] = [ref["id"] for ref in refs]
+        for ref in refs:
+            template = self.templates.setdefault(ref["id"], {**ref, "pages": []})
+            template["pages"].append(record["source"])
+
+    def shared(self) -> List[Dict[str, Any]]:
+        """Templates seen on more than one page, most widespread first"""
+        shared = [template for template in self.templates.values() if len(template["pages"]) > 1]
+        shared.sort(key=lambda template: -len(template["pages"]))
+        return [{"page_count": len(template["pages"]), **template} for template in shared]
+
+    def write(self, path: str) -> None:
+        templates = self.shared()
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"templates": templates}, handle, indent=2)
+        print(f"Found {len(templates)} templates shared by several pages; report in {path}", file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> int:
+    completed = load_completed(args.output) if args.resume else set()
+    tasks = (task for task in collect_tasks(args) if task[1] not in completed)
+
+    if completed:
+        print(f"Resuming: {len(completed)} pages already done", file=sys.stderr)
+
+    pages = failed = total_bytes = 0
+    started = time.perf_counter()
+    report = TemplateReport() if args.dedupe_templates else None
+    worker = partial(process_task, dedupe_templates=args.dedupe_templates)
+
+    with open(args.output, "a" if args.resume else "w", encoding="utf-8") as out:
+        if args.workers > 1:
+            # Each worker process needs its own log writer thread
+            pool = Pool(args.workers, initializer=configure_logging, initargs=(logging.getLogger().level,))
+            results = pool.imap_unordered(worker, tasks, chunksize=1)
+        else:
+            pool = None
+            results = map(worker, tasks)
+
+        try:
+            for record, size in results:
+                if report is not None:
+                    report.add(record)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                pages += 1
+                total_bytes += size
+                if "error" in record:
+                    failed += 1
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    elapsed = time.perf_counter() - started
+    print_summary(pages, failed, total_bytes, elapsed)
+    if report is not None:
+        report.write(args.templates_output or str(Path(args.output).with_suffix(".templates.json")))
+    return 0
+
+
+def warc(args: argparse.Namespace) -> int:
+    from analyzer.warc import WarcArchive
+
+    # Byte ranges starting at record boundaries, several per worker to even out the load
+    parts = []
+    archive_bytes = 0
+    for path in args.archives:
+        with WarcArchive(path) as archive:
+            archive_bytes += archive.size
+            count = max(args.workers * 4, archive.size // (args.split_mb * 1024 * 1024), 1)
+            parts.extend((path, start, end) for start, end in archive.split(count))
+
+    pages = failed = total_bytes = 0
+    started = time.perf_counter()
+    report = TemplateReport() if args.dedupe_templates else None
+    worker = partial(process_warc_range, dedupe_templates=args.dedupe_templates)
+
+    with open(args.output, "w", encoding="utf-8") as out:
+        if args.workers > 1:
+            pool = Pool(args.workers, initializer=configure_logging, initargs=(logging.getLogger().level,))
+            batches = pool.imap_unordered(worker, parts, chunksize=1)
+        else:
+            pool = None
+            batches = map(worker, parts)
+
+        try:
+            for batch in batches:
+                for record, size in batch:
+                    if report is not None:
+                        report.add(record)
+                    out.write(json.dumps(record) + "\n")
+                    pages += 1
+                    total_bytes += size
+                    if "error" in record:
+                        failed += 1
+                out.flush()
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    elapsed = time.perf_counter() - started
+    print_summary(pages, failed, total_bytes, elapsed)
+    print(f"Read {archive_bytes / (1024 * 1024):.1f} MB of archives in {len(parts)} ranges: "
+          f"{archive_bytes / (1024 * 1024) / max(elapsed, 1e-9):.2f} MB/s", file=sys.stderr)
+    if report is not None:
+        report.write(args.templates_output or str(Path(args.output).with_suffix(".templates.json")))
+    return 0
+
+
+def reanalyze(args: argparse.Namespace) -> int:
+    from analyzer.sitemap import parse_lastmod
+    from analyzer.snapshots import SnapshotStore
+
+    period = {}
+    for name in ("since", "until"):
+        value = getattr(args, name)
+        if value:
+            parsed = parse_lastmod(value)
+            if parsed is None:
+                print(f"reanalyze: --{name} must be an ISO date, e.g. 2026-01-31", file=sys.stderr)
+                return 2
+            period[name] = parsed.timestamp()
+
+    store = SnapshotStore(args.snapshots)
+    # Listed up front: the pool feeds tasks from another thread than the index connection's
+    snapshots = list(store.snapshots(site=args.site, latest=args.latest, **period))
+    store.close()
+
+    pages = failed = total_bytes = 0
+    started = time.perf_counter()
+    worker = partial(process_snapshot, root=args.snapshots)
+
+    with open(args.output, "w", encoding="utf-8") as out:
+        if args.workers > 1:
+            pool = Pool(args.workers, initializer=configure_logging, initargs=(logging.getLogger().level,))
+            results = pool.imap_unordered(worker, snapshots, chunksize=8)
+        else:
+            pool = None
+            results = map(worker, snapshots)
+
+        try:
+            for record, size in results:
+                out.write(json.dumps(record) + "\n")
+                pages += 1
+                total_bytes += size
+                if "error" in record:
+                    failed += 1
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    print_summary(pages, failed, total_bytes, time.perf_counter() - started)
+    return 0
+
+
+def load_checklists(paths: List[str]) -> Tuple[List[str], "ScoreColumns"]:
+    """Read stored checklists from output files into score columns"""
+    from analyzer.results import ChecklistItem
+    from analyzer.scorer import ScoreColumns
+
+    sources: List[str] = []
+    columns = ScoreColumns()
+    for path in paths:
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                    checklist = [ChecklistItem.from_dict(item) for item in record["checklist"]]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                sources.append(record.get("source") or record.get("url"))
+                columns.append(checklist)
+    return sources, columns
+
+
+def rescore(args: argparse.Namespace) -> int:
+    from analyzer.scorer import DEFAULT_PROFILE, WeightProfile, compare_profiles, np
+
+    started = time.perf_counter()
+    sources, columns = load_checklists(args.results)
+    loaded = time.perf_counter()
+    if not sources:
+        print("rescore: no stored checklists found", file=sys.stderr)
+        return 1
+
+    try:
+        baseline = WeightProfile.load(args.baseline) if args.baseline else DEFAULT_PROFILE
+        candidate = WeightProfile.load(args.profile)
+    except ValueError as e:
+        print(f"rescore: {e}", file=sys.stderr)
+        return 2
+
+    comparison = compare_profiles(columns, baseline, candidate)
+    scored = time.perf_counter()
+    scores = comparison.pop("scores")
+
+    print(json.dumps(comparison, indent=2))
+    print(
+        f"Re-scored {len(sources)} pages in {(scored - loaded) * 1000:.1f}ms "
+        f"({'numpy' if np is not None else 'pure Python'}; loading took {loaded - started:.2f}s)",
+        file=sys.stderr
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for source, old, new in zip(sources, scores["baseline"], scores["candidate"]):
+                out.write(json.dumps({"source": source, "baseline": int(old), "candidate": int(new)}) + "\n")
+    return 0
+
+
+def enqueue(args: argparse.Namespace) -> int:
+    from analyzer.workqueue import TaskQueue
+
+    queue = TaskQueue(args.queue, wal=not args.shared_fs)
+    if args.requeue_failed:
+        print(f"Requeued {queue.requeue_failed()} failed tasks", file=sys.stderr)
+    added = queue.enqueue(collect_tasks(args))
+    print(f"Queued {added} new tasks; {queue.pending()} pending in {args.queue}", file=sys.stderr)
+    return 0
+
+
+def work(queue_path: str, level: int, options: Dict[str, Any]) -> None:
+    """Run one worker process until the queue is drained"""
+    from analyzer.workqueue import QueueWorker, TaskQueue
+
+    configure_logging(level)
+    queue_worker = QueueWorker(
+        TaskQueue(queue_path),
+        partial(process_task, dedupe_templates=options.pop("dedupe_templates")),
+        **options
+    )
+    # Finish the current page and give back the rest on SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: queue_worker.stop())
+    try:
+        queue_worker.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_logging()
+
+
+def worker(args: argparse.Namespace) -> int:
+    from analyzer.workqueue import TaskQueue
+
+    queue = TaskQueue(args.queue)
+    before = queue.stats()["results"]
+    options = {
+        "lease_seconds": args.lease,
+        "batch_size": args.batch,
+        "wait": args.wait,
+        "dedupe_templates": args.dedupe_templates
+    }
+    started = time.perf_counter()
+    processes = [
+        Process(target=work, args=(args.queue, logging.getLogger().level, dict(options)), name=f"worker-{index}")
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # The workers got the interrupt too and release their tasks
+        for process in processes:
+            process.join()
+
+    done = queue.stats()["results"] - before
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"Processed {done} pages in {elapsed:.1f}s: {done / elapsed:.2f} pages/s", file=sys.stderr)
+    return 0
+
+
+def status(args: argparse.Namespace) -> int:
+    from analyzer.workqueue import TaskQueue
+
+    if not os.path.exists(args.queue):
+        print(f"status: no queue at {args.queue}", file=sys.stderr)
+        return 2
+    queue = TaskQueue(args.queue)
+    print(json.dumps(queue.stats(), indent=2))
+    if args.export:
+        count = 0
+        with open(args.export, "w", encoding="utf-8") as out:
+            for record in queue.results():
+                out.write(json.dumps(record) + "\n")
+                count += 1
+        print(f"Exported {count} results to {args.export}", file=sys.stderr)
+    return 0
+
+
+def print_summary(pages: int, failed: int, total_bytes: int, elapsed: float) -> None:
+    elapsed = max(elapsed, 1e-9)
+    megabytes = total_bytes / (1024 * 1024)
+    print(
+        f"Analyzed {pages} pages ({failed} failed) in {elapsed:.1f}s: "
+        f"{pages / elapsed:.2f} pages/s, {megabytes / elapsed:.2f} MB/s",
+        file=sys.stderr
+    )
+
+
+def add_input_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--urls", action="append", metavar="FILE", help="File with one URL per line")
+    parser.add_argument("--sitemap", action="append", metavar="FILE_OR_URL",
+                        help="Sitemap or sitemap index, optionally gzipped")
+    parser.add_argument("--previous", metavar="FILE",
+                        help="Earlier output file; sitemap pages unchanged since then are skipped")
+    parser.add_argument("--html-dir", action="append", metavar="DIR", help="Directory of saved .html files")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m analyzer", description="Accessibility Analyzer CLI")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log pipeline progress")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Analyze pages and write one JSON line per page")
+    add_input_arguments(run_parser)
+    run_parser.add_argument("--output", "-o", required=True, help="JSON lines output file")
+    run_parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    run_parser.add_argument("--resume", action="store_true", help="Skip pages already analyzed in the output file; failed pages are retried")
+    run_parser.add_argument("--dedupe-templates", action="store_true",
+                            help="Analyze regions shared across pages (header, nav, footer...) once")
+    run_parser.add_argument("--templates-output", metavar="FILE",
+                            help="Template report path (default: OUTPUT with a .templates.json suffix)")
+    run_parser.set_defaults(handler=run)
+
+    rescore_parser = commands.add_parser("rescore", help="Re-score stored results under a candidate weight profile")
+    rescore_parser.add_argument("results", nargs="+", help="JSON lines files written by run")
+    rescore_parser.add_argument("--profile", required=True, metavar="FILE", help="Candidate weight profile (JSON)")
+    rescore_parser.add_argument("--baseline", metavar="FILE", help="Baseline profile (default: current weights)")
+    rescore_parser.add_argument("--output", "-o", metavar="FILE", help="Write per-page scores as JSON lines")
+    rescore_parser.set_defaults(handler=rescore)
+
+    warc_parser = commands.add_parser("warc", help="Analyze the HTML responses stored in WARC archives")
+    warc_parser.add_argument("archives", nargs="+", metavar="ARCHIVE", help=".warc or .warc.gz files")
+    warc_parser.add_argument("--output", "-o", required=True, help="JSON lines output file")
+    warc_parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    warc_parser.add_argument("--split-mb", type=int, default=64,
+                             help="Largest byte range of an archive given to a worker at a time (default 64)")
+    warc_parser.add_argument("--dedupe-templates", action="store_true",
+                             help="Analyze regions shared across pages once (see run)")
+    warc_parser.add_argument("--templates-output", metavar="FILE",
+                             help="Template report path (default: OUTPUT with a .templates.json suffix)")
+    warc_parser.set_defaults(handler=warc)
+
+    reanalyze_parser = commands.add_parser("reanalyze", help="Analyze stored page snapshots again, offline")
+    reanalyze_parser.add_argument("--snapshots", required=True, metavar="DIR", help="Snapshot store (SNAPSHOT_DIR)")
+    reanalyze_parser.add_argument("--site", help="Only pages of this host")
+    reanalyze_parser.add_argument("--since", metavar="DATE", help="Only snapshots captured on or after this ISO date")
+    reanalyze_parser.add_argument("--until", metavar="DATE", help="Only snapshots captured before this ISO date")
+    reanalyze_parser.add_argument("--latest", action="store_true", help="Only the newest snapshot of each URL")
+    reanalyze_parser.add_argument("--output", "-o", required=True, help="JSON lines output file")
+    reanalyze_parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    reanalyze_parser.set_defaults(handler=reanalyze)
+
+    enqueue_parser = commands.add_parser("enqueue", help="Add pages to a work queue for worker processes")
+    enqueue_parser.add_argument("--queue", "-q", required=True, metavar="DB", help="Queue database (SQLite)")
+    add_input_arguments(enqueue_parser)
+    enqueue_parser.add_argument("--shared-fs", action="store_true",
+                                help="Create the queue for workers on several hosts sharing a filesystem")
+    enqueue_parser.add_argument("--requeue-failed", action="store_true", help="Queue failed pages again")
+    enqueue_parser.set_defaults(handler=enqueue)
+
+    worker_parser = commands.add_parser("worker", help="Analyze queued pages until the queue is drained")
+    worker_parser.add_argument("--queue", "-q", required=True, metavar="DB", help="Queue database (SQLite)")
+    worker_parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    worker_parser.add_argument("--lease", type=float, default=120, metavar="SECONDS",
+                               help="Lease on claimed pages, renewed while working (default 120)")
+    worker_parser.add_argument("--batch", type=int, default=4, help="Pages claimed at a time (default 4)")
+    worker_parser.add_argument("--wait", action="store_true", help="Keep polling for new pages when drained")
+    worker_parser.add_argument("--dedupe-templates", action="store_true",
+                               help="Analyze regions shared across pages once (see run)")
+    worker_parser.set_defaults(handler=worker)
+
+    status_parser = commands.add_parser("status", help="Show work queue progress and export results")
+    status_parser.add_argument("--queue", "-q", required=True, metavar="DB", help="Queue database (SQLite)")
+    status_parser.add_argument("--export", metavar="FILE", help="Write all results as JSON lines, like run")
+    status_parser.set_defaults(handler=status)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    configure_logging(logging.INFO if args.verbose else logging.WARNING)
+
+    if args.command in ("run", "enqueue") and not (args.urls or args.sitemap or args.html_dir or
+                                                  getattr(args, "requeue_failed", False)):
+        print(f"{args.command}: give at least one of --urls, --sitemap or --html-dir", file=sys.stderr)
+        return 2
+
+    try:
+        return args.handler(args)
+    finally:
+        shutdown_logging()
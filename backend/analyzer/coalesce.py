@@ -0,0 +1,48 @@
+"""
+Request Coalescing
+Single-flight execution so concurrent identical analyses share one run
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time
+
+    The first caller for a key (the leader) starts the work; callers that
+    arrive while it is in flight (followers) await the same result. The
+    work runs in its own task behind asyncio.shield, so a caller that
+    disconnects or is cancelled never cancels it for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "coalesced": self.coalesced}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of factory(), sharing it with concurrent callers of the same key"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+            logger.info("Coalescing request for %s", key)
+
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
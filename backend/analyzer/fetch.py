@@ -0,0 +1,374 @@
+"""
+Fetch Policy
+Timeouts, retries, hedged requests and per-host circuit breakers for page fetches
+"""
+
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlparse
+import logging
+
+import requests
+
+from analyzer.tracing import span
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Statuses that mean "try again shortly"; 429 is not the host being down
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+BREAKER_STATUSES = frozenset({502, 503, 504})
+
+# Errors after which repeating a GET is safe: the connection failed or
+# stalled, or the body was cut short. Blocked URLs, oversized pages and
+# other HTTP errors are not retried.
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without sending a request while a host's circuit breaker is open"""
+
+    def __init__(self, host: str, retry_after: float):
+        super().__init__(f"{host} is failing; not retrying for {retry_after:.0f}s")
+        self.host = host
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class FetchPolicy:
+    """How long to wait for a page, and how often to try again"""
+    connect_timeout: float = 5.0  # seconds to establish a connection
+    read_timeout: float = 15.0  # seconds without receiving any bytes
+    deadline: float = 30.0  # no retry is started after this many seconds
+    retries: int = 2  # extra attempts after the first
+    backoff: float = 0.25  # base delay in seconds, doubled per retry, with full jitter
+    max_backoff: float = 4.0
+    hedge_after: Optional[float] = None  # seconds before a second request races a slow first one
+    breaker_failures: int = 5  # consecutive failures that open a host's breaker
+    breaker_cooldown: float = 30.0  # seconds a breaker stays open before a trial request
+
+    @classmethod
+    def from_env(cls) -> "FetchPolicy":
+        """
+        Configure from FETCH_CONNECT_TIMEOUT, FETCH_READ_TIMEOUT, FETCH_DEADLINE,
+        FETCH_RETRIES, FETCH_BACKOFF_MS, FETCH_HEDGE_MS, BREAKER_FAILURES and
+        BREAKER_COOLDOWN
+        """
+        hedge_ms = os.getenv("FETCH_HEDGE_MS", "")
+        return cls(
+            connect_timeout=float(os.getenv("FETCH_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("FETCH_READ_TIMEOUT", "15")),
+            deadline=float(os.getenv("FETCH_DEADLINE", "30")),
+            retries=int(os.getenv("FETCH_RETRIES", "2")),
+            backoff=float(os.getenv("FETCH_BACKOFF_MS", "250")) / 1000,
+            hedge_after=float(hedge_ms) / 1000 if hedge_ms else None,
+            breaker_failures=int(os.getenv("BREAKER_FAILURES", "5")),
+            breaker_cooldown=float(os.getenv("BREAKER_COOLDOWN", "30"))
+        )
+
+    @property
+    def timeout(self) -> tuple:
+        """The (connect, read) timeout pair requests takes"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the given retry (1-based), honouring Retry-After up to max_backoff"""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (retry - 1)))
+
+
+# --------------------------------------------------
+# Circuit breakers
+# --------------------------------------------------
+class CircuitBreaker:
+    """
+    Fails fast for one host while it is known to be down
+
+    Closed: requests go through, and consecutive failures are counted.
+    Open: after `failures` of them, requests fail immediately for
+    `cooldown` seconds. Half-open: then one trial request is let through;
+    its success closes the breaker, its failure opens it again.
+    """
+
+    def __init__(self, host: str, failures: int, cooldown: float):
+        self.host = host
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> None:
+        """
+        Admit a request, or refuse it while the breaker is open
+
+        Raises:
+            CircuitOpenError: while open, or while another trial request is running
+        """
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.host, max(remaining, 0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit closed for %s", self.host)
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failures:
+                if self.state != "open":
+                    logger.warning("Circuit opened for %s after %d failures", self.host, self.consecutive_failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class CircuitBreakers:
+    """Per-host breakers, keeping the most recently used max_hosts"""
+
+    def __init__(self, failures: int = 5, cooldown: float = 30.0, max_hosts: int = 1024):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.max_hosts = max_hosts
+        self._breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(host, self.failures, self.cooldown)
+                if len(self._breakers) > self.max_hosts:
+                    self._breakers.popitem(last=False)
+            else:
+                self._breakers.move_to_end(host)
+            return breaker
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {
+            "hosts": len(breakers),
+            "open": sorted(breaker.host for breaker in breakers if breaker.state != "closed"),
+            "rejected": sum(breaker.rejected for breaker in breakers)
+        }
+
+
+# --------------------------------------------------
+# Fetcher
+# --------------------------------------------------
+class Fetcher:
+    """
+    Sends GET requests under a FetchPolicy
+
+    Each attempt is checked against the host's circuit breaker. Connection
+    errors, timeouts, truncated bodies and 429/502/503/504 responses are
+    retried with jittered exponential backoff while attempts and the
+    deadline allow; GET is idempotent, so repeating it is safe. With
+    hedge_after set, an attempt whose response headers have not arrived
+    by then is raced by a second identical request, and whichever answers
+    first is used.
+    """
+
+    def __init__(self, policy: Optional[FetchPolicy] = None, breakers: Optional[CircuitBreakers] = None):
+        self.policy = policy or FetchPolicy()
+        self.breakers = breakers or CircuitBreakers(self.policy.breaker_failures, self.policy.breaker_cooldown)
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Fetcher":
+        return cls(FetchPolicy.from_env())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "breakers": self.breakers.stats()
+        }
+
+    def fetch(self, session: requests.Session, url: str, headers: Optional[dict],
+              consume: Callable[[requests.Response], T]) -> T:
+        """
+        GET a URL and hand the response to consume, retrying both as the policy allows
+
+        consume reads what it needs of the (streamed) response; errors it
+        raises reading the body count as failed attempts too. The response
+        is closed if consume raises.
+
+        Returns:
+            What consume returns for the first usable response
+
+        Raises:
+            CircuitOpenError: if the host's breaker is open
+            requests.exceptions.RequestException: when the last attempt fails
+        """
+        policy = self.policy
+        breaker = self.breakers.get(urlparse(url).hostname or "")
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            breaker.allow()
+            retry_after = None
+            with span("http.get", attempt=attempt) as fetch_span:
+                try:
+                    response = self._send(session, url, headers, hedge=breaker.state == "closed")
+                    fetch_span.set_attributes(status_code=response.status_code, redirects=len(response.history))
+                    healthy = response.status_code not in BREAKER_STATUSES
+                    if not healthy:
+                        breaker.record_failure()
+                    if response.status_code in RETRY_STATUSES and self._can_retry(attempt, started):
+                        if healthy:
+                            breaker.record_success()
+                        retry_after = _retry_after(response)
+                        response.close()
+                    else:
+                        try:
+                            result = consume(response)
+                        except BaseException as e:
+                            response.close()
+                            # A body that arrived but was unusable (too large, blocked) is no outage
+                            if healthy and not isinstance(e, RETRYABLE_ERRORS):
+                                breaker.record_success()
+                            raise
+                        # Only now: a host that keeps cutting bodies short must open its breaker
+                        if healthy:
+                            breaker.record_success()
+                        return result
+                except RETRYABLE_ERRORS as e:
+                    breaker.record_failure()
+                    if not self._can_retry(attempt, started):
+                        raise
+                    fetch_span.set("error", type(e).__name__)
+                    logger.info("Attempt %d for %s failed, retrying: %s", attempt, url, e)
+                except requests.exceptions.RequestException:
+                    # The host answered (e.g. a redirect loop), so it is not down
+                    breaker.record_success()
+                    raise
+
+            self.retried += 1
+            time.sleep(min(policy.delay(attempt, retry_after), max(policy.deadline - (time.monotonic() - started), 0)))
+
+    def _can_retry(self, attempt: int, started: float) -> bool:
+        return attempt <= self.policy.retries and time.monotonic() - started < self.policy.deadline
+
+    def _get(self, session: requests.Session, url: str, headers: Optional[dict]) -> requests.Response:
+        return session.get(url, headers=headers, timeout=self.policy.timeout, allow_redirects=True, stream=True)
+
+    def _send(self, session: requests.Session, url: str, headers: Optional[dict], hedge: bool) -> requests.Response:
+        """One attempt: a request, raced by a second one if hedging is on and the first is slow"""
+        if self.policy.hedge_after is None or not hedge:
+            return self._get(session, url, headers)
+
+        # Both requests may run at once, and the loser keeps running after
+        # this returns, so neither uses the caller's session
+        pool = self._executor()
+        first = pool.submit(self._get, _isolated_session(session), url, headers)
+        done, _ = wait([first], timeout=self.policy.hedge_after)
+        if done:
+            return first.result()
+
+        self.hedged += 1
+        second = pool.submit(self._get, _isolated_session(session), url, headers)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self.hedge_wins += 1
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="fetch")
+            return self._pool
+
+
+def _isolated_session(session: requests.Session) -> requests.Session:
+    """
+    A copy of session for one request on another thread
+
+    requests does not make sessions, their cookie jars or redirect handling
+    thread-safe. The copy has its own settings and cookies and shares only
+    the adapters, whose urllib3 connection pools are thread-safe.
+    """
+    isolated = requests.Session()
+    isolated.headers = session.headers.copy()
+    isolated.cookies = session.cookies.copy()
+    isolated.hooks = {event: list(hooks) for event, hooks in session.hooks.items()}
+    isolated.proxies = dict(session.proxies)
+    for name in ("auth", "verify", "cert", "trust_env", "max_redirects"):
+        setattr(isolated, name, getattr(session, name))
+    isolated.adapters = session.adapters
+    return isolated
+
+
+def _close_response(future: Future) -> None:
+    """Close the response of a hedged request that lost the race"""
+    if future.exception() is None:
+        future.result().close()
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Retry-After in seconds, when given as a number"""
+    try:
+        return max(float(response.headers.get("Retry-After", "")), 0)
+    except ValueError:
+        return None
+
+
+_fetcher: Optional[Fetcher] = None
+
+
+def get_fetcher() -> Fetcher:
+    """Return the process-wide fetcher, so breakers are shared by all scrapers"""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = Fetcher.from_env()
+    return _fetcher
+
+
+def set_fetcher(fetcher: Fetcher) -> None:
+    """Replace the process-wide fetcher, e.g. with a different policy"""
+    global _fetcher
+    _fetcher = fetcher
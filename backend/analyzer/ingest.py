@@ -0,0 +1,142 @@
+"""
+HTML Ingest
+Accumulates HTML bodies chunk by chunk as they arrive, enforcing size limits
+"""
+
+from typing import List, Optional
+
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, MultipartState, parse_options_header
+
+from analyzer.prefilter import HTMLPrefilter
+
+
+class ContentTooLarge(ValueError):
+    """Raised when a body grows past the configured maximum size"""
+
+
+class HTMLIngest:
+    """
+    Collect a raw HTML body from a stream of chunks
+
+    With a prefilter, chunks are pruned as they arrive; the size limit
+    applies to the bytes received.
+    """
+
+    def __init__(self, max_size: int, prefilter: Optional[HTMLPrefilter] = None):
+        self.max_size = max_size
+        self.prefilter = prefilter
+        self.size = 0
+        self._chunks: List[bytes] = []
+
+    def feed(self, chunk: bytes) -> None:
+        """Add the next chunk of the body"""
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise ContentTooLarge("Content exceeds maximum size")
+        if self.prefilter:
+            chunk = self.prefilter.feed(chunk)
+        self._chunks.append(bytes(chunk))
+
+    def close(self) -> bytes:
+        """Return the complete body"""
+        if self.prefilter:
+            self._chunks.append(self.prefilter.close())
+        return b"".join(self._chunks)
+
+
+class MultipartHTMLIngest(HTMLIngest):
+    """
+    Collect an uploaded HTML file from a multipart/form-data stream
+
+    The multipart body is parsed incrementally; only the data of the
+    upload field is kept. Every byte of the body (other fields, part
+    headers, boundaries) counts towards the size limit as it arrives,
+    and each part's headers are capped at MAX_HEADER_SIZE.
+    """
+
+    MAX_HEADER_SIZE = 8 * 1024
+
+    def __init__(self, content_type: str, max_size: int, field_name: str = "file",
+                 prefilter: Optional[HTMLPrefilter] = None):
+        super().__init__(max_size, prefilter)
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise ValueError("Missing boundary in multipart body")
+
+        self.received = 0
+        self._header_field = b""
+        self._header_value = b""
+        self._header_size = 0
+        self._in_field = False
+        self._found = False
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> None:
+        self.received += len(chunk)
+        if self.received > self.max_size:
+            raise ContentTooLarge("Content exceeds maximum size")
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError:
+            raise ValueError("Invalid multipart body")
+
+    def close(self) -> bytes:
+        try:
+            self._parser.finalize()
+        except MultipartParseError:
+            raise ValueError("Invalid multipart body")
+        # finalize() accepts a body cut off before its closing boundary
+        if self._parser.state != MultipartState.END:
+            raise ValueError("Invalid multipart body: truncated")
+        if not self._found:
+            raise ValueError(f"Multipart body has no '{self.field_name}' field")
+        return super().close()
+
+    # Parser callbacks
+    def _on_part_begin(self) -> None:
+        self._in_field = False
+        self._header_size = 0
+
+    def _count_header(self, size: int) -> None:
+        self._header_size += size
+        if self._header_size > self.MAX_HEADER_SIZE:
+            raise ContentTooLarge("Multipart part headers too large")
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._count_header(end - start)
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._count_header(end - start)
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            # Only the first part with the upload field name is ingested
+            if options.get(b"name", b"").decode("latin-1") == self.field_name and not self._found:
+                self._in_field = True
+                self._found = True
+                filename = options.get(b"filename")
+                self.filename = filename.decode("utf-8", errors="ignore") if filename else None
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_field:
+            HTMLIngest.feed(self, data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._in_field = False
@@ -0,0 +1,262 @@
+"""
+Asynchronous Job Queue
+Persists analysis jobs in SQLite and runs them on a pool of in-process workers
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+from analyzer.logs import bind_request_id
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """SQLite-backed job persistence shared by every uvicorn worker on the host"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            urls TEXT NOT NULL,
+            results TEXT NOT NULL DEFAULT '[]',
+            error TEXT,
+            worker TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = path
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One connection per call keeps the store safe to share between threads
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def create(self, urls: List[str]) -> Dict[str, Any]:
+        """Queue a new job and return its record"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, urls, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(urls), now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job record, or None if it does not exist"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest runnable job
+
+        Jobs left running by a worker whose lease expired (e.g. after a crash
+        or restart) are runnable again; those already tried max_attempts times
+        are marked failed instead, so a job that kills its worker is not
+        retried forever.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'failed', error = 'Worker lease expired ' || attempts || ' times',
+                    worker = NULL, lease_expires = NULL, updated_at = ?
+                WHERE status = 'running' AND lease_expires < ? AND attempts >= ?
+                """,
+                (now, now, self.max_attempts)
+            )
+            row = conn.execute(
+                """
+                SELECT id FROM jobs
+                WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (now,)
+            ).fetchone()
+            if row is None:
+                # Commit rather than roll back, to keep the jobs just marked failed
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+                """,
+                (worker_id, now + lease_seconds, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    def save_progress(self, job_id: str, worker_id: str, results: List[Dict[str, Any]],
+                      lease_seconds: Optional[float] = None) -> None:
+        """Store partial results of a running job, renewing its lease if lease_seconds is given"""
+        now = time.time()
+        with self._connect() as conn:
+            if lease_seconds is None:
+                conn.execute(
+                    "UPDATE jobs SET results = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                    (json.dumps(results), now, job_id, worker_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE jobs SET results = ?, lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                    (json.dumps(results), now + lease_seconds, now, job_id, worker_id)
+                )
+
+    def release(self, job_id: str, worker_id: str) -> None:
+        """Put a running job back in the queue so another worker can resume it"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = 'queued', worker = NULL, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND worker = ? AND status = 'running'
+                """,
+                (time.time(), job_id, worker_id)
+            )
+
+    def finish(self, job_id: str, worker_id: str, status: str,
+               results: List[Dict[str, Any]], error: Optional[str] = None) -> None:
+        """Mark a job completed or failed"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE jobs
+                SET status = ?, results = ?, error = ?, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND worker = ?
+                """,
+                (status, json.dumps(results), error, time.time(), job_id, worker_id)
+            )
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        urls = json.loads(row["urls"])
+        results = json.loads(row["results"])
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "urls": urls,
+            "progress": {"done": len(results), "total": len(urls)},
+            "results": results,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+
+class JobWorkerPool:
+    """Pool of worker threads that run queued jobs through the analysis pipeline"""
+
+    def __init__(self, store: JobStore, workers: int = 2, lease_seconds: float = 600, poll_interval: float = 1.0):
+        self.store = store
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the worker threads"""
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._run,
+                args=(f"{prefix}:{index}",),
+                name=f"job-worker-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %d job workers", self.workers)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask the workers to stop after their current job"""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was queued"""
+        self._wakeup.set()
+
+    def _run(self, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self.store.claim(worker_id, self.lease_seconds)
+            except Exception:
+                logger.error("Failed to claim job", exc_info=True)
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            with bind_request_id(job["job_id"]):
+                self._execute(job, worker_id)
+
+    def _execute(self, job: Dict[str, Any], worker_id: str) -> None:
+        # Imported lazily so the worker threads don't slow down app import
+        from analyzer.pipeline import analyze_url
+        from analyzer.utils import normalize_url
+        from analyzer.shared_cache import get_shared_cache
+        from analyzer.tracing import start_trace
+
+        job_id = job["job_id"]
+        logger.info("Running job %s (%d URLs)", job_id, len(job["urls"]))
+
+        # Resume after the URLs a previous attempt already finished
+        results = list(job["results"])
+        try:
+            for raw_url in job["urls"][len(results):]:
+                if self._stopping.is_set():
+                    self.store.release(job_id, worker_id)
+                    return
+                with start_trace("job.item", job_id=job_id, url=raw_url) as trace:
+                    try:
+                        results.append(analyze_url(normalize_url(raw_url), get_shared_cache()))
+                    except ValueError as e:
+                        trace.set("error", str(e))
+                        results.append({"url": raw_url, "error": str(e)})
+                # A job may outlast one lease; each finished URL renews it
+                self.store.save_progress(job_id, worker_id, results, self.lease_seconds)
+
+            self.store.finish(job_id, worker_id, "completed", results)
+            logger.info("Job %s completed", job_id)
+        except Exception:
+            logger.error("Job %s failed", job_id, exc_info=True)
+            self.store.finish(job_id, worker_id, "failed", results,
+                              error="Internal server error during accessibility analysis")
@@ -0,0 +1,200 @@
+"""
+Structured Logging
+JSON log records with request ids, written off the request path through a queue
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from analyzer.tracing import current_span
+
+# Request id of the work being logged; set per API request, job item or CLI page
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+@contextmanager
+def bind_request_id(request_id: str) -> Iterator[None]:
+    """Tag records logged inside the block (and threads started from it) with a request id"""
+    token = request_id_var.set(request_id)
+    try:
+        yield
+    finally:
+        request_id_var.reset(token)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse LOG_SAMPLE_RATES, e.g. "analyzer.scorer=0.01,analyzer.scraper=0.1"
+
+    Raises:
+        ValueError: on malformed entries or rates outside 0-1
+    """
+    rates = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        category, _, rate = entry.partition("=")
+        value = float(rate)
+        if not 0 <= value <= 1:
+            raise ValueError(f"Log sample rate for {category.strip()} must be between 0 and 1")
+        rates[category.strip()] = value
+    return rates
+
+
+class ContextFilter(logging.Filter):
+    """
+    Per-category sampling, then request and trace ids
+
+    Runs in the thread that logs, where the context variables are set.
+    Records below WARNING from a sampled category (a logger name or
+    prefix) are kept at its rate; with a request id the decision is made
+    per request, so a request's records are kept or dropped together.
+    """
+
+    def __init__(self, sample_rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        # Longest prefix first, so analyzer.scorer wins over analyzer
+        self.sample_rates = sorted((sample_rates or {}).items(), key=lambda item: -len(item[0]))
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> Optional[float]:
+        for category, rate in self.sample_rates:
+            if name == category or name.startswith(category + "."):
+                return rate
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        if self.sample_rates and record.levelno < logging.WARNING:
+            rate = self._rate(record.name)
+            if rate is not None and rate < 1:
+                if request_id is not None:
+                    draw = zlib.crc32(f"{request_id}:{record.name}".encode("utf-8")) / 0x100000000
+                else:
+                    draw = random.random()
+                if draw >= rate:
+                    self.sampled_out += 1
+                    return False
+
+        record.request_id = request_id
+        span = current_span()
+        record.trace_id = span.trace_id if span.recording else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with extra= fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and value is not None:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        return json.dumps(data, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without formatting them
+
+    The stock QueueHandler renders the message in the logging thread;
+    here msg and args travel as they are and are only rendered if the
+    record is written. Exceptions are rendered up front since their
+    frames change. When the queue is full, records are dropped rather
+    than blocking the request.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[NonBlockingQueueHandler] = None
+_filter: Optional[ContextFilter] = None
+
+
+def configure_logging(level: Optional[int] = None) -> None:
+    """
+    Route the root logger through a bounded queue to a background writer
+
+    Reads LOG_LEVEL, LOG_FORMAT (json or text), LOG_SAMPLE_RATES and
+    LOG_QUEUE_SIZE. Safe to call again, e.g. in forked worker processes,
+    which need their own writer thread.
+    """
+    global _listener, _handler, _filter
+    root = logging.getLogger()
+    if _listener is not None:
+        _listener.stop()
+    if _handler is not None:
+        root.removeHandler(_handler)
+
+    if level is None:
+        level = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    stream = logging.StreamHandler(sys.stderr)
+    if os.getenv("LOG_FORMAT", "json") == "text":
+        stream.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(request_id)s:%(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    _filter = ContextFilter(parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")))
+    _handler = NonBlockingQueueHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    _handler.addFilter(_filter)
+
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, int]:
+    """Records dropped by sampling and by a full queue since configure_logging"""
+    return {
+        "sampled_out": _filter.sampled_out if _filter else 0,
+        "queue_full_dropped": _handler.dropped if _handler else 0,
+        "queued": _handler.queue.qsize() if _handler else 0
+    }
@@ -0,0 +1,110 @@
+"""
+Runtime Metrics
+Event-loop lag and process memory, reported by GET /metrics
+"""
+
+import asyncio
+import resource
+import sys
+import time
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the lag histogram buckets; the last bucket is unbounded
+LAG_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes up from a periodic sleep
+
+    Lag shows how long blocking work (parsing on the loop thread, slow
+    callbacks, GIL contention) keeps requests from being served. Samples
+    go into a cumulative histogram, so a client can take two snapshots
+    and compute percentiles for the interval between them.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.counts: List[int] = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, (time.monotonic() - started - self.interval) * 1000))
+
+    def record(self, lag_ms: float) -> None:
+        for index, bound in enumerate(LAG_BUCKETS_MS):
+            if lag_ms <= bound:
+                break
+        else:
+            index = len(LAG_BUCKETS_MS)
+        self.counts[index] += 1
+        self.total_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def stats(self) -> Dict[str, object]:
+        samples = sum(self.counts)
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": samples,
+            "mean_ms": round(self.total_ms / samples, 2) if samples else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "buckets_ms": list(LAG_BUCKETS_MS),
+            "counts": list(self.counts)
+        }
+
+
+def histogram_percentile(counts: List[int], bounds: List[float], fraction: float) -> Optional[float]:
+    """
+    Upper bound of the bucket holding the given fraction of samples
+
+    Returns None if there are no samples, or infinity for the overflow bucket.
+    """
+    samples = sum(counts)
+    if not samples:
+        return None
+    seen = 0
+    for index, count in enumerate(counts):
+        seen += count
+        if seen >= fraction * samples:
+            return bounds[index] if index < len(bounds) else float("inf")
+    return float("inf")
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    Current and peak resident set size of this process, in bytes
+
+    Reads /proc/self/status (VmRSS, VmHWM) where available, and falls back
+    to getrusage's peak elsewhere.
+    """
+    memory = {}
+    try:
+        with open("/proc/self/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key = "rss_bytes" if line.startswith("VmRSS") else "peak_rss_bytes"
+                    memory[key] = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if "peak_rss_bytes" not in memory:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    return memory
@@ -4,10 +4,15 @@ Enhances accessibility analysis with ML-based quality scoring
 """
 
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from bs4 import BeautifulSoup
 import logging
 
+from analyzer.accname import AccessibleNames
+from analyzer.results import CheckResult
+from analyzer.parsing import parse_html
+from analyzer.sampling import Sampler
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,7 +22,9 @@ class MLAnalyzer:
     Uses TF-IDF-like features and simple classifiers
     """
     
-    def __init__(self):
+    def __init__(self, sampler: Optional[Sampler] = None):
+        self.sampler = sampler or Sampler()
+        
         # Vague link text patterns
         self.vague_patterns = [
             r"click\s+here",
@@ -36,27 +43,39 @@ class MLAnalyzer:
             "icon", "logo", "banner", "screenshot"
         ]
     
-    def analyze(self, html_content: str, rule_results: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze(self, html_content: str, rule_results: Dict[str, CheckResult]) -> Dict[str, Any]:
         """
         Run ML-enhanced analysis
         
         Returns:
             Dictionary with ML analysis results
         """
-        soup = BeautifulSoup(html_content, "html.parser")
+        return self.analyze_soup(parse_html(html_content), rule_results)
+    
+    def analyze_soup(self, soup: BeautifulSoup, rule_results: Dict[str, CheckResult],
+                     names: Optional[AccessibleNames] = None) -> Dict[str, Any]:
+        """
+        Run ML-enhanced analysis on an already parsed document
         
+        Pass the AccessibleNames the rule checks used to reuse their names.
+        
+        Returns:
+            Dictionary with ML analysis results
+        """
+        names = names or AccessibleNames(soup)
         ml_results = {
             "alt_text_quality": self._analyze_alt_text_quality(soup, rule_results),
-            "link_text_quality": self._analyze_link_text_quality(soup, rule_results),
-            "readability": self._calculate_readability(soup),
+            "link_text_quality": self._analyze_link_text_quality(soup, names),
+            "readability": self._calculate_readability(soup, names),
             "severity_classification": self._classify_severity(rule_results)
         }
         
         return ml_results
     
-    def _analyze_alt_text_quality(self, soup: BeautifulSoup, rule_results: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_alt_text_quality(self, soup: BeautifulSoup, rule_results: Dict[str, CheckResult]) -> Dict[str, Any]:
         """Score alt text quality using NLP heuristics"""
-        images = soup.find_all("img")
+        all_images = soup.find_all("img")
+        images = self.sampler.sample("alt_text_quality", all_images)
         scores = []
         
         for img in images:
@@ -93,26 +112,25 @@ class MLAnalyzer:
         
         return {
             "average_score": round(avg_score, 1),
-            "total_images": len(images),
+            "total_images": len(all_images),
             "scored_images": len(scores)
         }
     
-    def _analyze_link_text_quality(self, soup: BeautifulSoup, rule_results: Dict[str, Any]) -> Dict[str, Any]:
+    def _analyze_link_text_quality(self, soup: BeautifulSoup, names: AccessibleNames) -> Dict[str, Any]:
         """Analyze link text descriptiveness"""
-        links = soup.find_all("a", href=True)
+        all_links = soup.find_all("a", href=True)
+        links = self.sampler.sample("link_text_quality", all_links)
         vague_count = 0
         quality_scores = []
         
         for link in links:
-            text = link.get_text(strip=True)
-            aria_label = link.get("aria-label", "")
+            display_text = names.name(link)
             
-            if not text and not aria_label:
+            if not display_text:
                 vague_count += 1
                 quality_scores.append(0)
                 continue
             
-            display_text = aria_label if aria_label else text
             display_lower = display_text.lower()
             
             # Check against vague patterns
@@ -131,18 +149,20 @@ class MLAnalyzer:
         avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
         
         return {
-            "vague_links": vague_count,
+            "vague_links": self.sampler.scale("link_text_quality", vague_count),
             "average_quality": round(avg_quality, 1),
-            "total_links": len(links)
+            "total_links": len(all_links)
         }
     
-    def _calculate_readability(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _calculate_readability(self, soup: BeautifulSoup, names: AccessibleNames) -> Dict[str, Any]:
         """
         Calculate basic readability score (simplified Flesch-like)
         """
         # Extract text content
-        text_elements = soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "li"])
-        text_content = " ".join([elem.get_text(strip=True) for elem in text_elements])
+        text_elements = self.sampler.sample(
+            "readability", soup.find_all(["p", "h1", "h2", "h3", "h4", "h5", "h6", "li"])
+        )
+        text_content = " ".join([names.text(elem) for elem in text_elements])
         
         if not text_content:
             return {
@@ -175,12 +195,12 @@ class MLAnalyzer:
         return {
             "score": round(readability_score, 1),
             "level": level,
-            "word_count": word_count,
-            "sentence_count": sentence_count,
+            "word_count": self.sampler.scale("readability", word_count),
+            "sentence_count": self.sampler.scale("readability", sentence_count),
             "avg_sentence_length": round(avg_sentence_length, 1)
         }
     
-    def _classify_severity(self, rule_results: Dict[str, Any]) -> Dict[str, int]:
+    def _classify_severity(self, rule_results: Dict[str, CheckResult]) -> Dict[str, int]:
         """
         Classify issues by severity based on WCAG impact
         """
@@ -190,21 +210,21 @@ class MLAnalyzer:
         high_checks = ["images", "forms", "lang_attribute"]
         for check in high_checks:
             if check in rule_results:
-                failed = rule_results[check].get("failed", 0)
+                failed = rule_results[check].failed
                 severity_counts["High"] += failed
         
         # Medium severity: Heading hierarchy, button accessibility
         medium_checks = ["headings", "buttons"]
         for check in medium_checks:
             if check in rule_results:
-                failed = rule_results[check].get("failed", 0)
+                failed = rule_results[check].failed
                 severity_counts["Medium"] += failed
         
         # Low severity: Link text, color contrast (often needs manual review)
         low_checks = ["links", "color_contrast"]
         for check in low_checks:
             if check in rule_results:
-                failed = rule_results[check].get("failed", 0)
+                failed = rule_results[check].failed
                 severity_counts["Low"] += min(failed, 5)  # Cap low severity
         
         return severity_counts
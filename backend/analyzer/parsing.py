@@ -0,0 +1,162 @@
+"""
+Selective Parsing
+Builds only the parts of the document tree that the registered checks read
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+# "selective" builds a restricted tree; "full" builds every element
+PARSE_MODE = os.getenv("PARSE_MODE", "selective")
+
+# Tags the checks find, count or walk up to. They are always built; other
+# tags are elided and their children attached to the nearest built ancestor.
+# <template> stays because its strings are excluded from get_text(), and
+# <pre> because whitespace inside it is kept as is. Landmarks are kept so
+# repeated page regions can be found (see analyzer.templates).
+NEEDED_TAGS = frozenset({
+    "html", "img", "input", "textarea", "select", "label", "button", "a",
+    "h1", "h2", "h3", "h4", "h5", "h6", "p", "span", "div", "li", "template", "pre",
+    "header", "nav", "footer", "aside", "main",
+})
+
+# Elements whose markup ends up in issue snippets (str(elem)[:100]) or
+# whose subtree is searched. Their whole subtree is built verbatim.
+VERBATIM_TAGS = frozenset({
+    "img", "input", "textarea", "select", "button",
+    "h1", "h2", "h3", "h4", "h5", "h6",
+})
+
+# Interactive elements reported when aria-hidden
+INTERACTIVE_TAGS = frozenset({"a", "button", "input", "select", "textarea"})
+
+# Elements whose text is read with get_text() or is part of an accessible name
+TEXT_TAGS = frozenset({"a", "button", "label", "p", "li", "h1", "h2", "h3", "h4", "h5", "h6"})
+
+# Elements with these attributes are counted by some check, mark landmarks,
+# or change accessible names (see analyzer.accname). Elements with an id
+# may be aria-labelledby targets, so their text is kept too.
+NEEDED_ATTRS = ("style", "aria-hidden", "role", "id", "hidden", "title", "aria-label", "aria-labelledby")
+
+# Class names the contrast check reports, so their elements appear in snippets
+LOW_CONTRAST_WORDS = ("light", "muted", "gray", "grey", "fade")
+
+# Raw-text elements dropped outright outside verbatim subtrees
+DROPPED_TAGS = frozenset({"script", "style"})
+
+
+class SelectiveSoup(BeautifulSoup):
+    """
+    BeautifulSoup that filters html.parser events as the tree is built
+
+    Script and style bodies, layout wrappers, SVG internals and text no
+    check reads are never turned into tree objects. Everything the checks
+    observe (counts, attributes, get_text() results, accessible names,
+    issue snippets and label ancestry) matches a full parse of the same
+    markup.
+    """
+
+    def reset(self):
+        super().reset()
+        # Mirror of the open-tag stack including elided tags:
+        # (name, built, verbatim, text)
+        self._open: List[Tuple[str, bool, bool, bool]] = []
+        self._verbatim_depth = 0
+        self._text_depth = 0
+        self._dropping = None
+
+    def _classify(self, name: str, attrs: Dict[str, str]) -> Tuple[bool, bool, bool]:
+        """Return (built, verbatim, text) for a start tag"""
+        if self._verbatim_depth:
+            return True, True, True
+        has_attr = any(attr in attrs for attr in NEEDED_ATTRS)
+        classes = attrs.get("class", "").lower()
+        verbatim = (
+            name in VERBATIM_TAGS
+            or (name == "a" and "href" in attrs)
+            or "style" in attrs
+            or any(word in classes for word in LOW_CONTRAST_WORDS)
+            or (name in INTERACTIVE_TAGS and "aria-hidden" in attrs)
+        )
+        # Void elements are cheap and html.parser tracks their end tags
+        # itself, so they are always built to keep string boundaries intact
+        built = verbatim or has_attr or name in NEEDED_TAGS or name in self.builder.empty_element_tags
+        return built, verbatim, name in TEXT_TAGS or "id" in attrs
+
+    def handle_starttag(self, name, namespace, nsprefix, attrs, sourceline=None,
+                        sourcepos=None, namespaces=None):
+        if self._dropping:
+            return None
+
+        built, verbatim, text = self._classify(name, attrs)
+
+        if not built and name in DROPPED_TAGS:
+            self.endData()
+            self._dropping = name
+            return None
+
+        if built:
+            tag = super().handle_starttag(name, namespace, nsprefix, attrs, sourceline=sourceline,
+                                          sourcepos=sourcepos, namespaces=namespaces)
+        else:
+            # Flush pending text so string boundaries match a full parse
+            self.endData()
+            tag = None
+
+        self._open.append((name, built, verbatim, text))
+        self._verbatim_depth += verbatim
+        self._text_depth += text
+        return tag
+
+    def handle_endtag(self, name, nsprefix=None):
+        if self._dropping:
+            if name == self._dropping:
+                self._dropping = None
+            return
+
+        # Even unmatched end tags end the current string
+        self.endData()
+
+        # Find the element this end tag closes, like BeautifulSoup._popToTag
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0] == name:
+                break
+        else:
+            return
+
+        closed = self._open[index:]
+        del self._open[index:]
+        for _, _, verbatim, text in closed:
+            self._verbatim_depth -= verbatim
+            self._text_depth -= text
+
+        if closed[0][1]:
+            super().handle_endtag(name, nsprefix)
+        else:
+            # Built elements opened inside an elided one close with it
+            for _, built, _, _ in closed[1:]:
+                if built:
+                    self.popTag()
+
+    def handle_data(self, data):
+        if self._dropping:
+            return
+        if self._text_depth or self._verbatim_depth:
+            super().handle_data(data)
+
+
+def parse_html(html_content: str, mode: Optional[str] = None, parser: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parse HTML for the checks
+
+    In selective mode (the default, see PARSE_MODE) only the elements and
+    text the checks read are built, which saves most of the tree on
+    script-heavy pages. Selective parsing filters html.parser's events, so
+    other BeautifulSoup parsers (e.g. "lxml") always build the full tree.
+    """
+    parser = parser or "html.parser"
+    if (mode or PARSE_MODE) == "selective" and parser == "html.parser":
+        return SelectiveSoup(html_content, parser)
+    return BeautifulSoup(html_content, parser)
@@ -0,0 +1,249 @@
+"""
+Analysis Pipeline
+Runs the scrape -> rules -> ML -> checklist -> scoring steps shared by all entry points
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+import logging
+
+from analyzer.accname import AccessibleNames
+from analyzer.scraper import WebScraper
+from analyzer.parsing import parse_html
+from analyzer.rules import RuleBasedAnalyzer
+from analyzer.ml_analyzer import MLAnalyzer
+from analyzer.checklist import ChecklistGenerator
+from analyzer.scorer import ScoringEngine
+from analyzer.responses import dumps
+from analyzer.sampling import Sampler
+from analyzer.shared_cache import SharedCache
+from analyzer.snapshots import get_snapshot_store
+from analyzer.templates import TemplateRegistry
+from analyzer.tracing import span
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = {"High": 0, "Medium": 1, "Low": 2}
+
+# Bump when checks or scoring change so cached analyses are not reused
+ANALYSIS_VERSION = "3"
+
+
+def _run_checks(html_content: str, url: str, sampler: Optional[Sampler] = None,
+                templates: Optional[TemplateRegistry] = None, parse_mode: Optional[str] = None,
+                parser: Optional[str] = None, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Steps 2-6, producing the URL-independent part of the response
+
+    The parse time is stored in timings["parse_ms"], if given; it is not
+    part of the (cacheable) result.
+    """
+    quick = sampler is not None
+    sampler = sampler or Sampler()
+    template_refs = None
+
+    # Steps 2-3 share one parse and one set of accessible names
+    with span("pipeline.parse", html_bytes=len(html_content)) as parse_span:
+        started = time.perf_counter()
+        soup = parse_html(html_content, parse_mode, parser)
+        if timings is not None:
+            timings["parse_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if parse_span.recording:
+            parse_span.set("elements", len(soup.find_all(True)))
+    names = AccessibleNames(soup)
+
+    # Step 2: Rule-based analysis, reusing results for known template regions
+    with span("rules.analyze", templates=templates is not None) as rules_span:
+        if templates is not None:
+            rule_results, template_refs = templates.analyze(soup, RuleBasedAnalyzer(sampler), names)
+            rules_span.set("template_regions", len(template_refs))
+        else:
+            rule_results = RuleBasedAnalyzer(sampler).analyze_soup(soup, names=names)
+
+    # Step 3: ML/NLP analysis
+    with span("ml.analyze"):
+        ml_results = MLAnalyzer(sampler).analyze_soup(soup, rule_results, names)
+
+    # Step 4: Checklist
+    with span("checklist.generate"):
+        checklist = ChecklistGenerator().generate(rule_results, ml_results)
+
+    # Step 5: Scoring
+    with span("scoring.calculate") as score_span:
+        score_data = ScoringEngine().calculate(checklist)
+        score_span.set("score", score_data["overall_score"])
+
+    # Step 6: Compile issues
+    failed_items = [item for item in checklist if item.status == "fail"]
+    failed_items.sort(key=lambda item: SEVERITY_ORDER.get(item.severity, 3))
+
+    # JSON-ready structures are only built here, at the response boundary
+    checks = {
+        "overall_score": score_data["overall_score"],
+        "summary": {
+            "total_checks": len(checklist),
+            "passed": score_data["passed"],
+            "failed": score_data["failed"],
+            "high_issues": score_data["high_issues"],
+            "medium_issues": score_data["medium_issues"],
+            "low_issues": score_data["low_issues"]
+        },
+        "checklist": [item.to_dict() for item in checklist],
+        "issues": [item.to_issue_dict() for item in failed_items]
+    }
+    if quick:
+        checks["sampling"] = sampler.report()
+    if template_refs is not None:
+        checks["templates"] = [ref.to_dict() for ref in template_refs]
+    return checks
+
+
+def check_html(html_content: str, url: str, parse_mode: Optional[str] = None,
+               parser: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run steps 2-6 uncached with a given parse mode and BeautifulSoup parser
+
+    Used to compare engine configurations (see analyzer.shadow).
+
+    Returns:
+        The URL-independent part of an /analyze response
+    """
+    return _run_checks(html_content, url, parse_mode=parse_mode, parser=parser)
+
+
+def analyze_html(html_content: str, url: str, metadata: Optional[Dict[str, Any]] = None,
+                 cache: Optional[SharedCache] = None, budget_ms: Optional[int] = None,
+                 templates: Optional[TemplateRegistry] = None,
+                 started: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run the analysis steps on already fetched HTML
+
+    Results depend only on the HTML, so with a cache identical pages are
+    analyzed once across all worker processes. With budget_ms (quick mode)
+    large element sets are sampled deterministically and the counts
+    extrapolated; the response then carries a "sampling" section. The
+    budget runs from started (time.perf_counter() at the start of the
+    request, by default now), so the checks get what fetching and parsing
+    left of it; the section reports any overshoot.
+
+    With a template registry (multi-page runs), regions shared across a
+    site are analyzed once and the response carries a "templates" list of
+    the regions found with their local check results. Templates are not
+    used in quick mode.
+
+    Returns:
+        Dictionary matching the /analyze response body
+    """
+    metadata = metadata or {}
+    sampler = None
+    if budget_ms is not None:
+        templates = None
+        sampler = Sampler.for_budget(budget_ms, started)
+    # Quick-mode results depend on the sample size, not on the budget itself
+    mode = f"sample{sampler.max_elements}" if sampler else ("templates" if templates is not None else "full")
+
+    timings: Dict[str, float] = {}
+    with span("pipeline.analyze", html_bytes=len(html_content), mode=str(mode)) as analysis_span:
+        if cache is not None:
+            key = f"{ANALYSIS_VERSION}:{mode}:{hashlib.sha256(html_content.encode('utf-8')).hexdigest()}"
+            cached = cache.get("analysis", key)
+            analysis_span.set("cache_hit", bool(cached))
+            if cached:
+                checks = json.loads(cached.value)
+            else:
+                checks = _run_checks(html_content, url, sampler, templates, timings=timings)
+                cache.set("analysis", key, dumps(checks))
+        else:
+            checks = _run_checks(html_content, url, sampler, templates, timings=timings)
+
+    if sampler is not None:
+        # A cached result carries the timing of the run that produced it
+        checks["sampling"].update(sampler.timing())
+        if checks["sampling"]["overshoot_ms"]:
+            logger.info("Quick mode overshot its %d ms budget by %.1f ms",
+                        budget_ms, checks["sampling"]["overshoot_ms"])
+
+    result_metadata = {
+        "title": metadata.get("title", "Unknown"),
+        "timestamp": metadata.get("timestamp"),
+        "html_size": len(html_content)
+    }
+    # Bytes received, bytes handed to the parser after prefiltering
+    for key in ("received_bytes", "parsed_bytes", "snapshot"):
+        if key in metadata:
+            result_metadata[key] = metadata[key]
+    # Time parse_html took; absent when the analysis came from the cache
+    result_metadata.update(timings)
+
+    return {
+        "url": url,
+        **checks,
+        "metadata": result_metadata
+    }
+
+
+def store_snapshot(url: str, html_content: str, metadata: Dict[str, Any]) -> None:
+    """
+    Keep fetched HTML in the snapshot store (SNAPSHOT_DIR), if one is configured
+
+    The content hash goes into metadata, and from there into the result.
+    A store that cannot be written to is logged, not raised: the analysis
+    does not depend on it.
+    """
+    store = get_snapshot_store()
+    if store is None:
+        return
+    try:
+        metadata["snapshot"] = store.put(url, html_content)
+    except (OSError, sqlite3.Error):
+        logger.warning("Could not store a snapshot of %s", url, exc_info=True)
+
+
+def analyze_url(url: str, cache: Optional[SharedCache] = None, budget_ms: Optional[int] = None,
+                templates: Optional[TemplateRegistry] = None) -> Dict[str, Any]:
+    """
+    Fetch a URL and analyze it
+
+    Raises:
+        ValueError: if the page cannot be fetched
+    """
+    started = time.perf_counter()
+    html_content, metadata = WebScraper(cache=cache).scrape(url)
+
+    if not html_content:
+        raise ValueError("Failed to fetch website content. Website may block bots or require JavaScript.")
+
+    store_snapshot(url, html_content, metadata)
+    return analyze_html(html_content, url, metadata, cache, budget_ms, templates, started)
+
+
+def analyze_content(content: bytes, url: str, cache: Optional[SharedCache] = None,
+                    budget_ms: Optional[int] = None, received_bytes: Optional[int] = None,
+                    templates: Optional[TemplateRegistry] = None,
+                    started: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Analyze HTML bytes obtained without WebScraper (files, uploads)
+
+    received_bytes is the size before prefiltering, if content was prefiltered.
+    started is when the request began, for quick mode (see analyze_html).
+
+    Raises:
+        ValueError: if the content is empty
+    """
+    started = time.perf_counter() if started is None else started
+    metadata = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "title": None,
+        "url": url,
+        "received_bytes": received_bytes if received_bytes is not None else len(content)
+    }
+    html_content, metadata = WebScraper.parse(content, metadata)
+
+    if not html_content.strip():
+        raise ValueError("HTML content is empty")
+
+    return analyze_html(html_content, url, metadata, cache, budget_ms, templates, started)
@@ -0,0 +1,375 @@
+"""
+HTML Prefilter
+Streams raw HTML bytes through a linear-time pass that prunes regions no check reads
+"""
+
+import os
+import re
+from html.parser import locatestarttagend_tolerant
+from collections import Counter
+from typing import List, Optional, Tuple
+
+# Set PREFILTER_HTML=0 to hand pages to the parser unmodified
+PREFILTER_ENABLED = os.getenv("PREFILTER_HTML", "1") != "0"
+
+# Tokenizing rules follow html.parser so regions are cut where the parser
+# would see them
+_START_TAG = re.compile(locatestarttagend_tolerant.pattern.encode("ascii"), re.VERBOSE)
+_TAG_NAME = re.compile(rb"[a-zA-Z][^\t\n\r\f />\x00]*")
+_END_TAG_NAME = re.compile(rb"</\s*([a-zA-Z][^\t\n\r\f />\x00]*)")
+_COMMENT_END = re.compile(rb"--\s*>")
+_SCRIPT_END = re.compile(rb"</\s*script\s*>", re.I)
+_STYLE_END = re.compile(rb"</\s*style\s*>", re.I)
+_QUOTED_VALUE_START = re.compile(rb"\s*=+\s*(['\"])")
+
+# Bytes held back at a chunk boundary in case they start a </script> or </style>
+END_TAG_TAIL = 64
+
+# SVG descendants kept because checks may read them: their attributes
+# (role, aria-*, style) or, for these tags, their whole subtree (link text,
+# accessible names, embedded or misplaced HTML the checks count)
+_SVG_KEEP_ATTR = re.compile(rb"[\s/\"'](?:aria-[\w-]*|role|style)(?=[\s/>=])", re.I)
+_SVG_PASSTHROUGH = frozenset({
+    b"a", b"title", b"desc", b"text", b"tspan", b"textpath", b"foreignobject", b"style",
+    b"img", b"input", b"textarea", b"select", b"label", b"button",
+    b"h1", b"h2", b"h3", b"h4", b"h5", b"h6", b"p", b"span", b"div", b"li",
+})
+
+# Elements the parser closes immediately
+VOID_ELEMENTS = frozenset({
+    b"area", b"base", b"br", b"col", b"embed", b"hr", b"img", b"input", b"keygen", b"link",
+    b"menuitem", b"meta", b"param", b"source", b"track", b"wbr", b"spacer", b"basefont",
+    b"bgsound", b"command", b"frame", b"image", b"isindex", b"nextid",
+})
+
+# Parser states
+TEXT, SCRIPT, STYLE, COMMENT = 0, 1, 2, 3
+
+# What an unfinished construct at the start of the buffer waits for
+ANY, GT, START_TAG = 0, 1, 2
+
+_WHITESPACE = b" \t\n\r\f\v"
+_DASH, _GT = ord("-"), ord(">")
+_EQUALS = -1
+_TAG_SCAN = re.compile(rb"[=>]")
+_AFTER_EQUALS = re.compile(rb"[\s=]*")
+
+
+class HTMLPrefilter:
+    """
+    Prune raw HTML as it streams in, before it reaches the parser
+
+    - <script> bodies are dropped; the tags stay so element counts and
+      attributes are unchanged
+    - <style> text is kept (the contrast check may read it)
+    - inline <svg> keeps its own tag, descendants with role/aria-*/style
+      attributes and <a>, <title>, <desc> and <foreignObject> subtrees;
+      path data and other drawing markup are dropped
+
+    Scanning resumes where the previous chunk stopped: comments stream
+    through as they arrive, and an unfinished tag is only tokenized again
+    once a '>' outside its quoted values has arrived. Should that quick
+    scan and the tokenizer disagree, the tag is retried only after its
+    bytes have doubled. Every byte is therefore looked at a bounded number
+    of times, so 10 MB pages cost no more per byte than small ones. Markup
+    the filter can't tokenize is passed through unchanged.
+    """
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._state = TEXT
+        # Bytes not processed yet: an unfinished construct and what followed it
+        self._buffer = bytearray()
+        self._wait = ANY
+        # Where the search for the construct's end resumes
+        self._scan = 0
+        # Quick scan of an unfinished start tag: None, _EQUALS or the open quote
+        self._quote: Optional[int] = None
+        self._retry_at = 0
+        # How much of a comment's end marker ("--", then whitespace) has been seen
+        self._dashes = 0
+        # Mirror of the parser's open elements: (name, kept, drops_children)
+        self._open: List[Tuple[bytes, bool, bool]] = []
+        self._open_names: Counter = Counter()
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Filter the next chunk, returning the bytes that are ready"""
+        self.bytes_in += len(chunk)
+        self._buffer += chunk
+        if not self._ready():
+            return b""
+
+        out: List[bytes] = []
+        data = bytes(self._buffer)
+        del self._buffer[:self._run(data, out)]
+        return self._emit(out)
+
+    def close(self) -> bytes:
+        """Flush whatever is left at the end of the document"""
+        out: List[bytes] = []
+        data = bytes(self._buffer)
+        # Constructs held back by the quick scan are decided as a single feed would
+        consumed = self._run(data, out) if data else 0
+        if self._state != SCRIPT:
+            # Unfinished markup reaches the parser as is
+            self._text(data[consumed:], out)
+        self._buffer = bytearray()
+        return self._emit(out)
+
+    def _emit(self, out: List[bytes]) -> bytes:
+        data = b"".join(out)
+        self.bytes_out += len(data)
+        return data
+
+    @staticmethod
+    def _text(data: bytes, out: List[bytes]) -> None:
+        # Text is always kept: inside links and buttons even SVG text counts
+        if data:
+            out.append(data)
+
+    def _ready(self) -> bool:
+        """Whether the unfinished construct at the start of the buffer may have ended"""
+        if self._state != TEXT or self._wait == ANY:
+            return True
+        if self._wait == GT:
+            if self._buffer.find(b">", self._scan) < 0:
+                self._scan = len(self._buffer)
+                return False
+            return True
+        if self._retry_at:
+            return len(self._buffer) >= self._retry_at
+        return self._scan_tag()
+
+    def _scan_tag(self) -> bool:
+        """Advance the quick scan of an unfinished start tag; True at a '>' outside quotes"""
+        buffer, pos, end = self._buffer, self._scan, len(self._buffer)
+        while pos < end:
+            if self._quote is None:
+                match = _TAG_SCAN.search(buffer, pos)
+                if not match:
+                    pos = end
+                    break
+                if buffer[match.start()] == _GT:
+                    self._scan = match.start()
+                    return True
+                self._quote = _EQUALS
+                pos = match.end()
+            elif self._quote == _EQUALS:
+                pos = _AFTER_EQUALS.match(buffer, pos).end()
+                if pos == end:
+                    break
+                # A quote right after '=' opens a value; anything else is a bare value
+                self._quote = buffer[pos] if buffer[pos] in b"'\"" else None
+                if self._quote is not None:
+                    pos += 1
+            else:
+                close = buffer.find(self._quote, pos)
+                if close < 0:
+                    pos = end
+                    break
+                self._quote = None
+                pos = close + 1
+        self._scan = pos
+        return False
+
+    def _run(self, data: bytes, out: List[bytes]) -> int:
+        """Process as much of data as possible; return how many bytes were consumed"""
+        retrying_tag = self._wait == START_TAG
+        self._wait = ANY
+        pos = 0
+        end = len(data)
+
+        while pos < end:
+            if self._state == SCRIPT:
+                match = _SCRIPT_END.search(data, pos)
+                if not match:
+                    # Keep a possible partial end tag for the next chunk
+                    return max(pos, end - END_TAG_TAIL)
+                self._state = TEXT
+                pos = match.start()
+
+            elif self._state == STYLE:
+                match = _STYLE_END.search(data, pos)
+                if not match:
+                    split = max(pos, end - END_TAG_TAIL)
+                    self._text(data[pos:split], out)
+                    return split
+                self._text(data[pos:match.start()], out)
+                self._state = TEXT
+                pos = match.start()
+
+            elif self._state == COMMENT:
+                pos = self._comment(data, pos, out)
+                continue
+
+            lt = data.find(b"<", pos)
+            if lt < 0:
+                self._text(data[pos:], out)
+                return end
+            self._text(data[pos:lt], out)
+            pos = lt
+
+            if lt + 1 >= end:
+                return lt
+            next_byte = data[lt + 1:lt + 2]
+
+            if next_byte.isalpha():
+                tag_end = self._start_tag_end(data, lt)
+                if tag_end is None:
+                    self._wait = START_TAG
+                    if lt == 0 and retrying_tag:
+                        # The quick scan saw an end the tokenizer didn't; back off
+                        self._retry_at = 2 * end
+                    else:
+                        self._scan, self._quote, self._retry_at = 1, None, 0
+                    return lt
+                if tag_end < 0:
+                    # Not a tag the filter understands; pass it through
+                    self._text(data[lt:-tag_end], out)
+                    pos = -tag_end
+                else:
+                    self._start_tag(data[lt:tag_end], out)
+                    pos = tag_end
+            elif data.startswith(b"<!--", lt):
+                self._text(b"<!--", out)
+                self._state = COMMENT
+                self._dashes = 0
+                pos = lt + 4
+            elif next_byte in (b"/", b"!", b"?"):
+                tag_end = data.find(b">", lt + 2)
+                if tag_end < 0:
+                    self._wait = GT
+                    self._scan = end - lt
+                    return lt
+                if next_byte == b"/":
+                    self._end_tag(data[lt:tag_end + 1], out)
+                else:
+                    self._text(data[lt:tag_end + 1], out)
+                pos = tag_end + 1
+            else:
+                self._text(b"<", out)
+                pos = lt + 1
+
+        return end
+
+    def _comment(self, data: bytes, pos: int, out: List[bytes]) -> int:
+        """Pass comment text through up to the end marker ('--', whitespace, '>'); return where it stopped"""
+        start, end = pos, len(data)
+        # Finish an end marker that began in the previous chunk
+        while self._dashes and pos < end:
+            byte = data[pos]
+            pos += 1
+            if byte == _GT and self._dashes >= 2:
+                return self._end_comment(data, start, pos, out)
+            if byte == _DASH:
+                self._dashes = 1 if self._dashes == 3 else 2
+            elif byte in _WHITESPACE and self._dashes >= 2:
+                self._dashes = 3
+            else:
+                self._dashes = 0
+
+        if not self._dashes:
+            match = _COMMENT_END.search(data, pos)
+            if match:
+                return self._end_comment(data, start, match.end(), out)
+            # Remember an end marker cut off by the end of the chunk
+            tail = end
+            while tail > pos and data[tail - 1] in _WHITESPACE:
+                tail -= 1
+            if tail - pos >= 2 and data[tail - 2:tail] == b"--":
+                self._dashes = 3 if tail < end else 2
+            elif tail == end > pos and data[end - 1] == _DASH:
+                self._dashes = 1
+        self._text(data[start:end], out)
+        return end
+
+    def _end_comment(self, data: bytes, start: int, stop: int, out: List[bytes]) -> int:
+        self._text(data[start:stop], out)
+        self._state = TEXT
+        self._dashes = 0
+        return stop
+
+    @staticmethod
+    def _start_tag_end(data: bytes, start: int) -> Optional[int]:
+        """
+        End offset of the start tag at start
+
+        Returns None if the tag isn't complete yet, or the negated offset
+        where tokenizing stopped for markup that isn't a well-formed tag.
+        """
+        match = _START_TAG.match(data, start)
+        j = match.end()
+        if data.startswith(b">", j):
+            return j + 1
+        if data.startswith(b"/>", j):
+            return j + 2
+        if data.find(b">", j) < 0:
+            return None
+        # An attribute value whose closing quote hasn't arrived yet
+        value = _QUOTED_VALUE_START.match(data, j)
+        if value and data.find(value.group(1), value.end()) < 0:
+            return None
+        return -max(j, start + 1)
+
+    def _start_tag(self, token: bytes, out: List[bytes]) -> None:
+        name = _TAG_NAME.match(token, 1).group().lower()
+        self_closing = token.endswith(b"/>")
+        in_svg = self._open[-1][2] if self._open else False
+
+        if in_svg:
+            passthrough = name in _SVG_PASSTHROUGH
+            kept = passthrough or _SVG_KEEP_ATTR.search(token) is not None
+            drops_children = name == b"svg" or not passthrough
+        else:
+            kept = True
+            drops_children = name == b"svg"
+
+        if kept:
+            out.append(token)
+        if not self_closing and name not in VOID_ELEMENTS:
+            self._open.append((name, kept, drops_children))
+            self._open_names[name] += 1
+
+        if not self_closing:
+            if name == b"script":
+                self._state = SCRIPT
+            elif name == b"style":
+                self._state = STYLE
+
+    def _end_tag(self, token: bytes, out: List[bytes]) -> None:
+        match = _END_TAG_NAME.match(token)
+        name = match.group(1).lower() if match else b""
+
+        if not self._open_names[name]:
+            out.append(token)
+            return
+
+        # The parser closes the innermost open element with this name, and
+        # everything opened inside it
+        index = len(self._open) - 1
+        while self._open[index][0] != name:
+            index -= 1
+        closed = self._open[index:]
+        del self._open[index:]
+        for closed_name, _, _ in closed:
+            self._open_names[closed_name] -= 1
+        if closed[0][1]:
+            out.append(token)
+        else:
+            # The dropped element's end tag won't reach the parser, so close
+            # the kept elements inside it explicitly
+            for kept_name, kept, _ in reversed(closed[1:]):
+                if kept:
+                    out.append(b"</" + kept_name + b">")
+
+
+def create_prefilter() -> Optional[HTMLPrefilter]:
+    """Return a new prefilter, or None when prefiltering is disabled"""
+    return HTMLPrefilter() if PREFILTER_ENABLED else None
+
+
+def prefilter_html(content: bytes) -> bytes:
+    """Run a whole document through HTMLPrefilter"""
+    prefilter = HTMLPrefilter()
+    return prefilter.feed(content) + prefilter.close()
@@ -0,0 +1,112 @@
+"""
+Fast Responses
+Serializes response bodies with orjson and compresses them based on Accept-Encoding
+"""
+
+import gzip
+import json
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; compression wouldn't pay off
+MIN_COMPRESS_SIZE = 1024
+# Bodies at least this large are compressed in the threadpool, off the event loop
+THREADPOOL_COMPRESS_SIZE = 64 * 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(data: Any) -> bytes:
+    """Encode data as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Encode a body with the given content coding ("br" or "gzip")"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick the best supported content coding from an Accept-Encoding header
+
+    Returns:
+        "br", "gzip" or None for identity
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
+
+    wildcard = weights.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_weight = None, 0.0
+    for coding in candidates:
+        weight = weights.get(coding, wildcard)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response for data the API built itself
+
+    Returning it from an endpoint bypasses FastAPI's response_model
+    validation and jsonable_encoder pass. Large bodies are compressed
+    with the best coding the client accepts; bodies of at least
+    THREADPOOL_COMPRESS_SIZE are compressed in the threadpool when the
+    response is sent, so large reports don't block the event loop.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content: Any, accept_encoding: str = "", status_code: int = 200,
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(content, status_code=status_code, headers=headers)
+        self.headers["Vary"] = "Accept-Encoding"
+
+        self.encoding = negotiate_encoding(accept_encoding) if len(self.body) >= MIN_COMPRESS_SIZE else None
+        self._compressed = False
+        if self.encoding and len(self.body) < THREADPOOL_COMPRESS_SIZE:
+            self._set_body(compress(self.body, self.encoding))
+
+    def _set_body(self, body: bytes) -> None:
+        self.body = body
+        self._compressed = True
+        self.headers["Content-Encoding"] = self.encoding
+        self.headers["Content-Length"] = str(len(body))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.encoding and not self._compressed:
+            self._set_body(await run_in_threadpool(compress, self.body, self.encoding))
+        await super().__call__(scope, receive, send)
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
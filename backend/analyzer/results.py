@@ -0,0 +1,127 @@
+"""
+Result Objects
+Compact slotted types for check results; converted to JSON only at the response boundary
+"""
+
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class IssueType:
+    """Interned issue description and fix template shared by every issue of one kind"""
+    id: int
+    issue: str
+    fix: str
+
+
+# Registry of issue types; an issue refers to its type by index
+ISSUE_TYPES: List[IssueType] = []
+
+
+def register_issue_type(issue: str, fix: str) -> IssueType:
+    """
+    Register an issue type
+
+    Templates may contain str.format placeholders ({0}, {1}, ...) that are
+    filled from the issue's params when the text is needed.
+    """
+    issue_type = IssueType(len(ISSUE_TYPES), sys.intern(issue), sys.intern(fix))
+    ISSUE_TYPES.append(issue_type)
+    return issue_type
+
+
+@dataclass(slots=True)
+class Issue:
+    """A single failed element"""
+    type_id: int
+    element: str
+    params: Tuple[Any, ...] = ()
+
+    @property
+    def issue(self) -> str:
+        template = ISSUE_TYPES[self.type_id].issue
+        return template.format(*self.params) if self.params else template
+
+    @property
+    def fix(self) -> str:
+        template = ISSUE_TYPES[self.type_id].fix
+        return template.format(*self.params) if self.params else template
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"element": self.element, "issue": self.issue, "fix": self.fix}
+
+
+@dataclass(slots=True)
+class CheckResult:
+    """Outcome of one rule check"""
+    total: int
+    passed: int
+    failed: int
+    issues: List[Issue] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "passed": self.passed,
+            "failed": self.failed,
+            "issues": [issue.to_dict() for issue in self.issues]
+        }
+
+
+@dataclass(slots=True)
+class ChecklistItem:
+    """One WCAG checklist row"""
+    check: str
+    wcag: str
+    description: str
+    status: str
+    severity: str
+    total: int
+    passed: int
+    failed: int
+    fix: str
+
+    @property
+    def count(self) -> int:
+        return self.failed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "check": self.check,
+            "wcag": self.wcag,
+            "description": self.description,
+            "status": self.status,
+            "severity": self.severity,
+            "total": self.total,
+            "passed": self.passed,
+            "failed": self.failed,
+            "count": self.failed,
+            "fix": self.fix
+        }
+
+    def to_issue_dict(self) -> Dict[str, Any]:
+        """Summary used in the response's issues list"""
+        return {
+            "check": self.check,
+            "wcag": self.wcag,
+            "severity": self.severity,
+            "fix": self.fix,
+            "count": self.failed
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ChecklistItem":
+        """Rebuild an item from its JSON form (e.g. a stored result)"""
+        return cls(
+            check=data["check"],
+            wcag=data["wcag"],
+            description=data.get("description", ""),
+            status=data["status"],
+            severity=data["severity"],
+            total=data.get("total", 0),
+            passed=data.get("passed", 0),
+            failed=data.get("failed", 0),
+            fix=data.get("fix", "")
+        )
@@ -4,45 +4,125 @@ Implements WCAG 2.1 compliance checks
 """
 
 from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from typing import List, Dict, Optional, Sequence
 import re
 import logging
 
+from analyzer.accname import AccessibleNames
+from analyzer.results import CheckResult, Issue, register_issue_type
+from analyzer.parsing import parse_html
+from analyzer.sampling import Sampler
+from analyzer.tracing import span
+
 logger = logging.getLogger(__name__)
 
+# Issue types, interned once and shared by every issue they describe
+MISSING_ALT = register_issue_type("Missing alt attribute", "Add alt='description' attribute to img tag")
+EMPTY_ALT = register_issue_type("Empty alt text", "Add descriptive alt text or set alt='' if decorative")
+POOR_ALT = register_issue_type("Poor alt text quality", "Replace '{0}' with descriptive alt text")
+MISSING_LABEL = register_issue_type("Form input missing label", "Add <label> element or aria-label attribute")
+MISSING_H1 = register_issue_type("Missing h1 heading", "Add at least one h1 heading to describe page content")
+MULTIPLE_H1 = register_issue_type("Multiple h1 headings", "Use only one h1 per page for main content")
+SKIPPED_HEADING = register_issue_type("Heading hierarchy skipped (h{0} -> h{1})", "Use h{2} instead of h{1}")
+VAGUE_LINK = register_issue_type("Vague or empty link text: '{0}'", "Use descriptive link text or add aria-label")
+IMAGE_LINK_NO_ALT = register_issue_type("Image link missing alt text", "Add alt text to image or descriptive link text")
+INLINE_COLOR = register_issue_type(
+    "Inline color styles detected",
+    "Ensure text meets WCAG AA contrast ratio (4.5:1 for normal text)"
+)
+LOW_CONTRAST_CLASS = register_issue_type(
+    "Potential low contrast (class-based)",
+    "Verify text meets WCAG AA contrast ratio"
+)
+MISSING_LANG = register_issue_type(
+    "Missing lang attribute",
+    "Add lang='en' (or appropriate language) to <html> tag"
+)
+BUTTON_IMAGE_NO_ALT = register_issue_type(
+    "Button with image missing alt text",
+    "Add alt text to image or aria-label to button"
+)
+BUTTON_NO_NAME = register_issue_type(
+    "Button missing accessible name",
+    "Add text content, aria-label, or aria-labelledby"
+)
+HIDDEN_INTERACTIVE = register_issue_type(
+    "Interactive element with aria-hidden='true'",
+    "Remove aria-hidden or make element non-interactive"
+)
+
 
 class RuleBasedAnalyzer:
     """Rule-based WCAG accessibility checker"""
     
-    def __init__(self):
+    CHECKS = (
+        "images", "forms", "headings", "links", "color_contrast", "lang_attribute", "buttons", "aria_labels"
+    )
+    
+    # Checks that judge each element by its own subtree, so results for
+    # disjoint parts of a page add up to the result for the whole page.
+    # (The forms check looks up <label for> page-wide, so it is not local.)
+    LOCAL_CHECKS = ("images", "links", "buttons", "aria_labels")
+    
+    # Checks whose counts are scaled up when their elements were sampled
+    EXTRAPOLATED_CHECKS = ("images", "forms", "links", "buttons", "aria_labels")
+    
+    # Text elements inspected for low-contrast class names
+    CONTRAST_SAMPLE_SIZE = 50
+    
+    def __init__(self, sampler: Optional[Sampler] = None):
         self.min_contrast_ratio_aa = 4.5  # WCAG AA for normal text
         self.min_contrast_ratio_large_aa = 3.0  # WCAG AA for large text
+        self.sampler = sampler or Sampler()
+        self.names: Optional[AccessibleNames] = None  # set per document by analyze_soup
     
-    def analyze(self, html_content: str, url: str) -> Dict[str, Any]:
+    def analyze(self, html_content: str, url: str) -> Dict[str, CheckResult]:
         """
         Run all accessibility checks
         
         Returns:
             Dictionary with check results
         """
-        soup = BeautifulSoup(html_content, "html.parser")
+        return self.analyze_soup(parse_html(html_content))
+    
+    def analyze_soup(self, soup: BeautifulSoup, checks: Sequence[str] = CHECKS,
+                     names: Optional[AccessibleNames] = None) -> Dict[str, CheckResult]:
+        """
+        Run the given checks on an already parsed document or subtree
         
-        results = {
-            "images": self._check_images(soup),
-            "forms": self._check_forms(soup),
-            "headings": self._check_headings(soup),
-            "links": self._check_links(soup),
-            "color_contrast": self._check_color_contrast(soup),
-            "lang_attribute": self._check_lang_attribute(soup),
-            "buttons": self._check_buttons(soup),
-            "aria_labels": self._check_aria_labels(soup),
+        Pass the request's AccessibleNames to share computed names with
+        the ML analyzer; it must cover the whole document when soup is a
+        subtree, so aria-labelledby and <label for> references resolve.
+        
+        Returns:
+            Dictionary with check results
+        """
+        self.names = names or AccessibleNames(soup)
+        check_methods = {
+            "images": self._check_images,
+            "forms": self._check_forms,
+            "headings": self._check_headings,
+            "links": self._check_links,
+            "color_contrast": self._check_color_contrast,
+            "lang_attribute": self._check_lang_attribute,
+            "buttons": self._check_buttons,
+            "aria_labels": self._check_aria_labels,
         }
+        results = {}
+        for check in checks:
+            with span(f"rules.{check}") as check_span:
+                result = results[check] = check_methods[check](soup)
+                check_span.set_attributes(elements=result.total, failed=result.failed)
+        
+        for check in self.EXTRAPOLATED_CHECKS:
+            if check in results:
+                results[check] = self.sampler.extrapolate(check, results[check])
         
         return results
     
-    def _check_images(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_images(self, soup: BeautifulSoup) -> CheckResult:
         """Check WCAG 1.1.1: Images must have alt text"""
-        images = soup.find_all("img")
+        images = self.sampler.sample("images", soup.find_all("img"))
         issues = []
         passed = 0
         
@@ -58,38 +138,26 @@ class RuleBasedAnalyzer:
             
             # Missing alt text
             if alt is None:
-                issues.append({
-                    "element": str(img)[:100],
-                    "issue": "Missing alt attribute",
-                    "fix": "Add alt='description' attribute to img tag"
-                })
+                issues.append(Issue(MISSING_ALT.id, str(img)[:100]))
             # Empty alt text (should be descriptive or decorative)
             elif alt.strip() == "":
-                issues.append({
-                    "element": str(img)[:100],
-                    "issue": "Empty alt text",
-                    "fix": "Add descriptive alt text or set alt='' if decorative"
-                })
+                issues.append(Issue(EMPTY_ALT.id, str(img)[:100]))
             # Poor alt text (too short, generic)
             elif len(alt.strip()) < 3 or alt.lower() in ["image", "img", "photo", "picture"]:
-                issues.append({
-                    "element": str(img)[:100],
-                    "issue": "Poor alt text quality",
-                    "fix": f"Replace '{alt}' with descriptive alt text"
-                })
+                issues.append(Issue(POOR_ALT.id, str(img)[:100], (alt,)))
             else:
                 passed += 1
         
-        return {
-            "total": len(images),
-            "passed": passed,
-            "failed": len(issues),
-            "issues": issues
-        }
+        return CheckResult(
+            total=len(images),
+            passed=passed,
+            failed=len(issues),
+            issues=issues
+        )
     
-    def _check_forms(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_forms(self, soup: BeautifulSoup) -> CheckResult:
         """Check WCAG 1.3.1, 3.3.2: Forms must have labels"""
-        inputs = soup.find_all(["input", "textarea", "select"])
+        inputs = self.sampler.sample("forms", soup.find_all(["input", "textarea", "select"]))
         issues = []
         passed = 0
         
@@ -104,45 +172,20 @@ class RuleBasedAnalyzer:
             if input_type in ["submit", "reset", "button"]:
                 continue
             
-            # Check for label
-            has_label = False
-            
-            # Check for id and associated label
-            input_id = inp.get("id")
-            if input_id:
-                label = soup.find("label", {"for": input_id})
-                if label:
-                    has_label = True
-            
-            # Check for aria-label
-            if inp.get("aria-label"):
-                has_label = True
-            
-            # Check for aria-labelledby
-            if inp.get("aria-labelledby"):
-                has_label = True
-            
-            # Check if wrapped in label
-            if inp.find_parent("label"):
-                has_label = True
-            
-            if not has_label:
-                issues.append({
-                    "element": str(inp)[:100],
-                    "issue": "Form input missing label",
-                    "fix": "Add <label> element or aria-label attribute"
-                })
+            # Named by aria-labelledby, aria-label, <label for>, a wrapping label or title
+            if not self.names.name(inp):
+                issues.append(Issue(MISSING_LABEL.id, str(inp)[:100]))
             else:
                 passed += 1
         
-        return {
-            "total": len(inputs),
-            "passed": passed,
-            "failed": len(issues),
-            "issues": issues
-        }
+        return CheckResult(
+            total=len(inputs),
+            passed=passed,
+            failed=len(issues),
+            issues=issues
+        )
     
-    def _check_headings(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_headings(self, soup: BeautifulSoup) -> CheckResult:
         """Check WCAG 1.3.1: Proper heading hierarchy"""
         headings = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])
         issues = []
@@ -152,17 +195,9 @@ class RuleBasedAnalyzer:
         # Check for h1
         h1_count = len(soup.find_all("h1"))
         if h1_count == 0:
-            issues.append({
-                "element": "Page structure",
-                "issue": "Missing h1 heading",
-                "fix": "Add at least one h1 heading to describe page content"
-            })
+            issues.append(Issue(MISSING_H1.id, "Page structure"))
         elif h1_count > 1:
-            issues.append({
-                "element": "Page structure",
-                "issue": "Multiple h1 headings",
-                "fix": "Use only one h1 per page for main content"
-            })
+            issues.append(Issue(MULTIPLE_H1.id, "Page structure"))
         
         # Check hierarchy
         for heading in headings:
@@ -176,65 +211,49 @@ class RuleBasedAnalyzer:
             
             # Check for skipped levels (e.g., h1 -> h3)
             if level > last_level + 1:
-                issues.append({
-                    "element": str(heading)[:100],
-                    "issue": f"Heading hierarchy skipped (h{last_level} -> h{level})",
-                    "fix": f"Use h{last_level + 1} instead of h{level}"
-                })
+                issues.append(Issue(SKIPPED_HEADING.id, str(heading)[:100], (last_level, level, last_level + 1)))
             else:
                 passed += 1
             
             last_level = level
         
-        return {
-            "total": len(headings),
-            "passed": passed,
-            "failed": len(issues),
-            "issues": issues
-        }
+        return CheckResult(
+            total=len(headings),
+            passed=passed,
+            failed=len(issues),
+            issues=issues
+        )
     
-    def _check_links(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_links(self, soup: BeautifulSoup) -> CheckResult:
         """Check WCAG 2.4.4: Link text should be descriptive"""
-        links = soup.find_all("a", href=True)
+        links = self.sampler.sample("links", soup.find_all("a", href=True))
         issues = []
         passed = 0
         
         vague_texts = ["click here", "read more", "here", "link", "more", ">>", ">>>"]
         
         for link in links:
-            text = link.get_text(strip=True).lower()
-            aria_label = link.get("aria-label", "").lower()
-            
-            # Skip if has aria-label
-            if aria_label:
-                passed += 1
-                continue
+            text = self.names.name(link).lower()
             
-            # Check for empty or vague text
+            # Check for empty or vague names (text, image alt, aria-label...)
             if not text or text in vague_texts:
-                issues.append({
-                    "element": str(link)[:100],
-                    "issue": f"Vague or empty link text: '{text}'",
-                    "fix": "Use descriptive link text or add aria-label"
-                })
-            # Check for image-only links without alt
+                issues.append(Issue(VAGUE_LINK.id, str(link)[:100], (text,)))
+            # Images need alt unless ARIA names the link
+            elif link.get("aria-label", "").strip() or link.get("aria-labelledby"):
+                passed += 1
             elif link.find("img") and not link.find("img").get("alt"):
-                issues.append({
-                    "element": str(link)[:100],
-                    "issue": "Image link missing alt text",
-                    "fix": "Add alt text to image or descriptive link text"
-                })
+                issues.append(Issue(IMAGE_LINK_NO_ALT.id, str(link)[:100]))
             else:
                 passed += 1
         
-        return {
-            "total": len(links),
-            "passed": passed,
-            "failed": len(issues),
-            "issues": issues
-        }
+        return CheckResult(
+            total=len(links),
+            passed=passed,
+            failed=len(issues),
+            issues=issues
+        )
     
-    def _check_color_contrast(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_color_contrast(self, soup: BeautifulSoup) -> CheckResult:
         """Check WCAG 1.4.3: Color contrast (basic check)"""
         # This is a simplified check - full contrast requires CSS parsing
         # We'll flag potential issues based on inline styles
@@ -248,115 +267,80 @@ class RuleBasedAnalyzer:
             style = elem.get("style", "")
             if "color:" in style.lower() or "background" in style.lower():
                 # Flag for manual review (we can't calculate contrast without CSS)
-                issues.append({
-                    "element": str(elem)[:100],
-                    "issue": "Inline color styles detected",
-                    "fix": "Ensure text meets WCAG AA contrast ratio (4.5:1 for normal text)"
-                })
+                issues.append(Issue(INLINE_COLOR.id, str(elem)[:100]))
         
         # Also check for low contrast indicators
         text_elements = soup.find_all(["p", "span", "div", "a", "li"])
-        for elem in text_elements[:50]:  # Sample first 50
+        sampled_text = self.sampler.sample("color_contrast", text_elements, limit=self.CONTRAST_SAMPLE_SIZE)
+        for elem in sampled_text:
             classes = elem.get("class", [])
             class_str = " ".join(classes).lower()
             
             # Common low-contrast class names
             if any(word in class_str for word in ["light", "muted", "gray", "grey", "fade"]):
-                issues.append({
-                    "element": str(elem)[:100],
-                    "issue": "Potential low contrast (class-based)",
-                    "fix": "Verify text meets WCAG AA contrast ratio"
-                })
+                issues.append(Issue(LOW_CONTRAST_CLASS.id, str(elem)[:100]))
         
         passed = max(0, len(text_elements) - len(issues))
         
-        return {
-            "total": len(elements_with_color) + len(text_elements[:50]),
-            "passed": passed,
-            "failed": len(issues),
-            "issues": issues[:10]  # Limit issues
-        }
+        return CheckResult(
+            total=len(elements_with_color) + len(sampled_text),
+            passed=passed,
+            failed=len(issues),
+            issues=issues[:10]  # Limit issues
+        )
     
-    def _check_lang_attribute(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_lang_attribute(self, soup: BeautifulSoup) -> CheckResult:
         """Check WCAG 3.1.1: Language attribute"""
         html_tag = soup.find("html")
         issues = []
         
         if not html_tag or not html_tag.get("lang"):
-            issues.append({
-                "element": "<html> tag",
-                "issue": "Missing lang attribute",
-                "fix": "Add lang='en' (or appropriate language) to <html> tag"
-            })
+            issues.append(Issue(MISSING_LANG.id, "<html> tag"))
         
-        return {
-            "total": 1,
-            "passed": 1 if not issues else 0,
-            "failed": len(issues),
-            "issues": issues
-        }
+        return CheckResult(
+            total=1,
+            passed=1 if not issues else 0,
+            failed=len(issues),
+            issues=issues
+        )
     
-    def _check_buttons(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_buttons(self, soup: BeautifulSoup) -> CheckResult:
         """Check WCAG 4.1.2: Button accessibility"""
-        buttons = soup.find_all(["button", "input"], type=["button", "submit"])
+        buttons = self.sampler.sample("buttons", soup.find_all(["button", "input"], type=["button", "submit"]))
         issues = []
         passed = 0
         
         for btn in buttons:
-            # Check for accessible name
-            has_name = False
-            
-            if btn.get_text(strip=True):
-                has_name = True
-            if btn.get("aria-label"):
-                has_name = True
-            if btn.get("aria-labelledby"):
-                has_name = True
-            if btn.get("title"):
-                has_name = True
-            
             # Image buttons need alt
             img = btn.find("img")
             if img and not img.get("alt"):
-                issues.append({
-                    "element": str(btn)[:100],
-                    "issue": "Button with image missing alt text",
-                    "fix": "Add alt text to image or aria-label to button"
-                })
-            elif not has_name:
-                issues.append({
-                    "element": str(btn)[:100],
-                    "issue": "Button missing accessible name",
-                    "fix": "Add text content, aria-label, or aria-labelledby"
-                })
+                issues.append(Issue(BUTTON_IMAGE_NO_ALT.id, str(btn)[:100]))
+            elif not self.names.name(btn):
+                issues.append(Issue(BUTTON_NO_NAME.id, str(btn)[:100]))
             else:
                 passed += 1
         
-        return {
-            "total": len(buttons),
-            "passed": passed,
-            "failed": len(issues),
-            "issues": issues
-        }
+        return CheckResult(
+            total=len(buttons),
+            passed=passed,
+            failed=len(issues),
+            issues=issues
+        )
     
-    def _check_aria_labels(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _check_aria_labels(self, soup: BeautifulSoup) -> CheckResult:
         """Check for proper ARIA usage"""
         # Check for aria-hidden without proper handling
-        aria_hidden = soup.find_all(attrs={"aria-hidden": "true"})
+        aria_hidden = self.sampler.sample("aria_labels", soup.find_all(attrs={"aria-hidden": "true"}))
         issues = []
         
         # Check for interactive elements that are aria-hidden
         for elem in aria_hidden:
             if elem.name in ["a", "button", "input", "select", "textarea"]:
-                issues.append({
-                    "element": str(elem)[:100],
-                    "issue": "Interactive element with aria-hidden='true'",
-                    "fix": "Remove aria-hidden or make element non-interactive"
-                })
+                issues.append(Issue(HIDDEN_INTERACTIVE.id, str(elem)[:100]))
         
-        return {
-            "total": len(aria_hidden),
-            "passed": len(aria_hidden) - len(issues),
-            "failed": len(issues),
-            "issues": issues
-        }
+        return CheckResult(
+            total=len(aria_hidden),
+            passed=len(aria_hidden) - len(issues),
+            failed=len(issues),
+            issues=issues
+        )
@@ -0,0 +1,151 @@
+"""
+Sampling
+Deterministic sampling of large element sets for time-budgeted analysis
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from analyzer.results import CheckResult
+
+# How many elements a check can process per millisecond of budget; tune
+# against benchmarks if checks get cheaper or more expensive
+ELEMENTS_PER_MS = 10
+MIN_SAMPLE_SIZE = 30
+
+# z-score for 95% confidence intervals
+Z_95 = 1.96
+
+
+@dataclass(slots=True)
+class SampleInfo:
+    """How one check was sampled, and the extrapolated failure count"""
+    population: int
+    sample_size: int
+    failed_estimate: Optional[int] = None
+    failed_ci95: Optional[Tuple[int, int]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"population": self.population, "sample_size": self.sample_size}
+        if self.failed_estimate is not None:
+            data["failed_estimate"] = self.failed_estimate
+            data["failed_ci95"] = list(self.failed_ci95)
+        return data
+
+
+def wilson_interval(failures: int, trials: int, population: int) -> Tuple[float, float]:
+    """95% Wilson score interval for a failure rate, with finite population correction"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = failures / trials
+    fpc = math.sqrt((population - trials) / (population - 1)) if population > 1 else 0.0
+    z = Z_95 * fpc
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+class Sampler:
+    """
+    Pick deterministic, evenly spaced samples of element lists
+
+    Without a limit every element is processed. Sampled checks are
+    recorded so results can report which counts are extrapolated.
+    """
+
+    def __init__(self, max_elements: Optional[int] = None, budget_ms: Optional[int] = None,
+                 started: Optional[float] = None):
+        self.max_elements = max_elements
+        self.budget_ms = budget_ms
+        # time.perf_counter() at which the budget started running
+        self.started = time.perf_counter() if started is None else started
+        self.spent_before_checks_ms = self.elapsed_ms()
+        self.samples: Dict[str, SampleInfo] = {}
+
+    @classmethod
+    def for_budget(cls, budget_ms: Optional[int], started: Optional[float] = None) -> "Sampler":
+        """
+        Sampler sized so the checks fit in what is left of a latency budget
+
+        The budget runs from started (a time.perf_counter() value, usually
+        the start of the request), so time already spent fetching and
+        parsing is taken off what the checks get.
+        """
+        if budget_ms is None:
+            return cls()
+        sampler = cls(budget_ms=budget_ms, started=started)
+        remaining_ms = max(0.0, budget_ms - sampler.spent_before_checks_ms)
+        sampler.max_elements = max(MIN_SAMPLE_SIZE, int(remaining_ms * ELEMENTS_PER_MS))
+        return sampler
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the budget started"""
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def sample(self, check: str, elements: Sequence[Any], limit: Optional[int] = None) -> List[Any]:
+        """
+        Return up to limit (or max_elements) elements spread evenly over the list
+
+        The same page always yields the same sample.
+        """
+        limits = [n for n in (limit, self.max_elements) if n is not None]
+        size = min(limits) if limits else None
+        population = len(elements)
+        if size is None or population <= size:
+            return list(elements)
+
+        self.samples[check] = SampleInfo(population, size)
+        return [elements[i * population // size] for i in range(size)]
+
+    def extrapolate(self, check: str, result: CheckResult) -> CheckResult:
+        """
+        Scale a check's counts from its sample to the whole population
+
+        Adds the failure estimate and its 95% confidence interval to the
+        sample record. Unsampled checks are returned unchanged.
+        """
+        info = self.samples.get(check)
+        if info is None:
+            return result
+
+        evaluated = result.passed + result.failed
+        factor = info.population / info.sample_size
+        low, high = wilson_interval(result.failed, evaluated, round(evaluated * factor))
+
+        info.failed_estimate = round(result.failed * factor)
+        info.failed_ci95 = (math.floor(low * evaluated * factor), math.ceil(high * evaluated * factor))
+
+        return CheckResult(
+            total=info.population,
+            passed=round(result.passed * factor),
+            failed=info.failed_estimate,
+            issues=result.issues
+        )
+
+    def scale(self, check: str, count: int) -> int:
+        """Scale a raw count measured on a check's sample"""
+        info = self.samples.get(check)
+        if info is None:
+            return count
+        return round(count * info.population / info.sample_size)
+
+    def report(self) -> Dict[str, Any]:
+        """Describe the sampling for the response"""
+        return {
+            "budget_ms": self.budget_ms,
+            "max_elements_per_check": self.max_elements,
+            "checks": {check: info.to_dict() for check, info in self.samples.items()},
+            **self.timing()
+        }
+
+    def timing(self) -> Dict[str, Any]:
+        """Time spent against the budget, before the checks and in total, and any overshoot"""
+        elapsed = self.elapsed_ms()
+        return {
+            "spent_before_checks_ms": self.spent_before_checks_ms,
+            "elapsed_ms": elapsed,
+            "overshoot_ms": round(max(0.0, elapsed - self.budget_ms), 1) if self.budget_ms is not None else 0.0
+        }
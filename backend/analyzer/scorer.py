@@ -3,100 +3,267 @@ Scoring Engine
 Calculates overall accessibility score and metrics
 """
 
-from typing import List, Dict, Any
+import json
+import statistics
+from array import array
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 import logging
 
+from analyzer.results import ChecklistItem
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 logger = logging.getLogger(__name__)
 
+# Score bands shown by the dashboard, highest first
+SCORE_BANDS = (("Excellent", 80), ("Good", 60), ("Needs Improvement", 40), ("Poor", 0))
+
+
+@dataclass(frozen=True)
+class WeightProfile:
+    """Tunable weights of the overall score"""
+    name: str = "default"
+    high_rate: float = 0.25  # penalty per unit of high-severity failure rate (max 25%)
+    medium_rate: float = 0.12  # max 12%
+    low_rate: float = 0.05  # max 5%
+    penalty_cap: float = 0.35  # total penalty cap
+    pass_floor: float = 60  # score floor, as a percentage of the passed-check ratio
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WeightProfile":
+        """
+        Build a profile from a JSON object; missing weights keep their defaults
+
+        Raises:
+            ValueError: on unknown keys
+        """
+        known = {field.name for field in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown weight profile keys: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    @classmethod
+    def load(cls, path: str) -> "WeightProfile":
+        """Load a profile from a JSON file, named after the file unless it sets a name"""
+        with open(path, encoding="utf-8") as handle:
+            data = json.load(handle)
+        data.setdefault("name", path)
+        return cls.from_dict(data)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+DEFAULT_PROFILE = WeightProfile()
+
+
+class ScoreColumns:
+    """
+    Per-checklist counts stored column-wise, the input of batch scoring
+
+    Each column is a compact int64 array, so thousands of stored checklists
+    take a few bytes each and can be handed to numpy without copying.
+    """
+
+    # In the argument order of ScoringEngine.score_counts
+    COLUMNS = ("passed", "total_checks", "high", "medium", "low", "elements")
+
+    def __init__(self):
+        for column in self.COLUMNS:
+            setattr(self, column, array("q"))
+
+    def __len__(self) -> int:
+        return len(self.passed)
+
+    def append(self, checklist: Sequence[ChecklistItem]) -> None:
+        """Add one page's checklist"""
+        high = medium = low = passed = elements = 0
+        for item in checklist:
+            if item.status == "pass":
+                passed += 1
+            if item.severity == "High":
+                high += item.failed
+            elif item.severity == "Medium":
+                medium += item.failed
+            elif item.severity == "Low":
+                low += item.failed
+            elements += item.total
+        self.passed.append(passed)
+        self.total_checks.append(len(checklist))
+        self.high.append(high)
+        self.medium.append(medium)
+        self.low.append(low)
+        self.elements.append(elements)
+
+    @classmethod
+    def from_checklists(cls, checklists: Iterable[Sequence[ChecklistItem]]) -> "ScoreColumns":
+        columns = cls()
+        for checklist in checklists:
+            columns.append(checklist)
+        return columns
+
+    def rows(self) -> Iterable[tuple]:
+        return zip(*(getattr(self, column) for column in self.COLUMNS))
+
 
 class ScoringEngine:
     """Calculate accessibility scores"""
-    
-    def __init__(self):
+
+    def __init__(self, profile: Optional[WeightProfile] = None):
         # Penalty weights
         self.HIGH_PENALTY = 5
         self.MEDIUM_PENALTY = 3
         self.LOW_PENALTY = 1
-    
-    def calculate(self, checklist: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.profile = profile or DEFAULT_PROFILE
+
+    def calculate(self, checklist: List[ChecklistItem]) -> Dict[str, Any]:
         """
         Calculate overall score and metrics
-        
+
         Returns:
             Dictionary with score data
         """
         total_checks = len(checklist)
-        passed = sum(1 for item in checklist if item["status"] == "pass")
+        passed = sum(1 for item in checklist if item.status == "pass")
         failed = total_checks - passed
-        
+
         # Count issues by severity (total failed elements)
-        high_issues = sum(item.get("failed", 0) for item in checklist if item["severity"] == "High")
-        medium_issues = sum(item.get("failed", 0) for item in checklist if item["severity"] == "Medium")
-        low_issues = sum(item.get("failed", 0) for item in checklist if item["severity"] == "Low")
-        
+        high_issues = sum(item.failed for item in checklist if item.severity == "High")
+        medium_issues = sum(item.failed for item in checklist if item.severity == "Medium")
+        low_issues = sum(item.failed for item in checklist if item.severity == "Low")
+
+        # Count total elements checked across all categories
+        total_elements = sum(item.total for item in checklist)
+
+        overall_score = self.score_counts(passed, total_checks, high_issues, medium_issues, low_issues, total_elements)
+
+        logger.info(
+            "Scoring: %d/%d checks passed, issues high=%d medium=%d low=%d, %d elements checked, score %.1f",
+            passed, total_checks, high_issues, medium_issues, low_issues, total_elements, overall_score
+        )
+
+        # Calculate percentage
+        pass_percentage = (passed / total_checks * 100) if total_checks > 0 else 0
+
+        return {
+            "overall_score": round(overall_score),
+            "pass_percentage": round(pass_percentage, 1),
+            "total_checks": total_checks,
+            "passed": passed,
+            "failed": failed,
+            "high_issues": high_issues,
+            "medium_issues": medium_issues,
+            "low_issues": low_issues
+        }
+
+    def score_counts(self, passed: int, total_checks: int, high_issues: int, medium_issues: int,
+                     low_issues: int, total_elements: int) -> float:
+        """Unrounded overall score from a checklist's counts"""
+        profile = self.profile
+
         # Base score: Start with percentage of checklist items that passed
         # This is the primary metric - each WCAG check is pass/fail
         base_score = (passed / total_checks * 100) if total_checks > 0 else 100
-        
-        logger.info(f"Scoring: {passed}/{total_checks} checks passed, base_score={base_score}")
-        logger.info(f"Issue counts - High: {high_issues}, Medium: {medium_issues}, Low: {low_issues}")
-        
-        # Apply penalty based on issue density
-        # Count total elements checked across all categories
-        total_elements = sum(item.get("total", 0) for item in checklist)
-        
-        logger.info(f"Total elements checked: {total_elements}")
-        
+
         if total_elements > 0:
-            # Calculate failure rates
-            total_failed_elements = high_issues + medium_issues + low_issues
-            failure_rate = total_failed_elements / total_elements
-            
-            logger.info(f"Failure rate: {failure_rate:.2%} ({total_failed_elements}/{total_elements})")
-            
             # Apply severity-weighted penalties based on failure rate
             # Penalties are proportional to failure rate, not absolute counts
-            high_penalty_rate = high_issues / total_elements
-            medium_penalty_rate = medium_issues / total_elements
-            low_penalty_rate = low_issues / total_elements
-            
-            # Scale penalties (more forgiving)
-            high_penalty = high_penalty_rate * 0.25  # Max 25% penalty
-            medium_penalty = medium_penalty_rate * 0.12  # Max 12% penalty
-            low_penalty = low_penalty_rate * 0.05  # Max 5% penalty
-            
-            total_penalty = min(high_penalty + medium_penalty + low_penalty, 0.35)  # Cap at 35%
-            
-            logger.info(f"Penalties - High: {high_penalty:.2%}, Medium: {medium_penalty:.2%}, Low: {low_penalty:.2%}, Total: {total_penalty:.2%}")
-            
+            high_penalty = high_issues / total_elements * profile.high_rate
+            medium_penalty = medium_issues / total_elements * profile.medium_rate
+            low_penalty = low_issues / total_elements * profile.low_rate
+
+            total_penalty = min(high_penalty + medium_penalty + low_penalty, profile.penalty_cap)
+
             # Apply penalty to base score
             overall_score = base_score * (1 - total_penalty)
         else:
             # No elements found (e.g., very simple page), use base score
-            logger.info("No elements found, using base score")
             overall_score = base_score
-        
+
         # Ensure score reflects passed checks (minimum floor)
         # If most checks pass, score should be reasonable even with some issues
         if passed > 0:
-            min_score = (passed / total_checks) * 60  # At least 60% of passed ratio
+            min_score = (passed / total_checks) * profile.pass_floor
             overall_score = max(overall_score, min_score)
-        
+
         # Final clamp to 0-100
-        overall_score = max(0, min(100, overall_score))
-        
-        logger.info(f"Final score: {overall_score}")
-        
-        # Calculate percentage
-        pass_percentage = (passed / total_checks * 100) if total_checks > 0 else 0
-        
-        return {
-            "overall_score": round(overall_score),
-            "pass_percentage": round(pass_percentage, 1),
-            "total_checks": total_checks,
-            "passed": passed,
-            "failed": failed,
-            "high_issues": high_issues,
-            "medium_issues": medium_issues,
-            "low_issues": low_issues
-        }
+        return max(0, min(100, overall_score))
+
+    def score_batch(self, columns: ScoreColumns) -> Sequence[int]:
+        """
+        Rounded overall scores for many checklists at once
+
+        Vectorized with numpy when it is installed; the result is identical
+        to calling calculate() on each checklist.
+        """
+        if np is None:
+            return array("q", (round(self.score_counts(*row)) for row in columns.rows()))
+
+        profile = self.profile
+        passed, checks, high, medium, low, elements = (
+            np.frombuffer(getattr(columns, column), dtype=np.int64).astype(np.float64)
+            for column in ScoreColumns.COLUMNS
+        )
+        # Same operations in the same order as score_counts, so results match exactly
+        checks_safe = np.where(checks > 0, checks, 1)
+        elements_safe = np.where(elements > 0, elements, 1)
+        base = np.where(checks > 0, passed / checks_safe * 100, 100.0)
+        penalty = np.minimum(
+            high / elements_safe * profile.high_rate
+            + medium / elements_safe * profile.medium_rate
+            + low / elements_safe * profile.low_rate,
+            profile.penalty_cap
+        )
+        score = np.where(elements > 0, base * (1 - penalty), base)
+        score = np.where(passed > 0, np.maximum(score, passed / checks_safe * profile.pass_floor), score)
+        return np.round(np.clip(score, 0, 100)).astype(np.int64)
+
+
+def score_distribution(scores: Sequence[int]) -> Dict[str, Any]:
+    """Summary statistics and dashboard band counts of a set of scores"""
+    ordered = sorted(int(score) for score in scores)
+    if not ordered:
+        return {"count": 0}
+    deciles = statistics.quantiles(ordered, n=10, method="inclusive") if len(ordered) > 1 else [ordered[0]] * 9
+    bands = {name: 0 for name, _ in SCORE_BANDS}
+    for score in ordered:
+        bands[next(name for name, low in SCORE_BANDS if score >= low)] += 1
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 2),
+        "min": ordered[0],
+        "p10": deciles[0],
+        "p50": deciles[4],
+        "p90": deciles[8],
+        "max": ordered[-1],
+        "bands": bands
+    }
+
+
+def compare_profiles(columns: ScoreColumns, baseline: WeightProfile,
+                     candidate: WeightProfile) -> Dict[str, Any]:
+    """
+    Re-score stored checklists under two weight profiles and compare them
+
+    Returns:
+        Both score distributions and the per-page score changes
+    """
+    before = ScoringEngine(baseline).score_batch(columns)
+    after = ScoringEngine(candidate).score_batch(columns)
+    deltas = [int(new) - int(old) for old, new in zip(before, after)]
+    return {
+        "baseline": {"profile": baseline.to_dict(), **score_distribution(before)},
+        "candidate": {"profile": candidate.to_dict(), **score_distribution(after)},
+        "changes": {
+            "changed": sum(1 for delta in deltas if delta),
+            "mean_delta": round(statistics.fmean(deltas), 2) if deltas else 0.0,
+            "max_increase": max(deltas, default=0),
+            "max_decrease": min(deltas, default=0)
+        },
+        "scores": {"baseline": before, "candidate": after}
+    }
@@ -0,0 +1,290 @@
+"""
+Shadow Mode
+Re-runs a sample of production analyses under an alternate engine configuration and compares them
+"""
+
+import multiprocessing
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import logging
+
+from analyzer.logs import configure_logging
+
+logger = logging.getLogger(__name__)
+
+PARSE_MODES = ("selective", "full")
+
+# Per check: (elements checked, elements failed)
+Counts = Dict[str, Tuple[int, int]]
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    """Engine settings a shadow run can change"""
+    parse_mode: Optional[str] = None  # "selective" or "full"; None follows PARSE_MODE
+    parser: Optional[str] = None  # BeautifulSoup parser, e.g. "lxml"; None is html.parser
+
+    @classmethod
+    def parse(cls, spec: str) -> "EngineConfig":
+        """
+        Parse a SHADOW_CONFIG value such as "parse_mode=full" or "parser=lxml"
+
+        Raises:
+            ValueError: on unknown settings or parse modes
+        """
+        known = {field.name for field in fields(cls)}
+        settings = {}
+        for entry in spec.split(","):
+            if not entry.strip():
+                continue
+            key, _, value = entry.partition("=")
+            key, value = key.strip(), value.strip()
+            if key not in known:
+                raise ValueError(f"Unknown shadow engine setting: {key}")
+            settings[key] = value or None
+        if settings.get("parse_mode") not in (None, *PARSE_MODES):
+            raise ValueError(f"parse_mode must be one of {', '.join(PARSE_MODES)}")
+        return cls(**settings)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def checklist_counts(checklist: List[Dict[str, Any]]) -> Counts:
+    return {item["check"]: (item["total"], item["failed"]) for item in checklist}
+
+
+def _measure(html_content: str, url: str, config: EngineConfig) -> Dict[str, Any]:
+    from analyzer.pipeline import check_html
+
+    # Timed without tracemalloc, which slows allocation-heavy code unevenly
+    started = time.perf_counter()
+    checks = check_html(html_content, url, config.parse_mode, config.parser)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    tracemalloc.start()
+    try:
+        check_html(html_content, url, config.parse_mode, config.parser)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "ms": elapsed_ms,
+        "peak_kb": peak / 1024,
+        "score": checks["overall_score"],
+        "counts": checklist_counts(checks["checklist"])
+    }
+
+
+def _init_process(level: int) -> None:
+    from analyzer.warmup import warm_up
+
+    configure_logging(level)
+    # Keep imports and first-call costs out of the first comparison
+    warm_up()
+
+
+def compare_engines(html_content: str, url: str, primary: EngineConfig,
+                    shadow: EngineConfig) -> Dict[str, Dict[str, Any]]:
+    """
+    Time both configurations on one page and take their peak memory
+
+    Runs in the shadow process, so neither the measurement nor tracemalloc
+    touches the serving process.
+
+    Returns:
+        {"primary": ..., "shadow": ...} with ms, peak_kb, score and per-check counts
+    """
+    # Alternate which goes first so warm caches favour neither
+    if random.random() < 0.5:
+        shadow_run = _measure(html_content, url, shadow)
+        primary_run = _measure(html_content, url, primary)
+    else:
+        primary_run = _measure(html_content, url, primary)
+        shadow_run = _measure(html_content, url, shadow)
+    return {"primary": primary_run, "shadow": shadow_run}
+
+
+class ShadowRunner:
+    """
+    Compares a sampled share of analyses against an alternate engine configuration
+
+    Sampled pages go to a single background process, which runs the
+    primary and the shadow configuration on the same HTML. Per-check counts
+    of the shadow run are compared with the result the client got, and the
+    latency and peak memory of both runs are compared with each other. When
+    max_pending comparisons are already waiting, further samples are
+    skipped, so shadow runs can fall behind but never queue up behind
+    production traffic.
+    """
+
+    def __init__(self, config: Optional[EngineConfig] = None, sample_rate: float = 0.01,
+                 max_pending: int = 2, primary: Optional[EngineConfig] = None):
+        self.config = config
+        self.primary = primary or EngineConfig()
+        self.sample_rate = sample_rate if config is not None else 0.0
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        self.sampled = 0
+        self.skipped_busy = 0
+        self.completed = 0
+        self.errors = 0
+        self.identical = 0
+        self.score_changed = 0
+        self.score_delta_sum = 0
+        self.check_diffs: Dict[str, Dict[str, int]] = {}
+        self.totals = {"primary_ms": 0.0, "shadow_ms": 0.0, "primary_peak_kb": 0.0, "shadow_peak_kb": 0.0}
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+    @classmethod
+    def from_env(cls) -> "ShadowRunner":
+        """Configure from SHADOW_CONFIG, SHADOW_SAMPLE_RATE and SHADOW_MAX_PENDING"""
+        spec = os.getenv("SHADOW_CONFIG", "")
+        return cls(
+            EngineConfig.parse(spec) if spec.strip() else None,
+            sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "0.01")),
+            max_pending=int(os.getenv("SHADOW_MAX_PENDING", "2"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.config is not None and self.sample_rate > 0
+
+    def maybe_submit(self, html_content: str, url: str, result: Dict[str, Any]) -> bool:
+        """
+        Compare this analysis in the background if it is sampled
+
+        Returns:
+            True if a shadow run was queued
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.skipped_busy += 1
+                return False
+            self._pending += 1
+            self.sampled += 1
+        served = (result["overall_score"], checklist_counts(result["checklist"]))
+        try:
+            future = self._pool().submit(compare_engines, html_content, url, self.primary, self.config)
+        except (BrokenProcessPool, RuntimeError):
+            self._reset_pool()
+            with self._lock:
+                self._pending -= 1
+                self.errors += 1
+            return False
+        future.add_done_callback(lambda done: self._record(url, served, done))
+        return True
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked: the server process runs threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process,
+                    initargs=(logging.getLogger().level,)
+                )
+            return self._executor
+
+    def _reset_pool(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, url: str, served: Tuple[int, Counts], future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+        try:
+            runs = future.result()
+        except BrokenProcessPool:
+            logger.warning("Shadow process died comparing %s", url)
+            self._reset_pool()
+            with self._lock:
+                self.errors += 1
+            return
+        except Exception:
+            logger.warning("Shadow run failed for %s", url, exc_info=True)
+            with self._lock:
+                self.errors += 1
+            return
+
+        served_score, served_counts = served
+        primary, shadow = runs["primary"], runs["shadow"]
+        differing = {}
+        for check in sorted(set(served_counts) | set(shadow["counts"])):
+            before = served_counts.get(check, (0, 0))
+            after = tuple(shadow["counts"].get(check, (0, 0)))
+            if before != after:
+                differing[check] = {"total": [before[0], after[0]], "failed": [before[1], after[1]]}
+
+        with self._lock:
+            self.completed += 1
+            self.totals["primary_ms"] += primary["ms"]
+            self.totals["shadow_ms"] += shadow["ms"]
+            self.totals["primary_peak_kb"] += primary["peak_kb"]
+            self.totals["shadow_peak_kb"] += shadow["peak_kb"]
+            if shadow["score"] != served_score:
+                self.score_changed += 1
+                self.score_delta_sum += shadow["score"] - served_score
+            for check, diff in differing.items():
+                totals = self.check_diffs.setdefault(check, {"pages": 0, "total_delta": 0, "failed_delta": 0})
+                totals["pages"] += 1
+                totals["total_delta"] += diff["total"][1] - diff["total"][0]
+                totals["failed_delta"] += diff["failed"][1] - diff["failed"][0]
+            if differing or shadow["score"] != served_score:
+                self.recent.append({"url": url, "score": [served_score, shadow["score"]], "checks": differing})
+            else:
+                self.identical += 1
+        if differing:
+            logger.info("Shadow engine differs on %s: %s", url, ", ".join(differing))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self.completed
+            totals = dict(self.totals)
+            stats = {
+                "enabled": self.enabled,
+                "config": self.config.to_dict() if self.config else None,
+                "sample_rate": self.sample_rate,
+                "sampled": self.sampled,
+                "pending": self._pending,
+                "skipped_busy": self.skipped_busy,
+                "completed": completed,
+                "errors": self.errors,
+                "identical": self.identical,
+                "score_changed": self.score_changed,
+                "mean_score_delta": round(self.score_delta_sum / completed, 3) if completed else 0.0,
+                "checks": {check: dict(diff) for check, diff in self.check_diffs.items()},
+                "recent_differences": list(self.recent)
+            }
+        if completed:
+            stats["latency_ms"] = _compare_means(totals["primary_ms"], totals["shadow_ms"], completed)
+            stats["peak_memory_kb"] = _compare_means(totals["primary_peak_kb"], totals["shadow_peak_kb"], completed)
+        return stats
+
+    def shutdown(self) -> None:
+        self._reset_pool()
+
+
+def _compare_means(primary_sum: float, shadow_sum: float, count: int) -> Dict[str, float]:
+    primary, shadow = primary_sum / count, shadow_sum / count
+    return {
+        "primary": round(primary, 1),
+        "shadow": round(shadow, 1),
+        "change_pct": round((shadow - primary) / primary * 100, 1) if primary else 0.0
+    }
@@ -0,0 +1,171 @@
+"""
+Shared Cache
+SQLite-file cache shared by every worker process on a host
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry(NamedTuple):
+    value: bytes
+    meta: Dict[str, Any]
+
+
+class SharedCache:
+    """
+    Size-bounded key/value cache in a local SQLite file
+
+    Every uvicorn/gunicorn worker (and CLI worker process) opening the same
+    file sees the same entries, so adding workers raises hit rates instead
+    of splitting them. Writes are single transactions, so readers never see
+    partial entries. When the total size passes max_bytes, the least
+    recently used entries are evicted.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value BLOB NOT NULL,
+            meta TEXT,
+            size INTEGER NOT NULL,
+            expires REAL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+        CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL);
+        INSERT OR IGNORE INTO totals (id, size) VALUES (0, 0);
+    """
+
+    # Reads refresh an entry's LRU timestamp at most this often, to keep reads cheap
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared across threads, so keep one per
+        # thread, and reopen after a fork so children never reuse the parent's
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        """Return a cached entry, or None if missing or expired"""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, meta, expires, accessed FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None or (row[2] is not None and row[2] < now):
+                self.misses += 1
+                return None
+            if now - row[3] > self.TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                    (now, namespace, key)
+                )
+        except sqlite3.Error as e:
+            logger.warning("Shared cache read failed: %s", e)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return CacheEntry(row[0], json.loads(row[1]) if row[1] else {})
+
+    def set(self, namespace: str, key: str, value: bytes, meta: Optional[Dict[str, Any]] = None,
+            ttl: Optional[float] = None) -> None:
+        """Store an entry atomically, evicting old entries if over the size bound"""
+        size = len(value) + len(key)
+        if size > self.max_bytes:
+            return
+
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute(
+                    "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, meta, size, expires, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, key, value, json.dumps(meta) if meta else None, size,
+                     now + ttl if ttl else None, now)
+                )
+                conn.execute("UPDATE totals SET size = size + ? WHERE id = 0", (size - (old[0] if old else 0),))
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed: %s", e)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT size FROM totals WHERE id = 0").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Evict down to 90% of the bound so eviction doesn't run on every write
+        target = self.max_bytes * 0.9
+        freed = 0
+        while total - freed > target:
+            oldest = conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY accessed LIMIT 100"
+            ).fetchall()
+            if not oldest:
+                break
+            for namespace, key, size in oldest:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                freed += size
+                if total - freed <= target:
+                    break
+        conn.execute("UPDATE totals SET size = size - ? WHERE id = 0", (freed,))
+
+
+_shared_cache: Optional[SharedCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    Return the process-wide cache configured by SHARED_CACHE_PATH
+
+    Set SHARED_CACHE_PATH to an empty string to disable caching.
+    """
+    global _shared_cache
+    path = os.getenv("SHARED_CACHE_PATH", "cache.db")
+    if not path:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None or _shared_cache.path != path:
+            max_bytes = int(os.getenv("SHARED_CACHE_MAX_MB", "256")) * 1024 * 1024
+            _shared_cache = SharedCache(path, max_bytes)
+    return _shared_cache
@@ -0,0 +1,168 @@
+"""
+Sitemap Reader
+Streams page URLs out of sitemaps and sitemap indexes in constant memory
+"""
+
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Iterator, NamedTuple, Optional
+import xml.etree.ElementTree as ET
+import logging
+
+import requests
+
+from analyzer.scraper import WebScraper
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def is_remote(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+class SitemapEntry(NamedTuple):
+    url: str
+    lastmod: Optional[datetime]
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a W3C datetime (e.g. 2024-05-01 or 2024-05-01T10:00:00Z) as UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class SitemapReader:
+    """
+    Lazily yield URLs from sitemap.xml files
+
+    Sources can be URLs (fetched through WebScraper, so the SSRF guard
+    applies) or local paths. Gzipped sitemaps are decompressed while
+    streaming and XML is parsed incrementally, clearing each entry once
+    it has been yielded, so memory stays flat regardless of sitemap size.
+    Sitemap indexes are followed recursively; an index fetched over HTTP
+    may only point at http(s) sitemaps, never at local files.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    MAX_SITEMAP_SIZE = 100 * 1024 * 1024  # decompressed bytes per sitemap
+    MAX_DEPTH = 3
+
+    def __init__(self, scraper: Optional[WebScraper] = None,
+                 last_audited: Optional[Callable[[str], Optional[datetime]]] = None):
+        self.scraper = scraper or WebScraper()
+        self.last_audited = last_audited
+        self.skipped = 0
+        self.rejected = 0
+
+    def read(self, source: str) -> Iterator[SitemapEntry]:
+        """Yield the page entries of a sitemap or sitemap index"""
+        yield from self._read(source, depth=0)
+
+    def _read(self, source: str, depth: int) -> Iterator[SitemapEntry]:
+        if depth > self.MAX_DEPTH:
+            logger.warning("Sitemap nesting too deep, skipping %s", source)
+            return
+
+        remote = is_remote(source)
+        for kind, entry in self._parse(self._open(source)):
+            if kind == "sitemap":
+                if remote and not is_remote(entry.url):
+                    logger.warning("Ignoring non-HTTP sitemap %s listed by %s", entry.url, source)
+                    self.rejected += 1
+                    continue
+                yield from self._read(entry.url, depth + 1)
+            elif not self._is_unchanged(entry):
+                yield entry
+            else:
+                self.skipped += 1
+
+    def _is_unchanged(self, entry: SitemapEntry) -> bool:
+        """True if the page hasn't changed since its last stored audit"""
+        if self.last_audited is None or entry.lastmod is None:
+            return False
+        audited = self.last_audited(entry.url)
+        return audited is not None and entry.lastmod <= audited
+
+    def _open(self, source: str) -> Iterator[bytes]:
+        """Yield the raw (possibly gzipped) bytes of a sitemap"""
+        if is_remote(source):
+            try:
+                response = self.scraper.open_stream(source)
+            except requests.exceptions.RequestException as e:
+                raise ValueError(f"Failed to fetch sitemap {source}: {e}")
+            try:
+                yield from response.iter_content(chunk_size=self.CHUNK_SIZE)
+            finally:
+                response.close()
+        else:
+            with open(source, "rb") as handle:
+                while True:
+                    chunk = handle.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+    def _decompress(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Transparently gunzip a byte stream, enforcing the size limit"""
+        decompressor = None
+        size = 0
+        for chunk in chunks:
+            if decompressor is None:
+                gzipped = chunk[:2] == GZIP_MAGIC
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else False
+            pending = chunk
+            while pending:
+                if decompressor:
+                    data = decompressor.decompress(pending, self.CHUNK_SIZE)
+                    # Drain output held back by max_length before reading more input
+                    pending = decompressor.unconsumed_tail
+                    if decompressor.eof:
+                        # A .gz file may hold several members; inflate them all
+                        pending = decompressor.unused_data
+                        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                else:
+                    data, pending = pending, b""
+                size += len(data)
+                if size > self.MAX_SITEMAP_SIZE:
+                    raise ValueError("Sitemap exceeds maximum size")
+                if data:
+                    yield data
+
+    def _parse(self, chunks: Iterator[bytes]) -> Iterator[tuple]:
+        """Yield ('url' | 'sitemap', SitemapEntry) pairs from a sitemap byte stream"""
+        parser = ET.XMLPullParser(events=("start", "end"))
+        root = None
+        for data in self._decompress(chunks):
+            parser.feed(data)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+
+                kind = elem.tag.rsplit("}", 1)[-1]
+                if kind not in ("url", "sitemap"):
+                    continue
+
+                loc = lastmod = None
+                for child in elem:
+                    name = child.tag.rsplit("}", 1)[-1]
+                    if name == "loc" and child.text:
+                        loc = child.text.strip()
+                    elif name == "lastmod":
+                        lastmod = parse_lastmod(child.text)
+
+                # Drop parsed entries so the tree never grows
+                root.clear()
+                if loc:
+                    yield kind, SitemapEntry(loc, lastmod)
+        parser.close()
@@ -0,0 +1,410 @@
+"""
+Snapshot Archive
+Content-addressed, dictionary-compressed store of the exact HTML each audit analyzed
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+from urllib.parse import urlparse
+import logging
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# zlib can only look back 32 KB, so a longer preset dictionary is wasted
+ZLIB_DICT_SIZE = 32 * 1024
+
+
+def site_of(url: str) -> str:
+    """The host a snapshot belongs to; each host gets its own dictionary"""
+    return (urlparse(url).hostname or "").lower()
+
+
+def build_zlib_dictionary(samples: List[bytes], size: int = ZLIB_DICT_SIZE) -> bytes:
+    """
+    A zlib preset dictionary from lines shared by a site's pages
+
+    Lines found on at least half the samples (the header, navigation and
+    footer markup of a template) are kept, the most common last, since
+    zlib finds matches near the end of the dictionary more cheaply.
+    """
+    pages = Counter()
+    for sample in samples:
+        pages.update(set(line.strip() for line in sample.splitlines() if len(line.strip()) > 8))
+    shared = [line for line, count in pages.items() if count * 2 >= len(samples)]
+    shared.sort(key=lambda line: (pages[line], line))
+    return b"\n".join(shared)[-size:]
+
+
+class SnapshotStore:
+    """
+    Stores page HTML once per distinct content, for exact re-analysis later
+
+    Blobs are keyed by the SHA-256 of their bytes, so a page that did not
+    change between audits costs one index row. They are compressed with
+    zstd (when the zstandard package is installed) or zlib, using a
+    dictionary trained per site once it has train_after pages, and
+    appended to pack files of up to pack_limit bytes. A SQLite index maps
+    each hash to its pack, offset and dictionary, so any snapshot is read
+    with one positioned read and one decompression, without scanning.
+    Several processes may write to one store: appends happen inside the
+    index's write transaction, and an append whose transaction fails is
+    truncated away again.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            site TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            dict_id INTEGER,
+            pack INTEGER NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS blobs_site ON blobs (site, dict_id);
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY,
+            url TEXT NOT NULL,
+            site TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            captured_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS snapshots_site ON snapshots (site, captured_at);
+        CREATE INDEX IF NOT EXISTS snapshots_url ON snapshots (url, captured_at);
+        CREATE TABLE IF NOT EXISTS dictionaries (
+            id INTEGER PRIMARY KEY,
+            site TEXT NOT NULL,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            samples INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS dictionaries_site ON dictionaries (site, codec);
+    """
+
+    def __init__(self, root: str, codec: Optional[str] = None, level: int = 9,
+                 train_after: int = 32, pack_limit: int = 256 * 1024 * 1024):
+        """
+        Open (and create) a store in a directory
+
+        Raises:
+            ValueError: if codec is "zstd" and zstandard is not installed
+        """
+        codec = codec or ("zstd" if zstandard is not None else "zlib")
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package (pip install zstandard)")
+        if codec not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown snapshot codec: {codec}")
+        self.root = root
+        self.codec = codec
+        self.level = level
+        self.train_after = train_after
+        self.pack_limit = pack_limit
+        os.makedirs(os.path.join(root, "packs"), exist_ok=True)
+        self.index_path = os.path.join(root, "index.db")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self.SCHEMA)
+
+        self._dictionaries: Dict[int, tuple] = {}
+        self._readers: Dict[int, int] = {}  # pack -> file descriptor
+        self._training: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.index_path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _pack_path(self, pack: int) -> str:
+        return os.path.join(self.root, "packs", f"pack-{pack:05d}.dat")
+
+    # --------------------------------------------------
+    # Writing
+    # --------------------------------------------------
+    def put(self, url: str, html: str, captured_at: Optional[float] = None) -> str:
+        """
+        Record that url had this HTML, storing the content if it is new
+
+        Training and compression happen before the index's write lock is
+        taken, so other writers only wait for the append and two inserts.
+
+        Returns:
+            The content hash
+        """
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        site = site_of(url)
+        captured_at = captured_at if captured_at is not None else time.time()
+
+        blob = None
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+                dict_id = self._site_dictionary(conn, site)
+                blob = (dict_id, self._compress(data, dict_id))
+
+            conn.execute("BEGIN IMMEDIATE")
+            appended = None
+            try:
+                # Another writer may have stored the same page meanwhile
+                if blob is not None and conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone() is None:
+                    appended = self._append_blob(conn, digest, site, len(data), *blob)
+                conn.execute(
+                    "INSERT INTO snapshots (url, site, hash, captured_at) VALUES (?, ?, ?, ?)",
+                    (url, site, digest, captured_at)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                # Still holding the write lock, so nobody has appended after us
+                if appended is not None:
+                    self._truncate(*appended)
+                conn.execute("ROLLBACK")
+                raise
+        return digest
+
+    def _append_blob(self, conn: sqlite3.Connection, digest: str, site: str, size: int,
+                     dict_id: Optional[int], payload: bytes) -> tuple:
+        """
+        Append a compressed blob to the current pack and index it
+
+        Returns:
+            (pack, offset) where the payload starts, to undo the append
+        """
+        row = conn.execute("SELECT MAX(pack) FROM blobs").fetchone()
+        pack = row[0] or 1
+        path = self._pack_path(pack)
+        if os.path.exists(path) and os.path.getsize(path) + len(payload) > self.pack_limit:
+            pack += 1
+            path = self._pack_path(pack)
+        # The write lock of the transaction keeps other writers from appending meanwhile
+        with open(path, "ab") as handle:
+            offset = handle.tell()
+            try:
+                handle.write(payload)
+                handle.flush()
+            except BaseException:
+                handle.truncate(offset)
+                raise
+        conn.execute(
+            "INSERT INTO blobs (hash, site, codec, dict_id, pack, offset, length, size) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, site, self.codec, dict_id, pack, offset, len(payload), size)
+        )
+        return pack, offset
+
+    def _truncate(self, pack: int, offset: int) -> None:
+        try:
+            os.truncate(self._pack_path(pack), offset)
+        except OSError:
+            # Dead bytes in a pack are harmless: no index row points at them
+            logger.warning("Could not truncate snapshot pack %d back to %d", pack, offset, exc_info=True)
+
+    def _site_dictionary(self, conn: sqlite3.Connection, site: str) -> Optional[int]:
+        """
+        This site's dictionary, trained from its stored pages once there are enough of them
+
+        Runs outside the write transaction: training reads and compresses
+        up to train_after * 4 pages. Concurrent trainers for one site race
+        to insert, and all use whichever dictionary was inserted first.
+        """
+        row = conn.execute(
+            "SELECT id FROM dictionaries WHERE site = ? AND codec = ? ORDER BY id LIMIT 1", (site, self.codec)
+        ).fetchone()
+        if row is not None:
+            return row["id"]
+
+        rows = conn.execute(
+            "SELECT * FROM blobs WHERE site = ? AND dict_id IS NULL ORDER BY rowid LIMIT ?",
+            (site, self.train_after * 4)
+        ).fetchall()
+        if len(rows) < self.train_after:
+            return None
+        with self._lock:
+            if site in self._training:
+                # Another thread of this process is training it; store this page without
+                return None
+            self._training.add(site)
+        try:
+            samples = [self._read_blob(row) for row in rows]
+            data = self._train(samples)
+            if not data:
+                return None
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM dictionaries WHERE site = ? AND codec = ? ORDER BY id LIMIT 1", (site, self.codec)
+                ).fetchone()
+                if row is None:
+                    dict_id = conn.execute(
+                        "INSERT INTO dictionaries (site, codec, data, samples, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (site, self.codec, data, len(samples), time.time())
+                    ).lastrowid
+                    logger.info("Trained a %d-byte %s dictionary for %s from %d pages",
+                                len(data), self.codec, site, len(samples))
+                else:
+                    dict_id = row["id"]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return dict_id
+        finally:
+            with self._lock:
+                self._training.discard(site)
+
+    def _train(self, samples: List[bytes]) -> Optional[bytes]:
+        if self.codec == "zlib":
+            return build_zlib_dictionary(samples) or None
+        try:
+            return zstandard.train_dictionary(64 * 1024, samples, level=self.level).as_bytes()
+        except zstandard.ZstdError as e:
+            logger.info("Could not train a zstd dictionary: %s", e)
+            return None
+
+    def _compress(self, data: bytes, dict_id: Optional[int]) -> bytes:
+        dictionary = self._dictionary(dict_id) if dict_id is not None else None
+        if self.codec == "zstd":
+            dict_data = dictionary[2] if dictionary else None
+            return zstandard.ZstdCompressor(level=self.level, dict_data=dict_data).compress(data)
+        compressor = zlib.compressobj(self.level, zdict=dictionary[1]) if dictionary else zlib.compressobj(self.level)
+        return compressor.compress(data) + compressor.flush()
+
+    # --------------------------------------------------
+    # Reading
+    # --------------------------------------------------
+    def get(self, digest: str) -> Optional[bytes]:
+        """The HTML stored under a hash, or None"""
+        with self._connect() as conn:
+            row = self._blob_row(conn, digest)
+        return self._read_blob(row) if row is not None else None
+
+    def _blob_row(self, conn: sqlite3.Connection, digest: str) -> Optional[sqlite3.Row]:
+        return conn.execute("SELECT * FROM blobs WHERE hash = ?", (digest,)).fetchone()
+
+    def _read_blob(self, row: sqlite3.Row) -> bytes:
+        payload = os.pread(self._reader(row["pack"]), row["length"], row["offset"])
+        dictionary = self._dictionary(row["dict_id"]) if row["dict_id"] is not None else None
+        if row["codec"] == "zstd":
+            if zstandard is None:
+                raise ValueError("Snapshot is zstd-compressed; install the zstandard package to read it")
+            dict_data = dictionary[2] if dictionary else None
+            return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(payload)
+        decompressor = zlib.decompressobj(zdict=dictionary[1]) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(payload) + decompressor.flush()
+
+    def _reader(self, pack: int) -> int:
+        with self._lock:
+            fd = self._readers.get(pack)
+            if fd is None:
+                fd = self._readers[pack] = os.open(self._pack_path(pack), os.O_RDONLY)
+            return fd
+
+    def _dictionary(self, dict_id: int) -> tuple:
+        """(codec, data, prepared zstd dictionary or None), loaded once per process"""
+        with self._lock:
+            dictionary = self._dictionaries.get(dict_id)
+        if dictionary is not None:
+            return dictionary
+        with self._connect() as conn:
+            row = conn.execute("SELECT codec, data FROM dictionaries WHERE id = ?", (dict_id,)).fetchone()
+        data = bytes(row["data"])
+        prepared = None
+        if row["codec"] == "zstd" and zstandard is not None:
+            prepared = zstandard.ZstdCompressionDict(data)
+            prepared.precompute_compress(level=self.level)
+        dictionary = (row["codec"], data, prepared)
+        with self._lock:
+            self._dictionaries[dict_id] = dictionary
+        return dictionary
+
+    def snapshots(self, site: Optional[str] = None, since: Optional[float] = None,
+                  until: Optional[float] = None, latest: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Snapshot records (url, hash, captured_at) in capture order
+
+        With latest, only the newest snapshot of each URL in the period.
+        """
+        conditions, params = [], []
+        if site:
+            conditions.append("site = ?")
+            params.append(site.lower())
+        if since is not None:
+            conditions.append("captured_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("captured_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        if latest:
+            query = f"""
+                SELECT url, hash, MAX(captured_at) AS captured_at FROM snapshots {where}
+                GROUP BY url ORDER BY captured_at
+            """
+        else:
+            query = f"SELECT url, hash, captured_at FROM snapshots {where} ORDER BY id"
+        with self._connect() as conn:
+            for row in conn.execute(query, params):
+                yield {"url": row["url"], "hash": row["hash"], "captured_at": row["captured_at"]}
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot and blob counts and the space saved by deduplication and compression"""
+        with self._connect() as conn:
+            snapshots, referenced = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM snapshots s JOIN blobs b ON b.hash = s.hash"
+            ).fetchone()
+            blobs, raw, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length), 0) FROM blobs"
+            ).fetchone()
+            dictionaries = conn.execute("SELECT COUNT(*) FROM dictionaries").fetchone()[0]
+        return {
+            "snapshots": snapshots,
+            "blobs": blobs,
+            "dictionaries": dictionaries,
+            "html_bytes": referenced,
+            "unique_bytes": raw,
+            "stored_bytes": stored,
+            "ratio": round(referenced / stored, 2) if stored else None
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for fd in self._readers.values():
+                os.close(fd)
+            self._readers.clear()
+
+
+_snapshot_store: Optional[SnapshotStore] = None
+_snapshot_store_lock = threading.Lock()
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """
+    Return the process-wide store configured by SNAPSHOT_DIR
+
+    Snapshots are off unless SNAPSHOT_DIR is set.
+    """
+    global _snapshot_store
+    root = os.getenv("SNAPSHOT_DIR", "")
+    if not root:
+        return None
+    with _snapshot_store_lock:
+        if _snapshot_store is None or _snapshot_store.root != root:
+            _snapshot_store = SnapshotStore(root, codec=os.getenv("SNAPSHOT_CODEC") or None)
+    return _snapshot_store
@@ -0,0 +1,246 @@
+"""
+Template Deduplication
+Analyzes page regions repeated across a site (header, nav, footer, cookie banner) once
+"""
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from analyzer.accname import AccessibleNames
+from analyzer.results import CheckResult, Issue
+from analyzer.rules import RuleBasedAnalyzer
+from analyzer.shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+# Landmarks that are usually the same on every page of a site
+TEMPLATE_TAGS = frozenset({"header", "nav", "footer", "aside"})
+TEMPLATE_ROLES = frozenset({"banner", "navigation", "contentinfo", "complementary"})
+
+# Cookie and consent banners, recognized by id or class
+CONSENT_PATTERN = re.compile(r"cookie|consent|gdpr", re.I)
+
+# Regions must not be counted by a local check themselves or sit inside an
+# element that is (whose text would then depend on the region), since checks
+# only search inside a region
+SELF_CHECKED_TAGS = frozenset({"img", "a", "button", "input", "select", "textarea"})
+
+# Region results kept in memory per process; the shared cache holds the rest
+MAX_MEMORY_TEMPLATES = 1024
+
+
+@dataclass(slots=True)
+class TemplateRef:
+    """A template region found on a page, with its local check results"""
+    id: str
+    region: str
+    results: Dict[str, CheckResult]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "region": self.region,
+            "checks": {check: result.to_dict() for check, result in self.results.items()}
+        }
+
+
+def _is_template_region(tag: Tag) -> bool:
+    if tag.name in SELF_CHECKED_TAGS or tag.has_attr("aria-hidden"):
+        return False
+    if tag.name in TEMPLATE_TAGS or tag.get("role", "").lower() in TEMPLATE_ROLES:
+        return True
+    names = " ".join([tag.get("id", ""), *tag.get("class", [])])
+    return CONSENT_PATTERN.search(names) is not None
+
+
+def _is_local_target(tag: Tag) -> bool:
+    return tag.name in SELF_CHECKED_TAGS or tag.get("aria-hidden") == "true"
+
+
+def _position(tag: Optional[Tag]) -> Tuple[float, float]:
+    if tag is None or tag.sourceline is None:
+        return (float("inf"), 0)
+    return (tag.sourceline, tag.sourcepos)
+
+
+def _references_outside(region: Tag) -> bool:
+    """Whether an element in the region is named by an element outside it"""
+    referencing = region.find_all(attrs={"aria-labelledby": True})
+    if region.has_attr("aria-labelledby"):
+        referencing.append(region)
+    if not referencing:
+        return False
+    ids = {tag["id"] for tag in region.find_all(id=True)}
+    ids.add(region.get("id"))
+    return any(element_id not in ids for tag in referencing for element_id in tag["aria-labelledby"].split())
+
+
+def find_template_regions(soup: BeautifulSoup) -> List[Tag]:
+    """
+    Return the outermost template regions of a page, in document order
+
+    Regions inside <main> belong to the page's own content (article
+    headers, in-page navigation) and are left alone, as are regions inside
+    links or buttons and regions whose names depend on the rest of the
+    page through aria-labelledby.
+    """
+    regions: List[Tag] = []
+    for tag in soup.find_all(_is_template_region):
+        if any(parent.name == "main" or parent.name in SELF_CHECKED_TAGS or (regions and parent is regions[-1])
+               for parent in tag.parents):
+            continue
+        if _references_outside(tag):
+            continue
+        regions.append(tag)
+    return regions
+
+
+def region_label(region: Tag) -> str:
+    """Short human-readable description, e.g. nav#primary or div.cookie-banner"""
+    label = region.name
+    if region.get("id"):
+        label += f"#{region['id']}"
+    elif region.get("class"):
+        label += "." + ".".join(region["class"])
+    if region.get("role"):
+        label += f"[role={region['role']}]"
+    return label
+
+
+def fingerprint(region: Tag) -> str:
+    """
+    Identify a region by its tree; identical regions share results
+
+    Hashes each node in document order, with each tag's child count so the
+    sequence determines the tree. Several times faster than hashing str(region).
+    """
+    digest = hashlib.sha1()
+    for node in (region, *region.descendants):
+        if isinstance(node, NavigableString):
+            digest.update(f"{type(node).__name__}:{node}\0".encode("utf-8"))
+        else:
+            digest.update(f"{node.name}{node.attrs!r}{len(node.contents)}\0".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _dump_results(results: Dict[str, CheckResult]) -> bytes:
+    return json.dumps({
+        check: [result.total, result.passed, result.failed,
+                [[issue.type_id, issue.element, list(issue.params)] for issue in result.issues]]
+        for check, result in results.items()
+    }).encode("utf-8")
+
+
+def _load_results(data: bytes) -> Dict[str, CheckResult]:
+    return {
+        check: CheckResult(total, passed, failed,
+                           [Issue(type_id, element, tuple(params)) for type_id, element, params in issues])
+        for check, (total, passed, failed, issues) in json.loads(data).items()
+    }
+
+
+class TemplateRegistry:
+    """
+    Check results of template regions, shared by every page of a crawl
+
+    A region is analyzed the first time its markup is seen; later pages
+    with the same region reuse the results. With a SharedCache, results
+    are shared by all worker processes and survive between runs.
+    """
+
+    # Bump when the local checks change so cached region results are not reused
+    VERSION = "2"
+
+    def __init__(self, cache: Optional[SharedCache] = None):
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._results: "OrderedDict[str, Dict[str, CheckResult]]" = OrderedDict()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "templates": len(self._results)}
+
+    def region_results(self, region: Tag, analyzer: RuleBasedAnalyzer,
+                       names: Optional[AccessibleNames] = None) -> TemplateRef:
+        """Return the local check results for a region, analyzing it only if unseen"""
+        region_id = fingerprint(region)
+        results = self._results.get(region_id)
+
+        if results is None and self.cache is not None:
+            cached = self.cache.get("template", f"{self.VERSION}:{region_id}")
+            if cached:
+                results = _load_results(cached.value)
+
+        if results is None:
+            self.misses += 1
+            results = analyzer.analyze_soup(region, RuleBasedAnalyzer.LOCAL_CHECKS, names)
+            if self.cache is not None:
+                self.cache.set("template", f"{self.VERSION}:{region_id}", _dump_results(results))
+        else:
+            self.hits += 1
+
+        self._results[region_id] = results
+        self._results.move_to_end(region_id)
+        if len(self._results) > MAX_MEMORY_TEMPLATES:
+            self._results.popitem(last=False)
+
+        return TemplateRef(region_id, region_label(region), results)
+
+    def analyze(self, soup: BeautifulSoup, analyzer: RuleBasedAnalyzer,
+                names: Optional[AccessibleNames] = None) -> Tuple[Dict[str, CheckResult], List[TemplateRef]]:
+        """
+        Run the rule checks on a page, reusing results for known template regions
+
+        Page-wide checks see the whole document. Local checks run on the
+        page without its template regions, and each region's results are
+        added from the registry, so counts match a full analysis. Issues
+        of regions before the page's first checked element (headers,
+        navigation) are listed before the page's own, the others after.
+
+        Returns:
+            Tuple of (rule results for the whole page, template regions found)
+        """
+        local = RuleBasedAnalyzer.LOCAL_CHECKS
+        names = names or AccessibleNames(soup)
+        # Index ids while the regions are attached, so references into them resolve
+        names.index()
+        results = analyzer.analyze_soup(soup, [check for check in RuleBasedAnalyzer.CHECKS if check not in local],
+                                        names)
+
+        regions = find_template_regions(soup)
+        placeholders = []
+        for region in regions:
+            placeholder = soup.new_string("")
+            region.replace_with(placeholder)
+            placeholders.append(placeholder)
+        try:
+            results.update(analyzer.analyze_soup(soup, local, names))
+            content_start = _position(soup.find(_is_local_target))
+        finally:
+            for placeholder, region in zip(placeholders, regions):
+                placeholder.replace_with(region)
+
+        refs = [self.region_results(region, analyzer, names) for region in regions]
+        leading = [ref for ref, region in zip(refs, regions) if _position(region) < content_start]
+        trailing = refs[len(leading):]
+        for check in local:
+            parts = [
+                *(ref.results[check] for ref in leading),
+                results[check],
+                *(ref.results[check] for ref in trailing)
+            ]
+            results[check] = CheckResult(
+                total=sum(part.total for part in parts),
+                passed=sum(part.passed for part in parts),
+                failed=sum(part.failed for part in parts),
+                issues=[issue for part in parts for issue in part.issues]
+            )
+
+        return {check: results[check] for check in RuleBasedAnalyzer.CHECKS}, refs
@@ -0,0 +1,342 @@
+"""
+Tracing
+Per-request traces of the fetch, parse and analysis stages, sent to a pluggable exporter
+"""
+
+import contextvars
+import importlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, TextIO
+import logging
+
+logger = logging.getLogger(__name__)
+
+# W3C trace context header: version-traceid-parentid-flags
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is recorded, at the cost of a method call"""
+
+    recording = False
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        return None
+
+    def set_attributes(self, **attributes: Any) -> None:
+        return None
+
+
+class _UnsampledTrace(_NoopSpan):
+    """Root of a trace that is not recorded; spans started inside it are no-ops too"""
+
+    def __enter__(self) -> "_UnsampledTrace":
+        self._token = _current_span.set(None)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _current_span.reset(self._token)
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+@dataclass(slots=True, eq=False)
+class Span:
+    """
+    One timed stage of a trace
+
+    Used as a context manager: entering makes it the parent of spans
+    started in the same context (including threads started through
+    run_in_threadpool), leaving ends it. The root span exports the whole
+    trace when it ends.
+    """
+    tracer: "Tracer"
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    attributes: Dict[str, Any]
+    trace: List["Span"]  # shared by every span of the trace, in end order
+    sampled: bool
+    root: bool = False
+    start_ns: int = 0
+    end_ns: int = 0
+    status: str = "ok"
+    error: Optional[str] = None
+    _token: Optional[contextvars.Token] = field(default=None, repr=False)
+
+    recording = True
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.status = "error"
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace.append(self)
+        if self.root:
+            self.tracer._finish(self)
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent header value for calls made within this span"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """OpenTelemetry-style JSON representation"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.error} if self.error else {"code": self.status}
+        }
+
+
+# --------------------------------------------------
+# Exporters
+# --------------------------------------------------
+class SpanExporter:
+    """Receives the spans of each finished trace; subclass to send them elsewhere"""
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        return None
+
+
+class ConsoleSpanExporter(SpanExporter):
+    """Prints each trace as an indented tree of span durations"""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        children: Dict[Optional[str], List[Span]] = {}
+        ids = {span.span_id for span in spans}
+        for span in sorted(spans, key=lambda span: span.start_ns):
+            parent = span.parent_id if span.parent_id in ids else None
+            children.setdefault(parent, []).append(span)
+
+        lines = []
+
+        def walk(span: Span, depth: int) -> None:
+            attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+            status = "" if span.status == "ok" else f" [{span.error}]"
+            lines.append(f"{'  ' * depth}{span.name} {span.duration_ms:.1f}ms {attributes}{status}".rstrip())
+            for child in children.get(span.span_id, []):
+                walk(child, depth + 1)
+
+        for root in children.get(None, []):
+            lines.append(f"trace {root.trace_id}")
+            walk(root, 1)
+        with self._lock:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends spans as JSON lines, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        data = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(data)
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps finished spans in a list, for tests"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]) -> None:
+        self.spans.extend(spans)
+
+
+def exporter_from_spec(spec: str) -> Optional[SpanExporter]:
+    """
+    Build an exporter from a TRACE_EXPORTER value
+
+    "none" (or empty) disables tracing, "console" prints traces to stderr,
+    "file" or "file:PATH" appends JSON lines (default traces.jsonl), and
+    "package.module:ClassName" instantiates a custom SpanExporter.
+
+    Raises:
+        ValueError: on an unknown exporter
+    """
+    spec = spec.strip()
+    if spec in ("", "none"):
+        return None
+    if spec == "console":
+        return ConsoleSpanExporter()
+    if spec == "file" or spec.startswith("file:"):
+        return FileSpanExporter(spec[5:] or "traces.jsonl")
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown trace exporter: {spec}")
+    try:
+        return getattr(importlib.import_module(module_name), class_name)()
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"Cannot load trace exporter {spec}: {e}")
+
+
+# --------------------------------------------------
+# Tracer
+# --------------------------------------------------
+class Tracer:
+    """
+    Starts traces and spans and hands finished traces to an exporter
+
+    Head sampling keeps sample_rate of the traces, decided from the trace
+    id so every process agrees on it; an incoming traceparent's sampled
+    flag takes precedence. With slow_ms set, traces not sampled up front
+    are still recorded and exported if they take at least that long.
+    Without an exporter, or for traces that will not be exported, spans
+    are a shared no-op object.
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: float = 1.0,
+                 slow_ms: Optional[float] = None):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.exported = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """Configure from TRACE_EXPORTER, TRACE_SAMPLE_RATE and TRACE_SLOW_MS"""
+        slow_ms = os.getenv("TRACE_SLOW_MS", "")
+        return cls(
+            exporter_from_spec(os.getenv("TRACE_EXPORTER", "none")),
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+            slow_ms=float(slow_ms) if slow_ms else None
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "sample_rate": self.sample_rate,
+            "slow_ms": self.slow_ms,
+            "exported": self.exported,
+            "dropped": self.dropped
+        }
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes: Any):
+        """
+        Start the root span of a request, batch item or crawl page
+
+        A valid traceparent header continues the caller's trace.
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+
+        match = TRACEPARENT_PATTERN.match(traceparent or "")
+        if match:
+            trace_id, parent_id = match.group(1), match.group(2)
+            sampled = int(match.group(3), 16) & 1 == 1
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = int(trace_id[-8:], 16) < self.sample_rate * 0x100000000
+
+        if not sampled and self.slow_ms is None:
+            self.dropped += 1
+            return _UnsampledTrace()
+
+        return Span(self, name, trace_id, _span_id(), parent_id, attributes, [], sampled, root=True)
+
+    def span(self, name: str, **attributes: Any):
+        """Start a child of the current span, or a no-op outside a recorded trace"""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, _span_id(), parent.span_id, attributes, parent.trace, parent.sampled)
+
+    def _finish(self, root: Span) -> None:
+        spans = root.trace
+        if not root.sampled and root.duration_ms < (self.slow_ms or 0):
+            self.dropped += 1
+            return
+        try:
+            self.exporter.export(list(spans))
+            self.exported += 1
+        except Exception:
+            logger.warning("Trace export failed", exc_info=True)
+
+
+def _span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, configured from the environment on first use"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer.from_env()
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> None:
+    """Replace the process-wide tracer, e.g. with one using a custom exporter"""
+    global _tracer
+    _tracer = tracer
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, **attributes: Any):
+    """Start a trace on the process-wide tracer (see Tracer.start_trace)"""
+    return get_tracer().start_trace(name, traceparent, **attributes)
+
+
+def current_span():
+    """The innermost active span, or a no-op outside a recorded trace"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def span(name: str, **attributes: Any):
+    """Start a child span of the current trace on the process-wide tracer"""
+    return get_tracer().span(name, **attributes)
@@ -4,6 +4,7 @@ Utility functions for accessibility analyzer
 
 import re
 from typing import Optional
+from urllib.parse import urlparse
 
 
 def validate_url(url: str) -> bool:
@@ -18,12 +19,26 @@ def validate_url(url: str) -> bool:
     return url_pattern.match(url) is not None
 
 
-def sanitize_html(html: str) -> str:
-    """Basic HTML sanitization"""
-    # Remove script and style tags
-    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    return html
+def normalize_url(raw_url: str) -> str:
+    """
+    Normalize a user-supplied URL
+
+    Raises:
+        ValueError: if the URL is empty or has no host
+    """
+    url_str = (raw_url or "").strip()
+
+    if not url_str:
+        raise ValueError("URL cannot be empty")
+
+    if not url_str.startswith(("http://", "https://")):
+        url_str = "https://" + url_str
+
+    parsed = urlparse(url_str)
+    if not parsed.netloc:
+        raise ValueError("Invalid URL format")
+
+    return url_str
 
 
 def truncate_text(text: str, max_length: int = 100) -> str:
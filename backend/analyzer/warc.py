@@ -0,0 +1,353 @@
+"""
+WARC Reader
+Memory-mapped iteration over the HTML responses of WARC and WARC.gz archives
+"""
+
+import mmap
+import re
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b\x08"
+WARC_MAGIC = b"WARC/1."
+HEADER_END = b"\r\n\r\n"
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+# Bytes inflated to check that a gzip member holds a WARC record
+_PROBE_SIZE = 4096
+# Compressed bytes fed to zlib at a time; what follows the member's end is copied, so keep it small
+_INFLATE_CHUNK = 16 * 1024
+# Longest WARC or HTTP header block accepted
+_MAX_HEADER = 64 * 1024
+
+_CHUNK_SIZE_LINE = re.compile(rb"([0-9a-fA-F]+)[^\r\n]*\r?\n")
+
+
+@dataclass(frozen=True)
+class RecordRef:
+    """Where one record lies in an archive; compressed bytes for .warc.gz"""
+    offset: int
+    length: int
+    warc_type: str
+    target_uri: Optional[str]
+
+
+@dataclass
+class WarcRecord:
+    """One record: its WARC headers and a view of its content block"""
+    offset: int
+    length: int
+    headers: Dict[str, str]
+    block: memoryview
+
+    @property
+    def warc_type(self) -> str:
+        return self.headers.get("warc-type", "")
+
+    @property
+    def target_uri(self) -> Optional[str]:
+        uri = self.headers.get("warc-target-uri")
+        # WARC/1.0 writers sometimes wrap the URI in angle brackets
+        return uri.strip("<>") if uri else None
+
+    @property
+    def date(self) -> Optional[str]:
+        return self.headers.get("warc-date")
+
+    def ref(self) -> RecordRef:
+        return RecordRef(self.offset, self.length, self.warc_type, self.target_uri)
+
+
+def _parse_headers(data: memoryview) -> Dict[str, str]:
+    headers = {}
+    for line in bytes(data).decode("latin-1").split("\r\n")[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+class WarcArchive:
+    """
+    A WARC file, memory-mapped for reading
+
+    Uncompressed archives are walked record by record by hopping over each
+    Content-Length, so bodies are never read until used and are handed out
+    as memoryview slices of the map. In .warc.gz archives each record is
+    its own gzip member (as the WARC spec recommends); a member is
+    inflated only when its record is read. A member holding several
+    records, such as a whole-file gzip, is inflated in memory in one
+    piece and cannot be split: its records all carry the member's offset,
+    the first one its length and the others 0, and read() of that offset
+    returns the first.
+
+    Reading can start at any byte offset: the reader moves forward to the
+    next record boundary, checking that a candidate really starts a record,
+    which lets workers take disjoint byte ranges of one archive.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self._map = b""
+        self._view = memoryview(self._map)
+        self.size = len(self._map)
+        self.gzipped = self._map[:3] == GZIP_MAGIC
+
+    def __enter__(self) -> "WarcArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self._view.release()
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+        except BufferError:
+            # A record's view is still referenced; the map goes when it does
+            pass
+        self._file.close()
+
+    # --------------------------------------------------
+    # Records
+    # --------------------------------------------------
+    def records(self, start: int = 0, end: Optional[int] = None) -> Iterator[WarcRecord]:
+        """
+        Records beginning in [start, end), in file order
+
+        Blocks of uncompressed archives are views of the map, valid until
+        the archive is closed.
+        """
+        end = self.size if end is None else min(end, self.size)
+        offset = self.sync(start)
+        while offset is not None and offset < end:
+            if self.gzipped:
+                records = self._read_member(offset)
+            else:
+                record = self._read_plain(self._map, self._view, offset)
+                records = [record] if record else []
+            if not records:
+                logger.warning("Unreadable WARC record at %s:%d; stopping", self.path, offset)
+                return
+            yield from records
+            offset += records[0].length
+            if self.gzipped:
+                offset = self._skip_padding(offset)
+
+    def index(self, start: int = 0, end: Optional[int] = None) -> List[RecordRef]:
+        """Offsets, lengths, types and URIs of the records beginning in [start, end)"""
+        return [record.ref() for record in self.records(start, end)]
+
+    def read(self, offset: int) -> Optional[WarcRecord]:
+        """The record at a known offset (e.g. from index()), or None if there is none"""
+        if self.gzipped:
+            records = self._read_member(offset, limit=1)
+            return records[0] if records else None
+        return self._read_plain(self._map, self._view, offset)
+
+    @staticmethod
+    def _read_plain(data, view: memoryview, offset: int) -> Optional[WarcRecord]:
+        """Parse the uncompressed record at offset of data (the map, or an inflated member)"""
+        if data[offset:offset + len(WARC_MAGIC)] != WARC_MAGIC:
+            return None
+        header_end = data.find(HEADER_END, offset, offset + _MAX_HEADER)
+        if header_end < 0:
+            return None
+        headers = _parse_headers(view[offset:header_end])
+        try:
+            content_length = int(headers["content-length"])
+        except (KeyError, ValueError):
+            return None
+        block_start = header_end + len(HEADER_END)
+        block_end = block_start + content_length
+        if block_end > len(data):
+            return None
+        # Records end with two CRLFs, which some writers leave out at the end of the file
+        length = block_end - offset
+        if data[block_end:block_end + 4] == HEADER_END:
+            length += 4
+        return WarcRecord(offset, length, headers, view[block_start:block_end])
+
+    def _read_member(self, offset: int, limit: Optional[int] = None) -> List[WarcRecord]:
+        """The records (up to limit) in the gzip member at offset; empty if there are none"""
+        if self._map[offset:offset + 3] != GZIP_MAGIC:
+            return []
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parts = []
+        position = offset
+        try:
+            while not inflater.eof and position < self.size:
+                chunk = self._view[position:position + _INFLATE_CHUNK]
+                parts.append(inflater.decompress(chunk))
+                position += len(chunk)
+        except zlib.error:
+            return []
+        if not inflater.eof:
+            return []
+        length = position - len(inflater.unused_data) - offset
+        data = b"".join(parts)
+        view = memoryview(data)
+
+        records: List[WarcRecord] = []
+        start = 0
+        while start < len(data) and (limit is None or len(records) < limit):
+            record = self._read_plain(data, view, start)
+            if record is None:
+                if records and data[start:].strip():
+                    logger.warning("Unreadable WARC record in the member at %s:%d", self.path, offset)
+                break
+            records.append(record)
+            start += record.length
+        for record in records:
+            record.offset, record.length = offset, 0
+        if records:
+            records[0].length = length
+        return records
+
+    def _skip_padding(self, offset: int) -> int:
+        # Some writers pad between members; move to the next gzip header
+        if self._map[offset:offset + 3] == GZIP_MAGIC or offset >= self.size:
+            return offset
+        found = self._map.find(GZIP_MAGIC, offset)
+        return found if found >= 0 else self.size
+
+    # --------------------------------------------------
+    # Splitting
+    # --------------------------------------------------
+    def sync(self, position: int) -> Optional[int]:
+        """Offset of the first record starting at or after position, or None"""
+        if position <= 0:
+            return 0 if self.size else None
+        while position < self.size:
+            if self.gzipped:
+                candidate = self._map.find(GZIP_MAGIC, position)
+                if candidate < 0:
+                    return None
+                if self._probe_member(candidate):
+                    return candidate
+            else:
+                candidate = self._map.find(WARC_MAGIC, position)
+                if candidate < 0:
+                    return None
+                # A record starts after the blank line ending the previous one
+                if self._map[candidate - 4:candidate] == HEADER_END and self._read_plain(
+                        self._map, self._view, candidate) is not None:
+                    return candidate
+            position = candidate + 1
+        return None
+
+    def _probe_member(self, offset: int) -> bool:
+        """Whether a gzip header at offset starts a member that inflates to a WARC record"""
+        try:
+            head = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(
+                self._view[offset:offset + _PROBE_SIZE], len(WARC_MAGIC))
+        except zlib.error:
+            return False
+        return head == WARC_MAGIC
+
+    def split(self, parts: int) -> List[Tuple[int, int]]:
+        """
+        Divide the archive into up to parts byte ranges, each starting at a record
+
+        Returns:
+            (start, end) offsets for records(); empty ranges are left out
+        """
+        starts = []
+        for index in range(parts):
+            start = self.sync(self.size * index // parts)
+            if start is not None and start not in starts:
+                starts.append(start)
+        return list(zip(starts, starts[1:] + [self.size]))
+
+
+# --------------------------------------------------
+# HTTP responses
+# --------------------------------------------------
+def parse_http_response(block: memoryview) -> Optional[Tuple[int, Dict[str, str], memoryview]]:
+    """
+    Split an application/http response block into status, headers and body
+
+    Chunked and gzip/deflate-encoded bodies are decoded (into new bytes);
+    otherwise the body is a view of the block.
+
+    Returns:
+        (status, lower-cased headers, body), or None if the block is not an HTTP response
+    """
+    head = bytes(block[:4096])
+    header_end = head.find(HEADER_END)
+    if header_end < 0:
+        head = bytes(block[:_MAX_HEADER])
+        header_end = head.find(HEADER_END)
+    if not head.startswith(b"HTTP/") or header_end < 0:
+        return None
+    lines = head[:header_end].decode("latin-1").split("\r\n")
+    try:
+        status = int(lines[0].split()[1])
+    except (IndexError, ValueError):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+
+    body: memoryview = block[header_end + len(HEADER_END):]
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = memoryview(_dechunk(body))
+    encoding = headers.get("content-encoding", "").lower()
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        try:
+            wbits = 16 + zlib.MAX_WBITS if encoding != "deflate" else zlib.MAX_WBITS
+            body = memoryview(zlib.decompress(body, wbits))
+        except zlib.error:
+            return None
+    return status, headers, body
+
+
+def _dechunk(body: memoryview) -> bytes:
+    data = bytes(body)
+    out = []
+    position = 0
+    while True:
+        match = _CHUNK_SIZE_LINE.match(data, position)
+        if match is None:
+            break
+        size = int(match.group(1), 16)
+        if size == 0:
+            break
+        start = match.end()
+        out.append(data[start:start + size])
+        position = start + size + 2
+    return b"".join(out)
+
+
+def html_responses(archive: WarcArchive, start: int = 0,
+                   end: Optional[int] = None) -> Iterator[Tuple[WarcRecord, memoryview]]:
+    """
+    The successful HTML responses beginning in [start, end), with their bodies
+
+    Skips requests, metadata, revisit records, non-200 responses and
+    non-HTML content.
+    """
+    for record in archive.records(start, end):
+        if record.warc_type != "response" or not record.target_uri:
+            continue
+        if not record.headers.get("content-type", "").startswith("application/http"):
+            continue
+        response = parse_http_response(record.block)
+        if response is None:
+            continue
+        status, headers, body = response
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if status == 200 and content_type in HTML_TYPES:
+            yield record, body
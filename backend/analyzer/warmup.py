@@ -0,0 +1,39 @@
+"""
+Warm-up
+Defers loading the analysis pipeline until it is needed, with an optional warm-up
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Small page that touches every check, so parsers and regexes get initialized
+WARMUP_HTML = (
+    b"<html lang='en'><head><title>Warm-up</title></head><body>"
+    b"<h1>Warm-up</h1><h2>Section</h2>"
+    b"<img src='a.png' alt='Warm-up illustration'>"
+    b"<a href='/'>Home page</a>"
+    b"<form><label for='q'>Search</label><input id='q' type='text'></form>"
+    b"<button type='submit'>Go</button>"
+    b"<p class='muted' style='color: #777'>Text</p>"
+    b"</body></html>"
+)
+
+
+def warm_up() -> float:
+    """
+    Import the pipeline and run one tiny analysis
+
+    Returns:
+        Seconds spent warming up
+    """
+    started = time.perf_counter()
+
+    from analyzer.pipeline import analyze_content
+
+    analyze_content(WARMUP_HTML, "warmup")
+
+    elapsed = time.perf_counter() - started
+    logger.info("Warm-up finished in %.2fs", elapsed)
+    return elapsed
@@ -0,0 +1,315 @@
+"""
+Distributed Work Queue
+Durable per-page task queue and result store for worker processes on one or more hosts
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A task is (kind, source), as in the CLI: kind is "url" or "file"
+Task = Tuple[str, str]
+
+
+class TaskQueue:
+    """
+    SQLite-backed queue of page tasks, with their results in the same file
+
+    Workers claim small batches of tasks under a lease and renew it while
+    they work. Tasks whose lease expires (the worker crashed or lost the
+    host) are claimed again, up to max_attempts; a task's result is only
+    accepted from the worker that currently holds it.
+
+    On one host the database uses WAL. For workers on several hosts, put it
+    on a shared filesystem with working POSIX locks and create it with
+    wal=False, since WAL needs shared memory between the processes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            source TEXT NOT NULL UNIQUE,
+            status TEXT NOT NULL DEFAULT 'queued',
+            worker TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, id);
+        CREATE TABLE IF NOT EXISTS results (
+            task_id INTEGER PRIMARY KEY,
+            record TEXT NOT NULL,
+            worker TEXT NOT NULL,
+            completed_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str, wal: Optional[bool] = None, max_attempts: int = 3):
+        """
+        Open (and create) a queue
+
+        wal sets the journal mode of a new queue; None keeps the file's mode.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            if wal is not None:
+                conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, tasks: Iterable[Task], chunk_size: int = 1000) -> int:
+        """
+        Add tasks, skipping sources already in the queue
+
+        Returns:
+            Number of tasks added
+        """
+        added = 0
+        chunk: List[Tuple[str, str, float]] = []
+        with self._connect() as conn:
+            def flush() -> int:
+                conn.execute("BEGIN IMMEDIATE")
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (kind, source, updated_at) VALUES (?, ?, ?)", chunk
+                )
+                conn.execute("COMMIT")
+                chunk.clear()
+                return conn.total_changes - before
+
+            for kind, source in tasks:
+                chunk.append((kind, source, time.time()))
+                if len(chunk) >= chunk_size:
+                    added += flush()
+            if chunk:
+                added += flush()
+        return added
+
+    def claim(self, worker_id: str, lease_seconds: float, limit: int = 1) -> List[Dict[str, Any]]:
+        """
+        Atomically take up to limit runnable tasks, oldest first
+
+        Tasks left running under an expired lease are runnable again; those
+        already tried max_attempts times are marked failed instead, so a
+        page that kills its worker cannot stall the queue.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                """
+                UPDATE tasks SET status = 'failed', error = 'Worker lease expired ' || attempts || ' times',
+                    worker = NULL, lease_expires = NULL, updated_at = ?
+                WHERE status = 'running' AND lease_expires < ? AND attempts >= ?
+                """,
+                (now, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                """
+                SELECT id, kind, source, attempts FROM tasks
+                WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)
+                ORDER BY id
+                LIMIT ?
+                """,
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                """
+                UPDATE tasks SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1,
+                    updated_at = ?
+                WHERE id = ?
+                """,
+                [(worker_id, now + lease_seconds, now, row["id"]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        return [
+            {"id": row["id"], "kind": row["kind"], "source": row["source"], "attempts": row["attempts"] + 1}
+            for row in rows
+        ]
+
+    def renew(self, worker_id: str, lease_seconds: float) -> int:
+        """
+        Extend the leases of every task a worker holds
+
+        Returns:
+            Number of tasks still held
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE worker = ? AND status = 'running'",
+                (time.time() + lease_seconds, worker_id)
+            )
+            return cursor.rowcount
+
+    def complete(self, task_id: int, worker_id: str, record: Dict[str, Any]) -> bool:
+        """
+        Store a task's result and mark it done (or failed, for error records)
+
+        Returns:
+            False if the worker no longer holds the task, in which case the
+            result is discarded
+        """
+        now = time.time()
+        error = record.get("error")
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                """
+                UPDATE tasks SET status = ?, error = ?, lease_expires = NULL, updated_at = ?
+                WHERE id = ? AND worker = ? AND status = 'running'
+                """,
+                ("failed" if error else "done", error, now, task_id, worker_id)
+            )
+            if cursor.rowcount == 0:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO results (task_id, record, worker, completed_at) VALUES (?, ?, ?, ?)",
+                (task_id, json.dumps(record), worker_id, now)
+            )
+            conn.execute("COMMIT")
+        return True
+
+    def release(self, worker_id: str) -> int:
+        """Put a stopping worker's unfinished tasks back in the queue"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE tasks SET status = 'queued', worker = NULL, lease_expires = NULL,
+                    attempts = attempts - 1, updated_at = ?
+                WHERE worker = ? AND status = 'running'
+                """,
+                (time.time(), worker_id)
+            )
+            return cursor.rowcount
+
+    def requeue_failed(self) -> int:
+        """Queue failed tasks again, e.g. after an outage"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE tasks SET status = 'queued', worker = NULL, error = NULL, attempts = 0, updated_at = ?
+                WHERE status = 'failed'
+                """,
+                (time.time(),)
+            )
+            return cursor.rowcount
+
+    def pending(self) -> int:
+        """Tasks queued or running"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Task counts by status, and results and throughput by worker"""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            workers = conn.execute(
+                """
+                SELECT worker, COUNT(*) AS pages, MIN(completed_at) AS first, MAX(completed_at) AS last
+                FROM results GROUP BY worker ORDER BY worker
+                """
+            ).fetchall()
+            span = conn.execute("SELECT MIN(completed_at), MAX(completed_at), COUNT(*) FROM results").fetchone()
+        elapsed = (span[1] - span[0]) if span[2] > 1 else 0
+        return {
+            "tasks": {status: counts.get(status, 0) for status in ("queued", "running", "done", "failed")},
+            "results": span[2],
+            "pages_per_second": round((span[2] - 1) / elapsed, 2) if elapsed > 0 else None,
+            "workers": {row["worker"]: row["pages"] for row in workers}
+        }
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        """Stored result records in queue order"""
+        with self._connect() as conn:
+            for row in conn.execute("SELECT record FROM results ORDER BY task_id"):
+                yield json.loads(row["record"])
+
+
+class QueueWorker:
+    """
+    Claims tasks from a TaskQueue and runs them until the queue is drained
+
+    A heartbeat thread renews the worker's leases every third of the lease
+    while a page is being analyzed, so only a worker that stopped renewing
+    (crashed, hung or cut off) has its tasks taken over.
+    """
+
+    def __init__(self, queue: TaskQueue, process: Callable[[Task], Tuple[Dict[str, Any], int]],
+                 worker_id: Optional[str] = None, lease_seconds: float = 120, batch_size: int = 4,
+                 poll_interval: float = 2.0, wait: bool = False):
+        self.queue = queue
+        self.process = process
+        # Random suffix: a restarted container often has the same hostname and pid,
+        # and must not renew or complete the tasks its predecessor left behind
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.wait = wait
+        self.processed = 0
+        self._stopping = threading.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def run(self) -> int:
+        """
+        Work until the queue has nothing queued or running (or forever with wait)
+
+        Returns:
+            Number of tasks processed
+        """
+        heartbeat = threading.Thread(target=self._heartbeat, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            while not self._stopping.is_set():
+                tasks = self.queue.claim(self.worker_id, self.lease_seconds, self.batch_size)
+                if not tasks:
+                    # Other workers' tasks may still come back if their leases expire
+                    if not self.wait and self.queue.pending() == 0:
+                        break
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                for task in tasks:
+                    if self._stopping.is_set():
+                        break
+                    record, _ = self.process((task["kind"], task["source"]))
+                    if not self.queue.complete(task["id"], self.worker_id, record):
+                        logger.warning("Lost the lease on %s; result discarded", task["source"])
+                    self.processed += 1
+        finally:
+            self._stopping.set()
+            released = self.queue.release(self.worker_id)
+            if released:
+                logger.info("Released %d unfinished tasks", released)
+        return self.processed
+
+    def _heartbeat(self) -> None:
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self.queue.renew(self.worker_id, self.lease_seconds)
+            except sqlite3.Error:
+                logger.warning("Lease renewal failed", exc_info=True)
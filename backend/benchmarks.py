@@ -0,0 +1,321 @@
+"""
+Benchmark scripts for the Accessibility Analyzer backend
+Run from the backend directory, e.g.:
+
+    python benchmarks.py startup --budget 3.0
+    python benchmarks.py memory --elements 20000
+    python benchmarks.py serialize --issues 5000
+    python benchmarks.py cache --workers 1 2 4 8
+    python benchmarks.py parse --components 2000
+    python benchmarks.py prefilter --files saved/*.html
+    python benchmarks.py templates --pages 200
+"""
+
+import argparse
+import gc
+import os
+import random
+import tempfile
+from multiprocessing import Pool
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+from pages import site_page, spa_shell_page, synthetic_page
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+STARTUP_TIMEOUT = 60  # seconds before giving up on a server that never answers
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_startup(args: argparse.Namespace) -> int:
+    """Time from process start to the first successful /health response"""
+    print(f"Measuring cold start to first /health (STARTUP_MODE={args.mode})...")
+    timings = []
+
+    for run in range(args.runs):
+        port = free_port()
+        env = dict(os.environ, STARTUP_MODE=args.mode)
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env
+        )
+        try:
+            while True:
+                if server.poll() is not None:
+                    print("✗ Server exited before answering /health")
+                    return 1
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                        if response.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.01)
+                if time.perf_counter() - started > STARTUP_TIMEOUT:
+                    print("✗ /health never answered")
+                    return 1
+            timings.append(time.perf_counter() - started)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f"  run {run + 1}: {timings[-1]:.3f}s")
+
+    worst = max(timings)
+    if worst > args.budget:
+        print(f"✗ Startup took {worst:.3f}s, over the {args.budget:.3f}s budget")
+        return 1
+    print(f"✓ Startup within budget: worst {worst:.3f}s <= {args.budget:.3f}s")
+    return 0
+
+
+def bench_memory(args: argparse.Namespace) -> int:
+    """Memory allocated per request by rule results and by the whole pipeline"""
+    import logging
+    from analyzer.pipeline import analyze_html
+    from analyzer.rules import RuleBasedAnalyzer
+
+    logging.disable(logging.INFO)
+    html = synthetic_page(args.elements)
+    print(f"Synthetic page: {args.elements} elements, {len(html) / 1024:.0f} KB")
+
+    # Retained size of the rule results once the parse tree is gone
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = RuleBasedAnalyzer().analyze(html, "benchmark")
+    gc.collect()  # parse trees are cyclic; free them before measuring
+    after = tracemalloc.take_snapshot()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del results
+    gc.collect()
+
+    # Peak allocation for one full analysis
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    analyze_html(html, "benchmark", {})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  rule results retained: {retained / 1024:.0f} KB in {blocks} allocations")
+    print(f"  pipeline peak:         {(peak - baseline) / (1024 * 1024):.1f} MB")
+    return 0
+
+
+def bench_serialize(args: argparse.Namespace) -> int:
+    """Latency and payload size of the standard and fast response paths"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from analyzer.responses import FastJSONResponse, brotli
+    from main import AnalyzeResponse
+
+    issue = {"check": "Images have alt text", "wcag": "1.1.1", "severity": "High",
+             "fix": "Add alt='description' attribute to img tag", "count": 3}
+    item = dict(issue, description="All images must have descriptive alt text or be marked as decorative",
+                status="fail", total=10, passed=7, failed=3)
+    data = {
+        "url": "https://example.com",
+        "overall_score": 42,
+        "summary": {"total_checks": args.issues, "passed": 0, "failed": args.issues,
+                    "high_issues": args.issues, "medium_issues": 0, "low_issues": 0},
+        "checklist": [dict(item, check=f"Check {i}") for i in range(args.issues)],
+        "issues": [dict(issue, check=f"Check {i}") for i in range(args.issues)],
+        "metadata": {"title": "Benchmark", "timestamp": "2024-01-01T00:00:00", "html_size": 1024}
+    }
+
+    def standard() -> bytes:
+        return JSONResponse(jsonable_encoder(AnalyzeResponse(**data))).body
+
+    paths = [
+        ("standard (validate + json)", standard),
+        ("fast, identity", lambda: FastJSONResponse(data).body),
+        ("fast, gzip", lambda: FastJSONResponse(data, accept_encoding="gzip").body),
+    ]
+    if brotli is not None:
+        paths.append(("fast, br", lambda: FastJSONResponse(data, accept_encoding="br").body))
+
+    print(f"Response with {args.issues} issues and checklist items ({args.runs} runs each):")
+    for name, render in paths:
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            body = render()
+        elapsed_ms = (time.perf_counter() - started) / args.runs * 1000
+        print(f"  {name:28s} {elapsed_ms:8.2f} ms  {len(body) / 1024:8.1f} KB")
+    return 0
+
+
+def _cache_worker(task: tuple) -> tuple:
+    """Replay a slice of requests against a private or shared cache; returns (hits, requests)"""
+    from analyzer.shared_cache import SharedCache
+
+    keys, shared_path = task
+    cache = SharedCache(shared_path) if shared_path else None
+    private = {}
+    value = b"x" * 10 * 1024
+    hits = 0
+    for key in keys:
+        if cache is not None:
+            if cache.get("bench", key):
+                hits += 1
+            else:
+                cache.set("bench", key, value)
+        elif key in private:
+            hits += 1
+        else:
+            private[key] = value
+    return hits, len(keys)
+
+
+def bench_cache(args: argparse.Namespace) -> int:
+    """Hit rate of per-worker caches vs the shared cache as workers are added"""
+    rng = random.Random(42)
+    # Popular pages are requested far more often than the long tail
+    weights = [1 / (rank + 1) for rank in range(args.keys)]
+    stream = [f"page-{k}" for k in rng.choices(range(args.keys), weights, k=args.requests)]
+
+    print(f"{args.requests} requests over {args.keys} pages (Zipf-like):")
+    print(f"  {'workers':>7}  {'per-worker hit rate':>20}  {'shared hit rate':>16}")
+    for workers in args.workers:
+        slices = [stream[i::workers] for i in range(workers)]
+        with tempfile.TemporaryDirectory() as tmp:
+            rates = []
+            for shared_path in (None, os.path.join(tmp, "cache.db")):
+                with Pool(workers) as pool:
+                    counts = pool.map(_cache_worker, [(keys, shared_path) for keys in slices])
+                rates.append(sum(h for h, _ in counts) / sum(n for _, n in counts))
+        print(f"  {workers:>7}  {rates[0]:>19.1%}  {rates[1]:>15.1%}")
+    return 0
+
+
+def bench_parse(args: argparse.Namespace) -> int:
+    """Tree build time and memory, full parse vs selective parse"""
+    from analyzer.parsing import parse_html
+
+    html = spa_shell_page(args.components)
+    print(f"SPA shell: {args.components} components, {len(html) / 1024:.0f} KB")
+    print(f"  {'mode':<10}  {'build':>9}  {'tree peak':>10}")
+
+    for mode in ("full", "selective"):
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            parse_html(html, mode)
+        elapsed = (time.perf_counter() - started) / args.runs
+
+        gc.collect()
+        tracemalloc.start()
+        soup = parse_html(html, mode)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del soup
+        print(f"  {mode:<10}  {elapsed * 1000:>7.0f}ms  {peak / (1024 * 1024):>8.1f}MB")
+    return 0
+
+
+def bench_prefilter(args: argparse.Namespace) -> int:
+    """Bytes sent to the parser and parse time with and without the prefilter"""
+    from analyzer.parsing import parse_html
+    from analyzer.prefilter import HTMLPrefilter
+
+    pages = [(path, open(path, "rb").read()) for path in args.files]
+    if not pages:
+        pages = [(f"spa_shell({args.components})", spa_shell_page(args.components).encode("utf-8"))]
+
+    print(f"  {'page':<28}  {'received':>9}  {'parsed':>9}  {'filter':>9}  {'parse raw':>9}  {'parse filtered':>14}")
+    for name, raw in pages:
+        started = time.perf_counter()
+        prefilter = HTMLPrefilter()
+        filtered = b"".join(prefilter.feed(raw[i:i + 8192]) for i in range(0, len(raw), 8192))
+        filtered += prefilter.close()
+        filter_time = time.perf_counter() - started
+
+        timings = []
+        for content in (raw, filtered):
+            started = time.perf_counter()
+            parse_html(content.decode("utf-8", errors="ignore"))
+            timings.append(time.perf_counter() - started)
+
+        print(f"  {os.path.basename(name)[:28]:<28}  {len(raw) / 1024:>7.0f}KB  {len(filtered) / 1024:>7.0f}KB"
+              f"  {filter_time * 1000:>7.0f}ms  {timings[0] * 1000:>7.0f}ms  {timings[1] * 1000:>12.0f}ms")
+    return 0
+
+
+def bench_templates(args: argparse.Namespace) -> int:
+    """CPU time for a crawl of pages sharing templates, with and without deduplication"""
+    from analyzer.pipeline import analyze_html
+    from analyzer.templates import TemplateRegistry
+
+    pages = [site_page(i, args.menu_links) for i in range(args.pages)]
+    print(f"{args.pages} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KB each")
+    print(f"  {'mode':<10}  {'cpu':>8}  {'per page':>9}")
+
+    for mode in ("full", "templates"):
+        registry = TemplateRegistry() if mode == "templates" else None
+        gc.collect()
+        started = time.process_time()
+        for i, html in enumerate(pages):
+            analyze_html(html, f"https://example.com/{i}", templates=registry)
+        elapsed = time.process_time() - started
+        print(f"  {mode:<10}  {elapsed:>7.2f}s  {elapsed * 1000 / len(pages):>7.1f}ms")
+        if registry is not None:
+            print(f"  region hits {registry.hits}, misses {registry.misses}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Accessibility Analyzer benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup = commands.add_parser("startup", help="Cold start to first /health response")
+    startup.add_argument("--budget", type=float, default=float(os.getenv("STARTUP_BUDGET", "3.0")),
+                         help="Maximum allowed seconds (fails above this)")
+    startup.add_argument("--runs", type=int, default=3)
+    startup.add_argument("--mode", default="lazy", choices=["lazy", "background", "eager"])
+    startup.set_defaults(handler=bench_startup)
+
+    memory = commands.add_parser("memory", help="Per-request allocation of results and pipeline peak")
+    memory.add_argument("--elements", type=int, default=20000)
+    memory.set_defaults(handler=bench_memory)
+
+    serialize = commands.add_parser("serialize", help="Response serialization latency and payload size")
+    serialize.add_argument("--issues", type=int, default=5000)
+    serialize.add_argument("--runs", type=int, default=20)
+    serialize.set_defaults(handler=bench_serialize)
+
+    cache = commands.add_parser("cache", help="Cache hit rates as worker processes are added")
+    cache.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    cache.add_argument("--requests", type=int, default=20000)
+    cache.add_argument("--keys", type=int, default=5000)
+    cache.set_defaults(handler=bench_cache)
+
+    parse = commands.add_parser("parse", help="Tree build time and memory, full vs selective parsing")
+    parse.add_argument("--components", type=int, default=2000)
+    parse.add_argument("--runs", type=int, default=3)
+    parse.set_defaults(handler=bench_parse)
+
+    prefilter = commands.add_parser("prefilter", help="Bytes and parse time with and without the prefilter")
+    prefilter.add_argument("--files", nargs="*", default=[], help="Saved pages (default: synthetic SPA shell)")
+    prefilter.add_argument("--components", type=int, default=2000)
+    prefilter.set_defaults(handler=bench_prefilter)
+
+    templates = commands.add_parser("templates", help="Crawl CPU time with and without template deduplication")
+    templates.add_argument("--pages", type=int, default=200)
+    templates.add_argument("--menu-links", type=int, default=400)
+    templates.set_defaults(handler=bench_templates)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,469 @@
+"""
+Load-testing harness for the Accessibility Analyzer API
+Serves fixture pages from a local origin and drives /analyze at a fixed request rate.
+Run from the backend directory, e.g.:
+
+    python loadtest.py run --rate 5 --duration 30 --size-kb 200
+    python loadtest.py run --rate 2 --pages saved/*.html --latency-ms 300 --drip-kbps 64
+    python loadtest.py run --target http://127.0.0.1:8000 --rate 10 --save runs/baseline.json
+    python loadtest.py compare loadtest-runs/a.json loadtest-runs/b.json
+    python loadtest.py origin --port 9000 --size-kb 500
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from analyzer.metrics import histogram_percentile
+from benchmarks import STARTUP_TIMEOUT, free_port
+from pages import synthetic_page
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+RUNS_DIR = os.path.join(BACKEND_DIR, "loadtest-runs")
+REQUEST_TIMEOUT = 120  # seconds before a request counts as a timeout
+
+# Metrics shown by compare: (key, label, lower is better)
+COMPARED_METRICS = [
+    ("throughput_rps", "throughput (req/s)", False),
+    ("latency_p50_ms", "latency p50 (ms)", True),
+    ("latency_p90_ms", "latency p90 (ms)", True),
+    ("latency_p99_ms", "latency p99 (ms)", True),
+    ("latency_max_ms", "latency max (ms)", True),
+    ("error_rate", "error rate", True),
+    ("loop_lag_p50_ms", "loop lag p50 (ms)", True),
+    ("loop_lag_p99_ms", "loop lag p99 (ms)", True),
+    ("loop_lag_max_ms", "loop lag max (ms)", True),
+    ("peak_rss_mb", "peak RSS (MB)", True),
+]
+
+
+# --------------------------------------------------
+# Fixture origin
+# --------------------------------------------------
+def fixture_page(size_kb: int) -> bytes:
+    """A synthetic page of about size_kb kilobytes with every checked kind of element"""
+    per_element = len(synthetic_page(100)) / 100
+    return synthetic_page(max(1, int(size_kb * 1024 / per_element))).encode("utf-8")
+
+
+class FixtureOrigin:
+    """
+    Local HTTP origin serving fixture pages with configurable behavior
+
+    GET /page/<n> returns page n modulo the page list. Unless repeat is set
+    a marker comment makes every URL's body unique, so results are not
+    served from the analysis cache. latency_ms delays the response headers;
+    drip_kbps sends the body slowly in small chunks.
+    """
+
+    def __init__(self, pages: List[bytes], latency_ms: float = 0, drip_kbps: float = 0,
+                 repeat: bool = False, port: int = 0):
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.drip_kbps = drip_kbps
+        self.repeat = repeat
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def url(self, index: int) -> str:
+        return f"http://127.0.0.1:{self.port}/page/{index}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fixture-origin", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def body(self, index: int) -> bytes:
+        page = self.pages[index % len(self.pages)]
+        return page if self.repeat else page + f"<!-- fixture page {index} -->".encode("ascii")
+
+    def _handler(self) -> type:
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                origin.requests += 1
+                parts = self.path.strip("/").split("/")
+                if len(parts) != 2 or parts[0] != "page" or not parts[1].isdigit():
+                    self.send_error(404)
+                    return
+
+                body = origin.body(int(parts[1]))
+                if origin.latency_ms:
+                    time.sleep(origin.latency_ms / 1000)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+
+                if not origin.drip_kbps:
+                    self.wfile.write(body)
+                    return
+                # Slow drip: 10 chunks per second at the configured rate
+                chunk = max(1, int(origin.drip_kbps * 1024 / 10))
+                for start in range(0, len(body), chunk):
+                    self.wfile.write(body[start:start + chunk])
+                    self.wfile.flush()
+                    time.sleep(0.1)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def load_pages(args: argparse.Namespace) -> List[bytes]:
+    """Recorded pages from --pages, or one synthetic page of --size-kb"""
+    if args.pages:
+        return [open(path, "rb").read() for path in args.pages]
+    return [fixture_page(args.size_kb)]
+
+
+# --------------------------------------------------
+# API server
+# --------------------------------------------------
+def start_api(port: int, workdir: str, use_cache: bool) -> subprocess.Popen:
+    """Start the API with the fixture origin allowed and state and logs kept in workdir"""
+    env = dict(
+        os.environ,
+        SCRAPER_ALLOWED_HOSTS="127.0.0.1",
+        JOBS_DB_PATH=os.path.join(workdir, "jobs.db"),
+        SHARED_CACHE_PATH=os.path.join(workdir, "cache.db") if use_cache else ""
+    )
+    log_path = os.path.join(workdir, "api.log")
+    with open(log_path, "wb") as log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT
+        )
+    started = time.perf_counter()
+    while time.perf_counter() - started < STARTUP_TIMEOUT:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited during startup; see {log_path}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.05)
+    server.terminate()
+    raise RuntimeError("API server never answered /health")
+
+
+def get_metrics(target: str) -> Optional[Dict[str, Any]]:
+    try:
+        return requests.get(f"{target}/metrics", timeout=10).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+
+# --------------------------------------------------
+# Load generation
+# --------------------------------------------------
+class LoadDriver:
+    """
+    Open-loop load generator
+
+    Requests are scheduled at a fixed rate whether or not earlier ones have
+    finished, and latency is measured from each request's scheduled start,
+    so a stalled server shows up as queueing delay instead of being hidden
+    by a slower send rate.
+    """
+
+    def __init__(self, target: str, origin: FixtureOrigin, max_in_flight: int, budget_ms: Optional[int] = None):
+        self.target = target
+        self.origin = origin
+        self.budget_ms = budget_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.samples: List[Tuple[float, str]] = []
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def request(self, index: int) -> str:
+        """Send one /analyze request and return its outcome ("200", "503", "timeout", ...)"""
+        body: Dict[str, Any] = {"url": self.origin.url(index)}
+        if self.budget_ms:
+            body["budget_ms"] = self.budget_ms
+        try:
+            response = self._session().post(f"{self.target}/analyze", json=body, timeout=REQUEST_TIMEOUT)
+            return str(response.status_code)
+        except requests.Timeout:
+            return "timeout"
+        except requests.RequestException:
+            return "connection_error"
+
+    def _fire(self, index: int, scheduled: float) -> None:
+        outcome = self.request(index)
+        latency = time.perf_counter() - scheduled
+        with self._lock:
+            self.samples.append((latency, outcome))
+
+    def run(self, rate: float, duration: float, first_index: int = 0) -> float:
+        """Send rate requests per second for duration seconds; return the elapsed time"""
+        total = max(1, int(rate * duration))
+        started = time.perf_counter()
+        futures = []
+        for i in range(total):
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(self.executor.submit(self._fire, first_index + i, scheduled))
+        for future in futures:
+            future.result()
+        return time.perf_counter() - started
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values), max(1, math.ceil(fraction * len(values)))) - 1]
+
+
+def lag_summary(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Event-loop lag percentiles for the interval between two /metrics snapshots"""
+    if not before or not after:
+        return {}
+    lag_before, lag_after = before["event_loop_lag"], after["event_loop_lag"]
+    counts = [b - a for a, b in zip(lag_before["counts"], lag_after["counts"])]
+    bounds = lag_after["buckets_ms"]
+    highest = max((index for index, count in enumerate(counts) if count), default=None)
+    return {
+        "loop_lag_samples": sum(counts),
+        "loop_lag_p50_ms": histogram_percentile(counts, bounds, 0.5),
+        "loop_lag_p99_ms": histogram_percentile(counts, bounds, 0.99),
+        # Upper bound of the highest bucket hit during the run
+        "loop_lag_max_ms": None if highest is None else (
+            bounds[highest] if highest < len(bounds) else float("inf")
+        ),
+    }
+
+
+def summarize(samples: List[Tuple[float, str]], elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latency * 1000 for latency, outcome in samples if outcome == "200")
+    outcomes: Dict[str, int] = {}
+    for _, outcome in samples:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    errors = len(samples) - outcomes.get("200", 0)
+    return {
+        "requests": len(samples),
+        "succeeded": len(latencies),
+        "outcomes": outcomes,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 0.50), 1),
+        "latency_p90_ms": round(percentile(latencies, 0.90), 1),
+        "latency_p99_ms": round(percentile(latencies, 0.99), 1),
+        "latency_max_ms": round(latencies[-1], 1) if latencies else 0.0,
+    }
+
+
+# --------------------------------------------------
+# Saved runs
+# --------------------------------------------------
+def git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return output + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_run(run: Dict[str, Any], path: Optional[str]) -> str:
+    if not path:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(RUNS_DIR, f"{stamp}-{run['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(run, handle, indent=2)
+    return path
+
+
+def format_value(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4f}" if value < 1 and value != 0 else f"{value:.1f}"
+    return str(value)
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    for key, label, _ in COMPARED_METRICS:
+        print(f"  {label:<22}  {format_value(results.get(key)):>10}")
+    print(f"  {'outcomes':<22}  {results['outcomes']}")
+
+
+# --------------------------------------------------
+# Commands
+# --------------------------------------------------
+def cmd_run(args: argparse.Namespace) -> int:
+    origin = FixtureOrigin(load_pages(args), args.latency_ms, args.drip_kbps, args.repeat_pages)
+    origin.start()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    server = None
+    target = args.target.rstrip("/") if args.target else None
+    try:
+        if target is None:
+            port = free_port()
+            server = start_api(port, workdir, args.cache)
+            target = f"http://127.0.0.1:{port}"
+
+        driver = LoadDriver(target, origin, args.max_in_flight, args.budget_ms)
+        # Warm-up requests load the pipeline and are not measured
+        for index in range(args.warmup):
+            driver.request(index)
+
+        before = get_metrics(target)
+        drip = f"{args.drip_kbps} KB/s" if args.drip_kbps else "off"
+        print(f"Driving {target}/analyze at {args.rate} req/s for {args.duration}s "
+              f"({len(origin.pages)} page(s), origin latency {args.latency_ms}ms, drip {drip})")
+        elapsed = driver.run(args.rate, args.duration, first_index=args.warmup)
+        after = get_metrics(target)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        origin.stop()
+
+    results = summarize(driver.samples, elapsed)
+    results.update(lag_summary(before, after))
+    if after:
+        results["peak_rss_mb"] = round(after["memory"]["peak_rss_bytes"] / (1024 * 1024), 1)
+
+    run = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "rate": args.rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "max_in_flight": args.max_in_flight,
+            "pages": args.pages or None,
+            "size_kb": None if args.pages else args.size_kb,
+            "latency_ms": args.latency_ms,
+            "drip_kbps": args.drip_kbps,
+            "repeat_pages": args.repeat_pages,
+            "cache": args.cache,
+            "budget_ms": args.budget_ms,
+            "target": args.target,
+        },
+        "results": results,
+    }
+    print_results(results)
+    print(f"Saved run to {save_run(run, args.save)}")
+    return 0 if results["succeeded"] else 1
+
+
+def cmd_compare(args: argparse.Namespace) -> int:
+    runs = []
+    for path in args.runs:
+        with open(path, encoding="utf-8") as handle:
+            runs.append(json.load(handle))
+
+    names = [run.get("commit") or os.path.basename(path) for run, path in zip(runs, args.runs)]
+    print(f"  {'metric':<22}" + "".join(f"  {name[:14]:>14}" for name in names) + f"  {'change':>9}")
+    for key, label, lower_is_better in COMPARED_METRICS:
+        values = [run["results"].get(key) for run in runs]
+        row = f"  {label:<22}" + "".join(f"  {format_value(value):>14}" for value in values)
+        first, last = values[0], values[-1]
+        if isinstance(first, (int, float)) and isinstance(last, (int, float)) and first and abs(first) != float("inf"):
+            change = (last - first) / first
+            worse = change > 0 if lower_is_better else change < 0
+            row += f"  {change:>+8.1%}{' !' if worse and abs(change) >= args.threshold else ''}"
+        print(row)
+
+    configs = [run["config"] for run in runs]
+    if any(config != configs[0] for config in configs):
+        print("Note: runs used different configurations")
+    return 0
+
+
+def cmd_origin(args: argparse.Namespace) -> int:
+    origin = FixtureOrigin(load_pages(args), args.latency_ms, args.drip_kbps, args.repeat_pages, args.port)
+    print(f"Serving fixture pages at {origin.url(0)} (Ctrl+C to stop)")
+    try:
+        origin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        origin.server.server_close()
+    return 0
+
+
+def add_origin_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--pages", nargs="*", default=[], help="Recorded .html files to serve (default: synthetic)")
+    parser.add_argument("--size-kb", type=int, default=100, help="Size of the synthetic page")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay before each response")
+    parser.add_argument("--drip-kbps", type=float, default=0, help="Send bodies slowly at this rate")
+    parser.add_argument("--repeat-pages", action="store_true",
+                        help="Serve identical bodies for every URL (lets the analysis cache hit)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Accessibility Analyzer load tests")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Drive /analyze at a fixed rate and save the results")
+    add_origin_arguments(run)
+    run.add_argument("--rate", type=float, default=2.0, help="Requests per second")
+    run.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    run.add_argument("--warmup", type=int, default=2, help="Unmeasured requests sent first")
+    run.add_argument("--max-in-flight", type=int, default=256, help="Client-side concurrency cap")
+    run.add_argument("--budget-ms", type=int, help="Send quick-mode requests with this budget")
+    run.add_argument("--target", help="Existing API base URL (must allow the origin: SCRAPER_ALLOWED_HOSTS)")
+    run.add_argument("--cache", action="store_true", help="Enable the shared cache on the started API")
+    run.add_argument("--save", metavar="FILE", help=f"Where to save the run (default: {RUNS_DIR}/...)")
+    run.set_defaults(handler=cmd_run)
+
+    compare = commands.add_parser("compare", help="Compare saved runs, first as the baseline")
+    compare.add_argument("runs", nargs="+", help="Saved run files")
+    compare.add_argument("--threshold", type=float, default=0.1, help="Flag regressions above this fraction")
+    compare.set_defaults(handler=cmd_compare)
+
+    origin = commands.add_parser("origin", help="Only serve fixture pages")
+    add_origin_arguments(origin)
+    origin.add_argument("--port", type=int, default=9000)
+    origin.set_defaults(handler=cmd_origin)
+
+    args = parser.parse_args()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,32 +3,138 @@ FastAPI Backend for Accessibility Analyzer
 Main API endpoint for analyzing website accessibility
 """
 
-from fastapi import FastAPI, HTTPException
+from anyio import from_thread
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 import logging
+import math
 import os
-from urllib.parse import urlparse
+import threading
+import time
+import uuid
 
-from analyzer.scraper import WebScraper
-from analyzer.rules import RuleBasedAnalyzer
-from analyzer.ml_analyzer import MLAnalyzer
-from analyzer.checklist import ChecklistGenerator
-from analyzer.scorer import ScoringEngine
+from analyzer.utils import normalize_url
+from analyzer.jobs import JobStore, JobWorkerPool
+from analyzer.admission import AdmissionController, AdmissionRejected, ClientIdentifier
+from analyzer.coalesce import SingleFlight
+from analyzer.ingest import ContentTooLarge, HTMLIngest, MultipartHTMLIngest
+from analyzer.logs import bind_request_id, configure_logging, logging_stats, shutdown_logging
+from analyzer.metrics import LoopLagMonitor, process_memory
+from analyzer.prefilter import create_prefilter
+from analyzer.responses import FastJSONResponse
+from analyzer.shadow import ShadowRunner
+from analyzer.shared_cache import get_shared_cache
+from analyzer.tracing import current_span, get_tracer, start_trace
+from analyzer.warmup import warm_up
 
 # --------------------------------------------------
 # Logging
 # --------------------------------------------------
-logging.basicConfig(level=logging.INFO)
+# JSON records written by a background thread; see LOG_* in .env.example
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# --------------------------------------------------
+# Startup
+# --------------------------------------------------
+# The analysis pipeline (BeautifulSoup, requests, analyzers) is imported on
+# first use so /health answers quickly after a cold start:
+#   lazy       - load on the first analysis (default)
+#   background - start loading right after startup without blocking /health
+#   eager      - load and warm up before accepting requests
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")
+
+# --------------------------------------------------
+# Background jobs
+# --------------------------------------------------
+JOB_MAX_URLS = int(os.getenv("JOB_MAX_URLS", "50"))
+
+job_store = JobStore(
+    os.getenv("JOBS_DB_PATH", "jobs.db"),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+)
+job_pool = JobWorkerPool(
+    job_store,
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "600"))
+)
+
+# --------------------------------------------------
+# Admission control
+# --------------------------------------------------
+# Parsing costs several times the page size, so each admitted analysis
+# reserves body_size * ADMISSION_PARSE_FACTOR bytes of the memory budget.
+# A fetch is admitted with ADMISSION_DEFAULT_ESTIMATE and, before reading
+# the body, waits to reserve for the upstream Content-Length (or the
+# maximum content size when it is missing)
+ADMISSION_DEFAULT_ESTIMATE = int(os.getenv("ADMISSION_DEFAULT_ESTIMATE_MB", "2")) * 1024 * 1024
+ADMISSION_PARSE_FACTOR = int(os.getenv("ADMISSION_PARSE_FACTOR", "8"))
+
+admission = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "4")),
+    max_memory_bytes=int(os.getenv("ADMISSION_MAX_MEMORY_MB", "256")) * 1024 * 1024,
+    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "2")),
+    client_default_limit=int(os.getenv("ADMISSION_CLIENT_DEFAULT", "2")),
+    client_limits=AdmissionController.parse_client_limits(os.getenv("ADMISSION_CLIENT_LIMITS", "")),
+    retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+)
+
+
+# Callers are told apart by API key (ADMISSION_API_KEYS=batch=<key>,...) or
+# IP. Behind a reverse proxy, list it in ADMISSION_TRUSTED_PROXIES so the
+# X-Forwarded-For address is used, and have the dashboard's route set
+# X-Client-Class: dashboard (overwriting any client-sent value)
+client_identifier = ClientIdentifier(
+    api_keys=ClientIdentifier.parse_api_keys(os.getenv("ADMISSION_API_KEYS", "")),
+    trusted_proxies=os.getenv("ADMISSION_TRUSTED_PROXIES", ""),
+    class_header=os.getenv("ADMISSION_CLASS_HEADER", "X-Client-Class")
+)
+
+
+def client_id_for(request: Request) -> str:
+    """Identify the caller for per-client admission limits"""
+    return client_identifier.identify(request.headers, request.client.host if request.client else None)
+
+
+# --------------------------------------------------
+# Shadow mode
+# --------------------------------------------------
+# Compares a sample of /analyze results with an alternate engine
+# configuration (SHADOW_CONFIG) in a background process
+shadow = ShadowRunner.from_env()
+
+# --------------------------------------------------
+# Metrics
+# --------------------------------------------------
+loop_lag = LoopLagMonitor(interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "100")) / 1000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if STARTUP_MODE == "eager":
+        warm_up()
+    elif STARTUP_MODE == "background":
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    job_pool.start()
+    loop_lag.start()
+    yield
+    loop_lag.stop()
+    job_pool.stop()
+    shadow.shutdown()
+    shutdown_logging()
+
 # --------------------------------------------------
 # FastAPI app
 # --------------------------------------------------
 app = FastAPI(
     title="Accessibility Analyzer API",
     description="AI-powered WCAG accessibility analysis for websites",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --------------------------------------------------
@@ -44,11 +150,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --------------------------------------------------
+# Request ids and tracing
+# --------------------------------------------------
+# Each analysis request is one trace; see TRACE_EXPORTER in .env.example
+TRACED_PATHS = frozenset({"/analyze", "/analyze/html"})
+
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag the request's log records with a request id (X-Request-Id) and trace analyses"""
+    request_id = request.headers.get("X-Request-Id", "")[:64] or uuid.uuid4().hex[:16]
+    with bind_request_id(request_id):
+        if request.url.path in TRACED_PATHS:
+            with start_trace(f"{request.method} {request.url.path}", request.headers.get("traceparent"),
+                             request_id=request_id, client_id=client_id_for(request),
+                             request_bytes=int(request.headers.get("Content-Length") or 0)) as trace:
+                response = await call_next(request)
+                trace.set("status_code", response.status_code)
+        else:
+            response = await call_next(request)
+    response.headers["X-Request-Id"] = request_id
+    return response
+
 # --------------------------------------------------
 # Models
 # --------------------------------------------------
 class AnalyzeRequest(BaseModel):
     url: str   # ✅ relaxed from HttpUrl
+    budget_ms: Optional[int] = None   # quick mode: sample large pages to fit this latency budget
 
 
 class AnalyzeResponse(BaseModel):
@@ -58,45 +188,63 @@ class AnalyzeResponse(BaseModel):
     checklist: list
     issues: list
     metadata: dict
-
-# --------------------------------------------------
-# Routes
-# --------------------------------------------------
-@app.get("/")
-async def root():
-    return {"message": "Accessibility Analyzer API", "version": "1.0.0"}
+    sampling: Optional[dict] = None
 
 
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+class JobRequest(BaseModel):
+    url: Optional[str] = None
+    urls: Optional[List[str]] = None
 
 
-@app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_website(request: AnalyzeRequest):
-    try:
-        # ------------------------------------------
-        # URL NORMALIZATION & VALIDATION (IMPORTANT)
-        # ------------------------------------------
-        url_str = request.url.strip()
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    urls: List[str]
+    progress: dict
+    results: list
+    error: Optional[str] = None
+    attempts: int
+    created_at: float
+    updated_at: float
 
-        if not url_str:
-            raise HTTPException(status_code=400, detail="URL cannot be empty")
 
-        if not url_str.startswith(("http://", "https://")):
-            url_str = "https://" + url_str
+# --------------------------------------------------
+# Analysis
+# --------------------------------------------------
+# Concurrent requests for the same normalized URL share one run
+inflight = SingleFlight()
 
-        parsed = urlparse(url_str)
-        if not parsed.netloc:
-            raise HTTPException(status_code=400, detail="Invalid URL format")
 
-        logger.info(f"Analyzing URL: {url_str}")
+async def run_analysis(url_str: str, client_id: str, budget_ms: Optional[int] = None) -> dict:
+    """Admit, scrape and analyze one URL"""
+    # ------------------------------------------
+    # Admission: wait for capacity or shed load
+    # ------------------------------------------
+    # Quick mode's budget runs from here, so waiting, fetching and parsing count against it
+    queued = time.perf_counter()
+    async with admission.admit(client_id, ADMISSION_DEFAULT_ESTIMATE) as ticket:
+        current_span().set("admission_wait_ms", round((time.perf_counter() - queued) * 1000, 1))
 
         # ------------------------------------------
         # Step 1: Scrape website
         # ------------------------------------------
-        scraper = WebScraper()
-        html_content, metadata = scraper.scrape(url_str)
+        from analyzer.scraper import SiteUnavailable, WebScraper
+        from analyzer.pipeline import analyze_html, store_snapshot
+
+        def reserve(body_size: int) -> None:
+            # Called from the scraping thread once the response headers are in
+            from_thread.run(ticket.reserve, body_size * ADMISSION_PARSE_FACTOR)
+
+        scraper = WebScraper(cache=get_shared_cache())
+        try:
+            html_content, metadata = await run_in_threadpool(scraper.scrape, url_str, reserve)
+        except SiteUnavailable as e:
+            # The site's circuit breaker is open: fail fast, and say when to come back
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))}
+            )
 
         if not html_content:
             raise HTTPException(
@@ -104,71 +252,94 @@ async def analyze_website(request: AnalyzeRequest):
                 detail="Failed to fetch website content. Website may block bots or require JavaScript."
             )
 
-        # ------------------------------------------
-        # Step 2: Rule-based analysis
-        # ------------------------------------------
-        rule_analyzer = RuleBasedAnalyzer()
-        rule_results = rule_analyzer.analyze(html_content, url_str)
+        ticket.resize(len(html_content) * ADMISSION_PARSE_FACTOR)
+        await run_in_threadpool(store_snapshot, url_str, html_content, metadata)
 
         # ------------------------------------------
-        # Step 3: ML/NLP analysis
+        # Steps 2-6: Rules, ML, checklist, scoring, issues
         # ------------------------------------------
-        ml_analyzer = MLAnalyzer()
-        ml_results = ml_analyzer.analyze(html_content, rule_results)
+        result = await run_in_threadpool(
+            analyze_html, html_content, url_str, metadata, get_shared_cache(), budget_ms, None, queued
+        )
+
+    # Quick-mode results are extrapolated, so only full analyses are compared
+    if budget_ms is None:
+        shadow.maybe_submit(html_content, url_str, result)
+
+    return result
 
-        # ------------------------------------------
-        # Step 4: Checklist
-        # ------------------------------------------
-        checklist_gen = ChecklistGenerator()
-        checklist = checklist_gen.generate(rule_results, ml_results)
 
+# --------------------------------------------------
+# Routes
+# --------------------------------------------------
+@app.get("/")
+async def root():
+    return {"message": "Accessibility Analyzer API", "version": "1.0.0"}
+
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Event-loop lag, memory and load-shedding counters of this worker process"""
+    from analyzer.fetch import get_fetcher
+    from analyzer.snapshots import get_snapshot_store
+    cache = get_shared_cache()
+    snapshots = get_snapshot_store()
+    return {
+        "pid": os.getpid(),
+        "event_loop_lag": loop_lag.stats(),
+        "memory": process_memory(),
+        "admission": admission.stats(),
+        "coalescing": inflight.stats(),
+        "tracing": get_tracer().stats(),
+        "logging": logging_stats(),
+        "fetch": get_fetcher().stats(),
+        "shadow": shadow.stats(),
+        "snapshots": await run_in_threadpool(snapshots.stats) if snapshots else None,
+        "cache": cache.stats() if cache else None
+    }
+
+
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_website(request: AnalyzeRequest, http_request: Request):
+    try:
         # ------------------------------------------
-        # Step 5: Scoring
+        # URL NORMALIZATION & VALIDATION (IMPORTANT)
         # ------------------------------------------
-        scorer = ScoringEngine()
-        score_data = scorer.calculate(checklist)
+        try:
+            url_str = normalize_url(request.url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if request.budget_ms is not None and request.budget_ms <= 0:
+            raise HTTPException(status_code=400, detail="budget_ms must be positive")
+
+        logger.info("Analyzing URL: %s", url_str)
+        current_span().set("url", url_str)
 
         # ------------------------------------------
-        # Step 6: Compile issues
+        # Coalesce identical in-flight analyses
         # ------------------------------------------
-        issues = [
-            {
-                "check": item["check"],
-                "wcag": item["wcag"],
-                "severity": item["severity"],
-                "fix": item["fix"],
-                "count": item.get("count", 0)
-            }
-            for item in checklist
-            if item["status"] == "fail"
-        ]
-
-        severity_order = {"High": 0, "Medium": 1, "Low": 2}
-        issues.sort(key=lambda x: severity_order.get(x["severity"], 3))
-
-        response = AnalyzeResponse(
-            url=url_str,
-            overall_score=score_data["overall_score"],
-            summary={
-                "total_checks": len(checklist),
-                "passed": score_data["passed"],
-                "failed": score_data["failed"],
-                "high_issues": score_data["high_issues"],
-                "medium_issues": score_data["medium_issues"],
-                "low_issues": score_data["low_issues"]
-            },
-            checklist=checklist,
-            issues=issues,
-            metadata={
-                "title": metadata.get("title", "Unknown"),
-                "timestamp": metadata.get("timestamp"),
-                "html_size": len(html_content)
-            }
+        client_id = client_id_for(http_request)
+        budget_ms = request.budget_ms
+        result = await inflight.do(
+            f"{url_str}|{budget_ms or 'full'}",
+            lambda: run_analysis(url_str, client_id, budget_ms)
         )
 
-        logger.info(f"Analysis complete. Score: {score_data['overall_score']}")
-        return response
+        logger.info("Analysis complete. Score: %s", result["overall_score"])
+        return FastJSONResponse(result, accept_encoding=http_request.headers.get("Accept-Encoding", ""))
 
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -179,6 +350,103 @@ async def analyze_website(request: AnalyzeRequest):
         )
 
 
+@app.post("/analyze/html", response_model=AnalyzeResponse)
+async def analyze_raw_html(http_request: Request, url: Optional[str] = None, budget_ms: Optional[int] = None):
+    """
+    Analyze HTML sent in the request instead of fetching a URL
+
+    Accepts a raw text/html body or a multipart/form-data upload in the
+    'file' field. The optional url query parameter labels the result;
+    budget_ms enables quick mode as for /analyze.
+    """
+    from analyzer.scraper import WebScraper
+    from analyzer.pipeline import analyze_content
+
+    started = time.perf_counter()
+    try:
+        content_type = http_request.headers.get("Content-Type", "")
+        declared_size = int(http_request.headers.get("Content-Length") or 0)
+
+        if budget_ms is not None and budget_ms <= 0:
+            raise HTTPException(status_code=400, detail="budget_ms must be positive")
+
+        if declared_size > WebScraper.MAX_CONTENT_SIZE:
+            raise ContentTooLarge(f"Content too large: {declared_size} bytes")
+
+        if content_type.startswith("multipart/form-data"):
+            ingest = MultipartHTMLIngest(content_type, WebScraper.MAX_CONTENT_SIZE, prefilter=create_prefilter())
+        else:
+            ingest = HTMLIngest(WebScraper.MAX_CONTENT_SIZE, create_prefilter())
+
+        estimate = declared_size * ADMISSION_PARSE_FACTOR or ADMISSION_DEFAULT_ESTIMATE
+        async with admission.admit(client_id_for(http_request), estimate) as ticket:
+
+            # ------------------------------------------
+            # Step 1: Ingest the body as it arrives
+            # ------------------------------------------
+            async for chunk in http_request.stream():
+                ingest.feed(chunk)
+            content = ingest.close()
+
+            ticket.resize(len(content) * ADMISSION_PARSE_FACTOR)
+
+            source = (url or "").strip() or getattr(ingest, "filename", None) or "upload"
+            logger.info("Analyzing uploaded HTML: %s (%d bytes)", source, ingest.size)
+            current_span().set_attributes(url=source, received_bytes=ingest.size)
+
+            # ------------------------------------------
+            # Steps 2-6: Rules, ML, checklist, scoring, issues
+            # ------------------------------------------
+            result = await run_in_threadpool(
+                analyze_content, content, source, get_shared_cache(), budget_ms, ingest.size, None, started
+            )
+
+        logger.info("Analysis complete. Score: %s", result["overall_score"])
+        return FastJSONResponse(result, accept_encoding=http_request.headers.get("Accept-Encoding", ""))
+
+    except ContentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=e.reason,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except HTTPException:
+        raise
+    except Exception:
+        logger.error("Unexpected error", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="Internal server error during accessibility analysis"
+        )
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: JobRequest):
+    urls = ([request.url] if request.url else []) + list(request.urls or [])
+    urls = [u.strip() for u in urls if u and u.strip()]
+
+    if not urls:
+        raise HTTPException(status_code=400, detail="At least one URL is required")
+    if len(urls) > JOB_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"A job can contain at most {JOB_MAX_URLS} URLs")
+
+    job = job_store.create(urls)
+    job_pool.notify()
+    return job
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, http_request: Request):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job, accept_encoding=http_request.headers.get("Accept-Encoding", ""))
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
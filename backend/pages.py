@@ -0,0 +1,62 @@
+"""
+Synthetic HTML pages shared by the tests and the benchmark scripts
+"""
+
+
+def synthetic_page(elements: int) -> str:
+    """Build a page with many failing elements of every checked kind"""
+    parts = []
+    for i in range(elements):
+        kind = i % 5
+        if kind == 0:
+            parts.append(f'<img src="/img/{i}.png">')
+        elif kind == 1:
+            parts.append(f'<a href="/page/{i}">click here</a>')
+        elif kind == 2:
+            parts.append(f'<input type="text" name="field{i}">')
+        elif kind == 3:
+            parts.append('<button type="button"></button>')
+        else:
+            parts.append(f'<h4>Heading {i}</h4><p class="muted">Paragraph {i}.</p>')
+    return f"<html><head><title>Benchmark</title></head><body><h1>Benchmark</h1>{''.join(parts)}</body></html>"
+
+
+def spa_shell_page(components: int) -> str:
+    """Build a script-heavy single-page-app shell with icon-laden markup"""
+    icon = (
+        '<svg viewBox="0 0 24 24" aria-hidden="true"><g fill="none" stroke="currentColor">'
+        + '<path d="M4 12h16M12 4v16"/>' * 6 + '</g></svg>'
+    )
+    bundle = "window.__STATE__=" + '{"id":1,"items":[' + ",".join(["{\"k\":1}"] * 20000) + "]};"
+    parts = []
+    for i in range(components):
+        parts.append(
+            f'<section class="card"><header><nav><ul><li>{icon}<a href="/c/{i}">Item {i}</a></li></ul></nav>'
+            f'</header><main><article><p>Description of item {i}.</p><button type="button">{icon}</button>'
+            f'</article></main><script>hydrate({i});</script></section>'
+        )
+    return (
+        f"<html lang='en'><head><title>App</title><style>{'.x{color:red}' * 5000}</style>"
+        f"<script>{bundle}</script></head><body><div id='root'>{''.join(parts)}</div></body></html>"
+    )
+
+
+def site_page(index: int, menu_links: int) -> str:
+    """A page of a site sharing a mega-menu header, footer and cookie banner with every other page"""
+    menu = "".join(
+        f'<li><a href="/section/{i}"><img src="/icons/{i}.png" alt="">Section {i}</a></li>' for i in range(menu_links)
+    )
+    footer = "".join(f'<a href="/legal/{i}">More</a>' for i in range(menu_links // 4))
+    alts = ["", ' alt="Photo"', ' alt="Chart of results"']
+    content = "".join(
+        f'<p>Paragraph {j} of page {index}. <a href="/p/{index}/{j}">Details on topic {j}</a></p>'
+        f'<img src="/img/{index}/{j}.jpg"{alts[j % 3]}>'
+        for j in range(20)
+    )
+    return (
+        f"<html lang='en'><head><title>Page {index}</title></head><body>"
+        f"<header><nav><ul>{menu}</ul></nav><button type='button' aria-label='Search'></button></header>"
+        f"<main><h1>Page {index}</h1>{content}</main>"
+        f"<footer>{footer}</footer>"
+        f"<div class='cookie-banner'><p>We use cookies.</p><button type='button'></button></div></body></html>"
+    )
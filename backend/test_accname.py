@@ -0,0 +1,78 @@
+"""
+Checks the accessible-name computation shared by the checks
+Run with: python -m pytest test_accname.py
+"""
+
+from analyzer.accname import AccessibleNames
+from analyzer.parsing import parse_html
+from analyzer.rules import RuleBasedAnalyzer
+
+
+def names_of(html: str, selector: str) -> list:
+    soup = parse_html(html)
+    names = AccessibleNames(soup)
+    return [names.name(tag) for tag in soup.select(selector)]
+
+
+def test_name_sources_in_precedence_order():
+    html = (
+        "<span id='a'>Account</span><span id='s' hidden>settings</span>"
+        "<button aria-labelledby='a s' aria-label='ignored'>x</button>"
+        "<button aria-label='Close'>&times;</button>"
+        "<button><img src='i.png' alt='Search'> now</button>"
+        "<button title='Help'><i aria-hidden='true'>?</i></button>"
+        "<input type='submit'>"
+    )
+    assert names_of(html, "button, input") == ["Account settings", "Close", "Search now", "Help", "Submit"]
+
+
+def test_form_controls_are_named_by_labels():
+    html = (
+        "<label for='e'>Email <b>address</b></label><input id='e' type='email'>"
+        "<label>Quantity <select><option>1</option><option selected>2</option></select> items"
+        "<input type='number' value='3'></label>"
+        "<input placeholder='Not a label'>"
+    )
+    assert names_of(html, "input, select") == ["Email address", "Quantity items 3", "Quantity 2 items", ""]
+
+
+def test_names_are_computed_once_per_element():
+    soup = parse_html("<a href='/'>Read <b>more</b></a>")
+    names = AccessibleNames(soup)
+    assert names.name(soup.a) == "Read more"
+    soup.a.b.string = "less"
+    assert names.name(soup.a) == "Read more"
+
+
+def test_title_names_a_form_control_when_nothing_else_does():
+    html = (
+        "<input id='q' title='Search the site'>"
+        "<label for='n'>Name</label><input id='n' title='Your full name'>"
+        "<select title='Sort order'><option>Newest</option></select>"
+    )
+    assert names_of(html, "input, select") == ["Search the site", "Name", "Sort order"]
+
+
+def test_empty_labels_and_dangling_references_leave_controls_unnamed():
+    html = (
+        "<label for='a'> </label><input id='a'>"
+        "<label><img src='x.png' alt=''> <input id='b'></label>"
+        "<input id='c' aria-labelledby='missing'>"
+        "<span id='blank'>  </span><input id='d' aria-labelledby='blank missing' aria-label='Fallback'>"
+        "<input id='e' aria-label='  '>"
+    )
+    assert names_of(html, "input") == ["", "", "", "Fallback", ""]
+
+
+def test_forms_check_counts_what_the_name_computation_decides():
+    html = (
+        "<form><input type='hidden' name='token'>"
+        "<input title='Search'>"
+        "<label for='a'></label><input id='a'>"
+        "<input aria-labelledby='nowhere'>"
+        "<span id='here'>Email</span><input aria-labelledby='here'>"
+        "<input type='submit'></form>"
+    )
+    result = RuleBasedAnalyzer().analyze_soup(parse_html(html), checks=["forms"])["forms"]
+    assert (result.passed, result.failed) == (2, 2)
+    assert [issue.element for issue in result.issues] == ['<input id="a"/>', '<input aria-labelledby="nowhere"/>']
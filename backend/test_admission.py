@@ -0,0 +1,137 @@
+"""
+Checks admission control: concurrency, per-client and memory limits, timeouts and reservations
+Run with: python -m pytest test_admission.py
+"""
+
+import asyncio
+
+import pytest
+
+from analyzer.admission import AdmissionController, AdmissionRejected, ClientIdentifier
+
+MB = 1024 * 1024
+
+
+async def hold(controller: AdmissionController, client_id: str, estimate: int, release: asyncio.Event,
+               admitted: list) -> None:
+    async with controller.admit(client_id, estimate):
+        admitted.append(client_id)
+        await release.wait()
+
+
+async def settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrency_limit_queues_until_a_slot_frees():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=2, max_wait=5, client_default_limit=10)
+        release, admitted = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(controller, f"c{index}", MB, release, admitted)) for index in range(3)]
+        await settle()
+        assert admitted == ["c0", "c1"]
+        assert controller.stats() == {"active": 2, "memory_in_flight": 2 * MB, "rejected": 0}
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admitted == ["c0", "c1", "c2"]
+        assert controller.stats() == {"active": 0, "memory_in_flight": 0, "rejected": 0}
+
+    asyncio.run(scenario())
+
+
+def test_client_limits_apply_per_client():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=10, max_wait=0.05, client_default_limit=1,
+                                         client_limits=AdmissionController.parse_client_limits("batch=2, bad"))
+        release, admitted = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(controller, client, MB, release, admitted))
+                 for client in ("a", "batch", "batch")]
+        await settle()
+        assert sorted(admitted) == ["a", "batch", "batch"]
+
+        # A third batch request and a second one from "a" wait out max_wait; "b" gets in
+        tasks.append(asyncio.create_task(hold(controller, "b", MB, release, admitted)))
+        results = await asyncio.gather(
+            hold(controller, "batch", MB, release, admitted),
+            hold(controller, "a", MB, release, admitted),
+            return_exceptions=True
+        )
+        assert [type(result) for result in results] == [AdmissionRejected, AdmissionRejected]
+        assert results[0].retry_after == controller.retry_after
+        assert admitted[-1] == "b"
+        assert controller.stats() == {"active": 4, "memory_in_flight": 4 * MB, "rejected": 2}
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_memory_budget_times_out_but_admits_a_lone_oversized_request():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=4, max_memory_bytes=10 * MB, max_wait=0.05)
+        # Nothing else is running, so an estimate over the whole budget is admitted
+        async with controller.admit("a", 20 * MB):
+            with pytest.raises(AdmissionRejected):
+                async with controller.admit("b", MB):
+                    pass
+        assert controller.stats() == {"active": 0, "memory_in_flight": 0, "rejected": 1}
+
+    asyncio.run(scenario())
+
+
+def test_resize_and_reserve_adjust_the_estimate():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=4, max_memory_bytes=10 * MB, max_wait=0.2)
+        async with controller.admit("a", 2 * MB) as first:
+            first.resize(6 * MB)
+            assert controller.memory_in_flight == 6 * MB
+
+            async with controller.admit("b", 2 * MB) as second:
+                # Growing past the budget waits until the other request shrinks...
+                reservation = asyncio.create_task(second.reserve(5 * MB))
+                await settle()
+                assert not reservation.done()
+                await first.reserve(MB)
+                await reservation
+                assert controller.memory_in_flight == 6 * MB
+
+                # ...and is rejected if it doesn't within max_wait
+                with pytest.raises(AdmissionRejected):
+                    await second.reserve(20 * MB)
+                assert second.estimated_bytes == 5 * MB
+
+            # A request running alone may reserve more than the budget
+            await first.reserve(20 * MB)
+            assert controller.memory_in_flight == 20 * MB
+        assert controller.stats() == {"active": 0, "memory_in_flight": 0, "rejected": 1}
+
+    asyncio.run(scenario())
+
+
+def test_clients_are_identified_by_key_or_trusted_proxy_only():
+    identifier = ClientIdentifier(api_keys=ClientIdentifier.parse_api_keys("batch=s3cret, broken"),
+                                  trusted_proxies="10.0.0.0/8, ::1")
+
+    # Self-declared ids and classes from arbitrary peers are ignored
+    spoofed = {"X-Client-Id": "dashboard", "X-Client-Class": "dashboard", "X-Forwarded-For": "198.51.100.1"}
+    assert identifier.identify(spoofed, "203.0.113.9") == "203.0.113.9"
+    assert identifier.identify({"X-API-Key": "guess"}, "203.0.113.9") == "203.0.113.9"
+
+    # API keys name their client wherever the request comes from
+    assert identifier.identify({"X-API-Key": "s3cret"}, "203.0.113.9") == "batch"
+    assert identifier.identify({"Authorization": "Bearer s3cret"}, "10.0.0.2") == "batch"
+
+    # Behind trusted proxies, the nearest untrusted hop is the client; the proxy may set its class
+    forwarded = {"X-Forwarded-For": "192.0.2.1, 198.51.100.7, 10.0.0.3", "X-Client-Class": "dashboard"}
+    assert identifier.identify(forwarded, "10.0.0.2") == "dashboard:198.51.100.7"
+    assert identifier.identify({"X-Forwarded-For": "198.51.100.8"}, "::1") == "198.51.100.8"
+    assert identifier.identify({}, None) == "unknown"
+
+    # Limits apply to a client id, else to its class
+    controller = AdmissionController(client_default_limit=2,
+                                     client_limits={"dashboard": 4, "dashboard:198.51.100.7": 1, "batch": 1})
+    assert [controller.client_limit(client) for client in (
+        "dashboard:198.51.100.9", "dashboard:198.51.100.7", "batch", "203.0.113.9")] == [4, 1, 1, 2]
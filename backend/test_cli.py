@@ -0,0 +1,119 @@
+"""
+Checks the command-line runner: input readers, resume after an interrupted run and the summary
+Run with: python -m pytest test_cli.py
+"""
+
+import json
+
+import pytest
+
+from analyzer.cli import load_last_audits, main, process_task, read_html_dir, read_sitemap, read_url_list
+from pages import spa_shell_page
+
+# Rejected before any request is made, so it fails the same way offline
+BLOCKED_URL = "http://127.0.0.1/admin"
+
+
+@pytest.fixture(autouse=True)
+def private_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_PATH", str(tmp_path / "cache.db"))
+
+
+def page(title: str) -> str:
+    return f"<html lang='en'><head><title>{title}</title></head><body><h1>{title}</h1></body></html>"
+
+
+def read_records(path) -> list:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_inputs_are_read_from_url_lists_sitemaps_and_directories(tmp_path, capsys):
+    urls = tmp_path / "urls.txt"
+    urls.write_text("# seed list\nhttps://example.test/\n\n  https://example.test/about  \n")
+    assert list(read_url_list(str(urls))) == [("url", "https://example.test/"), ("url", "https://example.test/about")]
+
+    (tmp_path / "site" / "blog").mkdir(parents=True)
+    for name in ("index.html", "blog/post.HTM", "blog/notes.txt", "logo.png"):
+        (tmp_path / "site" / name).write_text(page(name))
+    assert [source.rsplit("site", 1)[1] for _, source in read_html_dir(str(tmp_path / "site"))] == [
+        "/blog/post.HTM", "/index.html"]
+
+    # Sitemap pages not modified since the previous run's audit are skipped
+    previous = tmp_path / "previous.jsonl"
+    previous.write_text("\n".join([
+        json.dumps({"source": "https://example.test/old", "metadata": {"timestamp": "2026-02-01T00:00:00"}}),
+        json.dumps({"source": "https://example.test/new", "metadata": {"timestamp": "2026-02-01T00:00:00"}}),
+        json.dumps({"source": "https://example.test/broken", "error": "Failed to fetch website"}),
+        "not json",
+    ]) + "\n")
+    audits = load_last_audits(str(previous))
+    assert sorted(audits) == ["https://example.test/new", "https://example.test/old"]
+
+    sitemap = tmp_path / "sitemap.xml"
+    sitemap.write_text(
+        "<urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>"
+        "<url><loc>https://example.test/old</loc><lastmod>2026-01-15</lastmod></url>"
+        "<url><loc>https://example.test/new</loc><lastmod>2026-03-01</lastmod></url>"
+        "<url><loc>https://example.test/broken</loc><lastmod>2026-01-15</lastmod></url>"
+        "</urlset>"
+    )
+    assert [source for _, source in read_sitemap(str(sitemap), audits)] == [
+        "https://example.test/new", "https://example.test/broken"]
+    assert "Skipped 1 pages unchanged" in capsys.readouterr().err
+
+
+def test_throughput_counts_bytes_read_before_prefiltering(tmp_path):
+    path = tmp_path / "app.html"
+    path.write_text(spa_shell_page(20))
+
+    record, size = process_task(("file", str(path)))
+    assert size == path.stat().st_size == record["metadata"]["received_bytes"]
+    assert record["metadata"]["html_size"] < size
+
+    record, size = process_task(("url", BLOCKED_URL))
+    assert ("error" in record, size) == (True, 0)
+
+
+def test_summary_counts_pages_and_failures(tmp_path, capsys):
+    (tmp_path / "site").mkdir()
+    for name in ("a", "b"):
+        (tmp_path / "site" / f"{name}.html").write_text(page(name))
+    urls = tmp_path / "urls.txt"
+    urls.write_text(BLOCKED_URL + "\n")
+    output = tmp_path / "results.jsonl"
+
+    assert main(["run", "--urls", str(urls), "--html-dir", str(tmp_path / "site"),
+                 "-o", str(output), "--workers", "1"]) == 0
+    records = read_records(output)
+    assert [("error" in record) for record in records] == [True, False, False]
+    assert "Analyzed 3 pages (1 failed)" in capsys.readouterr().err
+
+
+def test_resume_skips_finished_pages_and_retries_the_rest(tmp_path, capsys):
+    site = tmp_path / "site"
+    site.mkdir()
+    for name in ("done", "failed", "cut", "new"):
+        (site / f"{name}.html").write_text(page(name))
+
+    # An interrupted run: one page finished, one failed, one cut off mid-line
+    output = tmp_path / "results.jsonl"
+    done = json.dumps({"source": str(site / "done.html"), "overall_score": 100, "marker": "kept"})
+    failed = json.dumps({"source": str(site / "failed.html"), "error": "Worker crashed"})
+    cut = json.dumps({"source": str(site / "cut.html"), "overall_score": 50})[:30]
+    output.write_text(f"{done}\n{failed}\n{cut}")
+
+    assert main(["run", "--html-dir", str(site), "-o", str(output), "--resume", "--workers", "1"]) == 0
+    err = capsys.readouterr().err
+    assert "Resuming: 1 pages already done" in err
+    assert "Analyzed 3 pages (0 failed)" in err
+
+    records = read_records(output)
+    assert records[0] == json.loads(done)
+    assert sorted(record["source"].rsplit("/", 1)[1] for record in records[1:]) == [
+        "cut.html", "failed.html", "new.html"]
+    assert not any("error" in record for record in records)
+
+    # Nothing left to do on a second resume
+    assert main(["run", "--html-dir", str(site), "-o", str(output), "--resume", "--workers", "1"]) == 0
+    assert "Analyzed 0 pages" in capsys.readouterr().err
+    assert read_records(output) == records
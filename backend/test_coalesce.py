@@ -0,0 +1,108 @@
+"""
+Checks request coalescing: concurrent identical calls share one run, cancellation stays local
+Run with: python -m pytest test_coalesce.py
+"""
+
+import asyncio
+
+import pytest
+
+from analyzer.coalesce import SingleFlight
+
+
+def test_concurrent_calls_run_the_work_once():
+    async def scenario():
+        flight = SingleFlight()
+        runs = []
+        release = asyncio.Event()
+
+        async def work(key: str) -> str:
+            runs.append(key)
+            await release.wait()
+            return f"result for {key}"
+
+        callers = [asyncio.create_task(flight.do("a", lambda: work("a"))) for _ in range(20)]
+        other = asyncio.create_task(flight.do("b", lambda: work("b")))
+        await asyncio.sleep(0)
+        assert flight.stats() == {"in_flight": 2, "coalesced": 19}
+
+        release.set()
+        assert await asyncio.gather(*callers) == ["result for a"] * 20
+        assert await other == "result for b"
+        assert sorted(runs) == ["a", "b"]
+        assert flight.stats() == {"in_flight": 0, "coalesced": 19}
+
+        # Once the work finished, the next call starts a fresh run
+        assert await flight.do("a", lambda: work("a")) == "result for a"
+        assert runs.count("a") == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_callers_do_not_cancel_the_shared_work():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        runs = []
+
+        async def work() -> int:
+            runs.append(1)
+            await release.wait()
+            return 42
+
+        leader = asyncio.create_task(flight.do("k", work))
+        follower = asyncio.create_task(flight.do("k", work))
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert runs == [1]
+
+        # A follower that gives up leaves the run going...
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        late = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        assert flight.stats() == {"in_flight": 1, "coalesced": 2}
+
+        # ...and so does the leader, for the callers still waiting
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+        assert await late == 42
+        assert runs == [1]
+
+        # A cancelled follower doesn't take the result away from its leader
+        release.clear()
+        leader = asyncio.create_task(flight.do("k", work))
+        follower = asyncio.create_task(flight.do("k", work))
+        for _ in range(3):
+            await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await leader == 42
+        assert follower.cancelled()
+        assert runs == [1, 1]
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_shared_and_not_cached():
+    async def scenario():
+        flight = SingleFlight()
+        attempts = []
+
+        async def work() -> str:
+            attempts.append(1)
+            await asyncio.sleep(0)
+            if len(attempts) == 1:
+                raise ValueError("upstream failed")
+            return "ok"
+
+        results = await asyncio.gather(flight.do("k", work), flight.do("k", work), return_exceptions=True)
+        assert [type(result) for result in results] == [ValueError, ValueError]
+        assert await flight.do("k", work) == "ok"
+        assert len(attempts) == 2
+
+    asyncio.run(scenario())
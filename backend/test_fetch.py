@@ -0,0 +1,169 @@
+"""
+Checks retries, circuit breaking and hedging against a fault-injecting HTTP stub
+Run with: python -m pytest test_fetch.py
+"""
+
+import socket
+import struct
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from analyzer.admission import AdmissionRejected
+from analyzer.fetch import CircuitOpenError, Fetcher, FetchPolicy
+from analyzer.scraper import SiteUnavailable, WebScraper
+
+PAGE = b"<html lang='en'><head><title>Stub</title></head><body><h1>Hi</h1></body></html>"
+
+
+class FaultHandler(BaseHTTPRequestHandler):
+    """Answers each path with the next scripted fault, then normally"""
+
+    def do_GET(self):
+        self.server.hits[self.path] += 1
+        script = self.server.script.get(self.path)
+        fault = script.pop(0) if script else self.server.default.get(self.path, "ok")
+
+        if fault == "reset":
+            # Abort the connection with a TCP reset instead of answering
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            self.close_connection = True
+            self.connection.close()
+            return
+        if fault.startswith("slow:"):
+            time.sleep(float(fault[5:]))
+        if fault.isdigit():
+            self.send_response(int(fault))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE) + 100 if fault == "truncate" else len(PAGE)))
+        self.end_headers()
+        try:
+            self.wfile.write(PAGE)
+        except (BrokenPipeError, ConnectionResetError):
+            return  # the client gave up on a slow answer
+        if fault == "truncate":
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FaultHandler)
+    server.daemon_threads = True
+    server.hits, server.script, server.default = Counter(), {}, {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class RecordingSession(requests.Session):
+    requests = 0
+
+    def request(self, *args, **kwargs):
+        self.requests += 1
+        return super().request(*args, **kwargs)
+
+
+def get(fetcher: Fetcher, url: str) -> bytes:
+    return fetcher.fetch(requests.Session(), url, None, lambda response: response.content)
+
+
+def test_transient_failures_are_retried(stub, monkeypatch):
+    monkeypatch.setattr(WebScraper, "ALLOWED_HOSTS", frozenset({"127.0.0.1"}))
+    stub.script["/page"] = ["reset", "503", "truncate"]
+    fetcher = Fetcher(FetchPolicy(retries=3, backoff=0.001))
+
+    html, metadata = WebScraper(fetcher=fetcher).scrape(stub.url + "/page")
+    assert metadata["title"] == "Stub"
+    assert stub.hits["/page"] == 4
+    assert fetcher.retried == 3
+
+    stub.script["/page"] = ["reset", "reset"]
+    with pytest.raises(ValueError, match="Failed to fetch"):
+        WebScraper(fetcher=Fetcher(FetchPolicy(retries=1, backoff=0.001))).scrape(stub.url + "/page")
+    assert stub.hits["/page"] == 6
+
+
+def test_body_memory_is_reserved_from_the_response_headers(stub, monkeypatch):
+    monkeypatch.setattr(WebScraper, "ALLOWED_HOSTS", frozenset({"127.0.0.1"}))
+    fetcher = Fetcher(FetchPolicy(retries=2, backoff=0.001))
+    reserved = []
+    WebScraper(fetcher=fetcher).scrape(stub.url + "/", reserved.append)
+    assert reserved == [len(PAGE)]
+
+    def refuse(size: int) -> None:
+        raise AdmissionRejected("Server is busy, please retry later", 5)
+
+    # A refused reservation is neither retried nor counted against the site
+    with pytest.raises(AdmissionRejected):
+        WebScraper(fetcher=fetcher).scrape(stub.url + "/", refuse)
+    assert stub.hits["/"] == 2
+    assert fetcher.stats()["retried"] == 0
+
+
+def test_breaker_fails_fast_while_host_is_down(stub):
+    stub.default["/"] = "reset"
+    fetcher = Fetcher(FetchPolicy(retries=0, breaker_failures=2, breaker_cooldown=0.2))
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            get(fetcher, stub.url + "/")
+    with pytest.raises(CircuitOpenError):
+        get(fetcher, stub.url + "/")
+    assert stub.hits["/"] == 2
+    assert fetcher.stats()["breakers"] == {"hosts": 1, "open": ["127.0.0.1"], "rejected": 1}
+
+    # After the cooldown a trial request goes through and closes the breaker
+    time.sleep(0.25)
+    stub.default["/"] = "ok"
+    assert get(fetcher, stub.url + "/") == PAGE
+    assert fetcher.stats()["breakers"]["open"] == []
+
+
+def test_truncated_bodies_open_the_breaker(stub, monkeypatch):
+    monkeypatch.setattr(WebScraper, "ALLOWED_HOSTS", frozenset({"127.0.0.1"}))
+    stub.default["/"] = "truncate"
+    fetcher = Fetcher(FetchPolicy(retries=0, breaker_failures=2, breaker_cooldown=30))
+
+    # Headers arrive every time; only the bodies fail
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.RequestException):
+            get(fetcher, stub.url + "/")
+    assert fetcher.stats()["breakers"]["open"] == ["127.0.0.1"]
+
+    # The scraper reports how long until the site is tried again
+    with pytest.raises(SiteUnavailable) as excinfo:
+        WebScraper(fetcher=fetcher).scrape(stub.url + "/")
+    assert 0 < excinfo.value.retry_after <= 30
+    assert stub.hits["/"] == 2
+
+
+def test_read_deadline_and_hedging(stub):
+    stub.script["/"] = ["slow:1"]
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        get(Fetcher(FetchPolicy(retries=0, read_timeout=0.2)), stub.url + "/")
+
+    # A hedged second request answers while the first is still stalled
+    stub.script["/"] = ["slow:1"]
+    fetcher = Fetcher(FetchPolicy(retries=0, hedge_after=0.05))
+    session = RecordingSession()
+    started = time.monotonic()
+    assert fetcher.fetch(session, stub.url + "/", None, lambda response: response.content) == PAGE
+    assert time.monotonic() - started < 0.5
+    assert (fetcher.hedged, fetcher.hedge_wins) == (1, 1)
+    # Racing requests run on copies, so the caller's session is never shared between threads
+    assert session.requests == 0
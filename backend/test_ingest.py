@@ -0,0 +1,72 @@
+"""
+Checks streamed HTML ingest: size limits (413) and malformed uploads (400)
+Run with: python -m pytest test_ingest.py
+"""
+
+import pytest
+
+from analyzer.ingest import ContentTooLarge, HTMLIngest, MultipartHTMLIngest
+from analyzer.prefilter import create_prefilter
+
+BOUNDARY = "----analyzerboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+PAGE = b"<html lang='en'><head><title>Upload</title></head><body><p>Hi</p></body></html>"
+
+
+def multipart(*parts) -> bytes:
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+                 f"Content-Type: text/html\r\n\r\n").encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def feed(ingest: HTMLIngest, body: bytes, chunk_size: int = 7) -> bytes:
+    for start in range(0, len(body), chunk_size):
+        ingest.feed(body[start:start + chunk_size])
+    return ingest.close()
+
+
+def test_raw_body_is_collected_up_to_the_limit():
+    assert feed(HTMLIngest(len(PAGE)), PAGE) == PAGE
+    assert feed(HTMLIngest(len(PAGE), create_prefilter()), PAGE) == PAGE
+
+    # Bodies without a Content-Length are cut off as soon as they pass the limit
+    ingest = HTMLIngest(len(PAGE) - 1)
+    with pytest.raises(ContentTooLarge):
+        feed(ingest, PAGE)
+    assert ingest.size < len(PAGE) + 7
+
+
+def test_multipart_limit_counts_every_byte_of_the_body():
+    body = multipart(("note", None, b"x" * 500), ("file", "page.html", PAGE), ("file", "second.html", b"<p>No</p>"))
+    ingest = MultipartHTMLIngest(CONTENT_TYPE, len(body))
+    assert feed(ingest, body) == PAGE
+    assert (ingest.filename, ingest.size, ingest.received) == ("page.html", len(PAGE), len(body))
+
+    # Other fields count too, so they can't be used to stream past the limit
+    ingest = MultipartHTMLIngest(CONTENT_TYPE, 10 * 1024)
+    with pytest.raises(ContentTooLarge):
+        feed(ingest, multipart(("note", None, b"x" * 1024 * 1024), ("file", "page.html", PAGE)), 4096)
+    assert ingest.received <= 10 * 1024 + 4096
+
+
+def test_multipart_part_headers_are_capped():
+    huge = f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; note="{"a" * 20000}"\r\n\r\n'
+    with pytest.raises(ContentTooLarge, match="headers too large"):
+        feed(MultipartHTMLIngest(CONTENT_TYPE, 1024 * 1024), huge.encode() + PAGE, 1000)
+
+
+@pytest.mark.parametrize("content_type, body, message", [
+    ("multipart/form-data", multipart(("file", "a.html", PAGE)), "Missing boundary"),
+    (CONTENT_TYPE, multipart(("upload", "a.html", PAGE)), "no 'file' field"),
+    (CONTENT_TYPE, b"--wrongboundary\r\n\r\n" + PAGE, "Invalid multipart body"),
+    (CONTENT_TYPE, multipart(("file", "a.html", PAGE))[:-40], "truncated"),
+    (CONTENT_TYPE, multipart(("upload", "a.html", PAGE))[:-10], "truncated"),
+])
+def test_malformed_uploads_are_rejected(content_type, body, message):
+    # ValueError (400) rather than ContentTooLarge (413)
+    with pytest.raises(ValueError, match=message) as error:
+        feed(MultipartHTMLIngest(content_type, 1024 * 1024), body)
+    assert not isinstance(error.value, ContentTooLarge)
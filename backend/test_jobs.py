@@ -0,0 +1,99 @@
+"""
+Checks job leases: expired leases are reclaimed up to max_attempts, saved progress renews them
+Run with: python -m pytest test_jobs.py
+"""
+
+import pytest
+
+from analyzer import jobs
+from analyzer.jobs import JobStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(jobs.time, "time", clock.time)
+    return clock
+
+
+def test_expired_leases_are_reclaimed(tmp_path, clock):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = store.create(["https://example.test/a", "https://example.test/b"])
+
+    assert store.claim("crashed", 60)["job_id"] == job["job_id"]
+    clock.now += 59
+    assert store.claim("other", 60) is None
+
+    clock.now += 2
+    reclaimed = store.claim("other", 60)
+    assert (reclaimed["job_id"], reclaimed["status"], reclaimed["attempts"]) == (job["job_id"], "running", 2)
+
+    # The first worker no longer owns the job, so its late writes are ignored
+    store.save_progress(job["job_id"], "crashed", [{"url": "stale"}], 60)
+    store.finish(job["job_id"], "crashed", "failed", [], error="stale")
+    assert store.get(job["job_id"])["status"] == "running"
+    assert store.get(job["job_id"])["results"] == []
+
+
+def test_saved_progress_renews_the_lease(tmp_path, clock):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = store.create(["https://example.test/a", "https://example.test/b", "https://example.test/c"])
+    store.claim("worker", 60)
+
+    # Each finished URL pushes the lease out, so a long job keeps it
+    for done in range(1, 3):
+        clock.now += 50
+        store.save_progress(job["job_id"], "worker", [{"url": "done"}] * done, 60)
+    clock.now += 50
+    assert store.claim("other", 60) is None
+    assert store.get(job["job_id"])["progress"] == {"done": 2, "total": 3}
+
+    # Progress saved without a lease leaves the expiry alone
+    store.save_progress(job["job_id"], "worker", [{"url": "done"}] * 2)
+    clock.now += 11
+    resumed = store.claim("other", 60)
+    assert resumed["job_id"] == job["job_id"]
+    assert resumed["progress"] == {"done": 2, "total": 3}
+
+
+def test_released_jobs_are_queued_again(tmp_path, clock):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job = store.create(["https://example.test/a"])
+    store.claim("worker", 60)
+    store.release(job["job_id"], "someone-else")
+    assert store.claim("other", 60) is None
+
+    store.release(job["job_id"], "worker")
+    assert store.get(job["job_id"])["status"] == "queued"
+    assert store.claim("other", 60)["attempts"] == 2
+
+
+def test_jobs_fail_after_max_attempts(tmp_path, clock):
+    store = JobStore(str(tmp_path / "jobs.db"), max_attempts=2)
+    job = store.create(["https://example.test/crash"])
+
+    # Two workers die holding the lease; the job is not handed out a third time
+    for attempt in (1, 2):
+        assert store.claim(f"worker-{attempt}", 60)["attempts"] == attempt
+        store.save_progress(job["job_id"], f"worker-{attempt}", [{"url": "done"}], 60)
+        clock.now += 61
+    assert store.claim("worker-3", 60) is None
+
+    failed = store.get(job["job_id"])
+    assert (failed["status"], failed["error"]) == ("failed", "Worker lease expired 2 times")
+    assert failed["results"] == [{"url": "done"}]
+
+    # Released jobs are back in the queue, not abandoned, so they are not failed
+    other = store.create(["https://example.test/a"])
+    for attempt in (1, 2, 3):
+        assert store.claim("worker", 60)["attempts"] == attempt
+        store.release(other["job_id"], "worker")
+    assert store.get(other["job_id"])["status"] == "queued"
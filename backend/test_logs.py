@@ -0,0 +1,55 @@
+"""
+Checks structured logging: sampling, request ids and lazy formatting
+Run with: python -m pytest test_logs.py
+"""
+
+import json
+import logging
+import queue
+
+from analyzer.logs import ContextFilter, JsonFormatter, NonBlockingQueueHandler, bind_request_id
+
+
+class Rendered:
+    """Counts how often a log argument is turned into text"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "rendered"
+
+
+def record(name: str, level: int, msg: str, *args) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_sampling_is_per_category_and_per_request():
+    sampler = ContextFilter({"analyzer": 1.0, "analyzer.scorer": 0.0})
+    with bind_request_id("abc"):
+        assert sampler.filter(record("analyzer.pipeline", logging.INFO, "kept"))
+        assert not sampler.filter(record("analyzer.scorer", logging.INFO, "sampled out"))
+        # Warnings and errors are never sampled
+        kept = record("analyzer.scorer", logging.WARNING, "warning")
+        assert sampler.filter(kept)
+    assert kept.request_id == "abc"
+    assert sampler.sampled_out == 1
+
+    half = ContextFilter({"analyzer": 0.5})
+    with bind_request_id("same-request"):
+        decisions = {half.filter(record("analyzer.x", logging.INFO, "m")) for _ in range(20)}
+    assert len(decisions) == 1
+
+
+def test_queue_handler_formats_lazily_and_never_blocks():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    argument = Rendered()
+    handler.handle(record("analyzer", logging.INFO, "value %s", argument))
+    handler.handle(record("analyzer", logging.INFO, "queue is full"))
+    assert argument.count == 0
+    assert handler.dropped == 1
+
+    line = JsonFormatter().format(handler.queue.get_nowait())
+    assert json.loads(line)["message"] == "value rendered"
+    assert argument.count == 1
@@ -0,0 +1,110 @@
+"""
+Checks that selective parsing gives the same analysis as a full parse
+Run with: python -m pytest test_parsing.py
+"""
+
+import random
+import time
+
+from bs4 import BeautifulSoup
+
+from analyzer import parsing
+from analyzer.ml_analyzer import MLAnalyzer
+from analyzer.pipeline import analyze_content
+from analyzer.rules import RuleBasedAnalyzer
+from analyzer.scraper import WebScraper, extract_title
+from analyzer.shared_cache import SharedCache
+from pages import spa_shell_page, synthetic_page
+
+PAGES = {
+    "spa_shell": spa_shell_page(20),
+    "synthetic": synthetic_page(200),
+    "nesting": (
+        "<html><body><section><div class='muted'>Intro <script>var x = '<p>';</script> text</div>"
+        "<p>First <b>bold</b> <svg><title>icon</title><path d='M0'/></svg> sentence.</p>"
+        "<nav aria-hidden='true'><a>Hidden link</a></nav><a href='/x' aria-hidden='true'>More</a>"
+        "<label>Name <span><input type='text'></span></label><input id='e' type='email'>"
+        "<label for='e'>Email</label></section></div><li>Item<br>one</br> two</li>"
+        "<pre>  spaced\n  <span>  </span></pre><template><p>Template text</p></template>"
+        "<h1>Title</h1><h3 style='color: #999'>Skipped <em>level</em></h3></body></html>"
+    ),
+}
+
+TAGS = ["div", "span", "p", "li", "section", "b", "a", "button", "img", "input", "label",
+        "svg", "path", "script", "style", "h1", "h3", "template", "pre", "br", "textarea"]
+ATTRS = ['class="muted"', 'style="color:red"', 'aria-hidden="true"', 'href="/x"', 'id="q"',
+         'for="q"', 'type="submit"', 'alt="pic"', 'aria-label="y"', 'aria-labelledby="q z"',
+         'id="z"', 'title="t"', 'hidden', 'value="v"']
+TEXT = ["click here", "Read more", " hello. ", "world! ", "  ", "\n", "&amp;", "<!-- c -->"]
+
+
+def random_page(rng: random.Random, depth: int = 0) -> str:
+    """Random, often malformed markup mixing every tag the checks care about"""
+    parts = []
+    for _ in range(rng.randint(0, 5)):
+        if rng.random() < 0.35 or depth > 5:
+            parts.append(rng.choice(TEXT))
+            continue
+        tag = rng.choice(TAGS)
+        attrs = " ".join(rng.sample(ATTRS, rng.randint(0, 2)))
+        if tag in ("script", "style"):
+            parts.append(f"<{tag} {attrs}>var a = '<div>';</{tag}>")
+            continue
+        close = "" if rng.random() < 0.15 else f"</{rng.choice(TAGS) if rng.random() < 0.05 else tag}>"
+        parts.append(f"<{tag} {attrs}>{random_page(rng, depth + 1)}{close}")
+    return "".join(parts)
+
+
+def analyze(html: str, mode: str, monkeypatch) -> tuple:
+    monkeypatch.setattr(parsing, "PARSE_MODE", mode)
+    rule_results = RuleBasedAnalyzer().analyze(html, "test")
+    return rule_results, MLAnalyzer().analyze(html, rule_results)
+
+
+def test_selective_matches_full_on_sample_pages(monkeypatch):
+    for name, html in PAGES.items():
+        assert analyze(html, "selective", monkeypatch) == analyze(html, "full", monkeypatch), name
+
+
+def test_selective_matches_full_on_random_markup(monkeypatch):
+    for seed in range(300):
+        html = f"<html lang='en'><body>{random_page(random.Random(seed))}</body></html>"
+        assert analyze(html, "selective", monkeypatch) == analyze(html, "full", monkeypatch), seed
+
+
+def test_selective_tree_skips_scripts_and_wrappers():
+    soup = parsing.parse_html(PAGES["spa_shell"], "selective")
+    assert soup.find("script") is None
+    assert soup.find("section") is None
+    assert len(soup.find_all("a", href=True)) == 20
+
+
+def test_title_is_read_without_building_a_tree():
+    html = "<html><head><!-- <title>Old</title> --><title> A &amp; B <b>bold</b>\n</title></head><body></body></html>"
+    content, metadata = WebScraper.parse(html.encode("utf-8"), {})
+    # The decoded page goes to the analysis as is, not re-serialized
+    assert content == html
+    assert metadata["title"] == "A & Bbold"
+
+    rng = random.Random(7)
+    for seed in range(300):
+        page = random_page(random.Random(seed)).replace("<span", "<title", 1)
+        tag = BeautifulSoup(page, "html.parser").find("title")
+        expected = tag.get_text(strip=True) if tag else None
+        assert extract_title(page, chunk_size=rng.choice([5, 64, 8192])) == expected, seed
+
+
+def test_parse_time_covers_building_the_tree(tmp_path):
+    html = spa_shell_page(200)
+    _, metadata = WebScraper.parse(html.encode("utf-8"), {})
+    assert "parse_ms" not in metadata
+
+    started = time.perf_counter()
+    parsing.parse_html(html)
+    direct_ms = (time.perf_counter() - started) * 1000
+
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    first = analyze_content(html.encode("utf-8"), "test", cache)
+    assert first["metadata"]["parse_ms"] > direct_ms / 4
+    # Nothing is parsed when the analysis comes from the cache
+    assert "parse_ms" not in analyze_content(html.encode("utf-8"), "test", cache)["metadata"]
@@ -0,0 +1,84 @@
+"""
+Checks that the byte-level prefilter prunes pages without changing the analysis
+Run with: python -m pytest test_prefilter.py
+"""
+
+import time
+
+from analyzer.pipeline import analyze_content
+from analyzer.prefilter import HTMLPrefilter, prefilter_html
+from pages import spa_shell_page, synthetic_page
+
+PAGE = (
+    b"<html lang='en'><head><style>.muted{color:#aaa}</style>"
+    b"<script type='application/json'>{\"html\": \"</div><a href='#'>x</a>\"}</script></head><body>"
+    b"<a href='/'><svg aria-hidden='true' viewBox='0 0 24 24'><g><path d='M0 0L24 24'/></g>"
+    b"<title>Home</title></svg></a><p>Intro <svg><text>Chart</text><rect role='img' aria-label='Bar'/></svg></p>"
+    b"<div data-x='<script>'>Not a script</div><!-- <svg><path d='M1'/></svg> -->"
+    b"<button type='button'><svg><g><path d='M1'/></g></svg></button><p title=it's>1 < 2</p>"
+    b"<label>Name <svg><g></label><input type='text'></body></html>"
+)
+
+# Comment end markers, quoted '>' and bare quotes that chunk boundaries can split
+EDGES = (
+    b"<p><!-- a -- b ---  \n >after<!---->x<!-- - ->--><div title='a>b' data-x=it's>y</div>"
+    b"<svg><g title=\"c>d\"><path d='M0'/></g></svg><!-- never closed <script>"
+)
+
+
+def without_metadata(result: dict) -> dict:
+    result.pop("metadata")
+    return result
+
+
+def test_prunes_script_bodies_and_svg_paths():
+    filtered = prefilter_html(PAGE)
+    assert b"application/json'></script>" in filtered
+    assert b"<path" not in filtered.split(b"<!--")[0]
+    assert b"<title>Home</title>" in filtered
+    assert b"<rect role='img' aria-label='Bar'/>" in filtered
+    assert b".muted{color:#aaa}" in filtered
+    assert b"Not a script" in filtered
+
+
+def test_output_does_not_depend_on_chunking():
+    for page in (PAGE, EDGES):
+        expected = prefilter_html(page)
+        for size in range(1, 64):
+            prefilter = HTMLPrefilter()
+            chunks = [prefilter.feed(page[i:i + size]) for i in range(0, len(page), size)]
+            assert b"".join(chunks) + prefilter.close() == expected, size
+            assert prefilter.bytes_in == len(page)
+            assert prefilter.bytes_out == len(expected)
+    assert prefilter_html(EDGES).count(b"<!--") == 4
+    assert b"<path" not in prefilter_html(EDGES)
+
+
+def test_long_comments_and_attribute_values_take_linear_time():
+    def filter_time(page: bytes) -> float:
+        best = float("inf")
+        for _ in range(3):
+            prefilter = HTMLPrefilter()
+            started = time.perf_counter()
+            for i in range(0, len(page), 8192):
+                prefilter.feed(page[i:i + 8192])
+            prefilter.close()
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    pages = (
+        lambda size: b"<body><!--" + b"x" * size + b"--></body>",
+        lambda size: b"<body><div title='" + b"a>" * (size // 2) + b"'>x</div></body>",
+        lambda size: b"<body><div title='" + b"a" * size + b"</body>",
+        lambda size: (synthetic_page(10).encode("utf-8") * (size // 2000))[:size],
+    )
+    for build in pages:
+        small, large = filter_time(build(1 << 20)), filter_time(build(2 << 20))
+        # Quadratic scanning would take four times as long
+        assert large < 3 * small + 0.01
+
+
+def test_analysis_is_unchanged():
+    for page in (PAGE, spa_shell_page(20).encode("utf-8"), synthetic_page(200).encode("utf-8")):
+        expected = without_metadata(analyze_content(page, "test"))
+        assert without_metadata(analyze_content(prefilter_html(page), "test")) == expected
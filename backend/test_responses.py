@@ -0,0 +1,105 @@
+"""
+Checks response encoding: Accept-Encoding negotiation, the size threshold and off-loop compression
+Run with: python -m pytest test_responses.py
+"""
+
+import asyncio
+import gzip
+import json
+import threading
+
+import pytest
+
+from analyzer import responses
+from analyzer.responses import FastJSONResponse, negotiate_encoding
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(responses, "brotli", None)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("gzip", "gzip"),
+    ("GZIP, deflate", "gzip"),
+    ("deflate", None),
+    ("identity", None),
+    ("gzip;q=0", None),
+    ("gzip; q=0.0, identity", None),
+    ("gzip;q=banana", None),
+    ("*", "gzip"),
+    ("*;q=0", None),
+    ("*, gzip;q=0", None),
+    ("gzip;q=0.5, *;q=0", "gzip"),
+])
+def test_gzip_is_negotiated(gzip_only, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, *", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+])
+def test_brotli_is_preferred_when_installed(header, expected):
+    pytest.importorskip("brotli")
+    assert negotiate_encoding(header) == expected
+
+
+def send_response(response: FastJSONResponse) -> tuple:
+    """Run a response through ASGI and return (headers, body) as sent"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response({"type": "http", "method": "GET"}, receive, send))
+    headers = {key.decode(): value.decode() for key, value in messages[0]["headers"]}
+    return headers, b"".join(message.get("body", b"") for message in messages[1:])
+
+
+def test_small_bodies_are_sent_uncompressed(gzip_only):
+    data = {"issues": ["x" * 100]}
+    headers, body = send_response(FastJSONResponse(data, accept_encoding="gzip"))
+    assert "content-encoding" not in headers
+    assert headers["vary"] == "Accept-Encoding"
+    assert json.loads(body) == data
+
+
+def test_large_bodies_are_compressed_off_the_event_loop(gzip_only, monkeypatch):
+    threads = []
+
+    def compress(body: bytes, encoding: str) -> bytes:
+        threads.append(threading.current_thread())
+        return gzip.compress(body)
+
+    monkeypatch.setattr(responses, "compress", compress)
+
+    # Above MIN_COMPRESS_SIZE: compressed up front, on the calling thread
+    medium = {"issues": ["x" * 10 * 1024]}
+    response = FastJSONResponse(medium, accept_encoding="gzip")
+    assert threads == [threading.main_thread()]
+    headers, body = send_response(response)
+    assert (headers["content-encoding"], int(headers["content-length"])) == ("gzip", len(body))
+    assert json.loads(gzip.decompress(body)) == medium
+
+    # Above THREADPOOL_COMPRESS_SIZE: compressed in the threadpool when sent
+    large = {"issues": ["x" * responses.THREADPOOL_COMPRESS_SIZE]}
+    response = FastJSONResponse(large, accept_encoding="gzip;q=0.8, identity")
+    assert len(threads) == 1
+    headers, body = send_response(response)
+    assert len(threads) == 2 and threads[1] is not threading.main_thread()
+    assert (headers["content-encoding"], int(headers["content-length"])) == ("gzip", len(body))
+    assert json.loads(gzip.decompress(body)) == large
+
+    # Clients that refuse gzip get the body as is
+    headers, body = send_response(FastJSONResponse(large, accept_encoding="gzip;q=0"))
+    assert "content-encoding" not in headers
+    assert json.loads(body) == large
+    assert len(threads) == 2
@@ -0,0 +1,85 @@
+"""
+Checks quick-mode sampling: deterministic samples, extrapolation intervals and the request deadline
+Run with: python -m pytest test_sampling.py
+"""
+
+import random
+import time
+
+import pytest
+
+from analyzer.pipeline import analyze_html
+from analyzer.results import CheckResult
+from analyzer.sampling import MIN_SAMPLE_SIZE, Sampler
+
+
+def population(seed: int, size: int, failure_rate: float):
+    rng = random.Random(seed)
+    return [rng.random() < failure_rate for _ in range(size)]
+
+
+def sampled_result(sampler: Sampler, elements) -> CheckResult:
+    sample = sampler.sample("links", elements)
+    failed = sum(sample)
+    return sampler.extrapolate("links", CheckResult(len(sample), len(sample) - failed, failed))
+
+
+def test_sample_is_deterministic_for_a_fixed_seed():
+    elements = population(7, 5000, 0.1)
+    first = Sampler(max_elements=400).sample("links", elements)
+    again = Sampler(max_elements=400).sample("links", population(7, 5000, 0.1))
+    assert first == again
+    assert len(first) == 400
+    assert Sampler(max_elements=400).sample("links", list(range(5000)))[:3] == [0, 12, 25]
+
+
+def test_interval_covers_the_exact_failure_count():
+    covered = 0
+    for seed in range(40):
+        elements = population(seed, 4000, 0.15)
+        sampler = Sampler(max_elements=300)
+        result = sampled_result(sampler, elements)
+        low, high = sampler.samples["links"].failed_ci95
+        assert low <= result.failed <= high
+        covered += low <= sum(elements) <= high
+    assert covered >= 36
+
+    # The finite population correction narrows the interval as the sample nears the population
+    elements = population(1, 1000, 0.2)
+    widths = []
+    for size in (200, 600, 990):
+        sampler = Sampler(max_elements=size)
+        sampled_result(sampler, elements)
+        low, high = sampler.samples["links"].failed_ci95
+        assert low <= sum(elements) <= high
+        widths.append(high - low)
+    assert widths[0] > widths[1] > widths[2]
+
+
+def test_small_populations_are_counted_in_full():
+    elements = population(3, 250, 0.3)
+    sampler = Sampler(max_elements=250)
+    result = sampled_result(sampler, elements)
+    assert sampler.samples == {}
+    assert result == CheckResult(250, 250 - sum(elements), sum(elements))
+    assert sampler.report()["checks"] == {}
+
+
+def test_budget_runs_from_the_start_of_the_request():
+    fresh = Sampler.for_budget(200)
+    assert fresh.max_elements > 1000
+
+    # Most of the budget already went to fetching and parsing
+    late = Sampler.for_budget(200, started=time.perf_counter() - 0.15)
+    assert late.spent_before_checks_ms >= 150
+    assert MIN_SAMPLE_SIZE <= late.max_elements <= 500
+
+    links = "".join(f"<a href='/{index}'>Link {index}</a>" for index in range(2000))
+    html = f"<html lang='en'><head><title>Links</title></head><body>{links}</body></html>"
+    result = analyze_html(html, "test", budget_ms=100, started=time.perf_counter() - 0.5)
+    sampling = result["sampling"]
+    assert sampling["max_elements_per_check"] == MIN_SAMPLE_SIZE
+    assert sampling["checks"]["links"]["sample_size"] == MIN_SAMPLE_SIZE
+    assert sampling["spent_before_checks_ms"] >= 500
+    assert sampling["overshoot_ms"] >= 400
+    assert sampling["elapsed_ms"] - sampling["overshoot_ms"] == pytest.approx(100)
@@ -0,0 +1,47 @@
+"""
+Checks that batch re-scoring matches ScoringEngine.calculate
+Run with: python -m pytest test_scorer.py
+"""
+
+import random
+
+from analyzer import scorer
+from analyzer.results import ChecklistItem
+from analyzer.scorer import ScoreColumns, ScoringEngine, WeightProfile, compare_profiles
+
+PROFILES = [WeightProfile(), WeightProfile(high_rate=0.4, medium_rate=0.2, penalty_cap=0.5, pass_floor=50)]
+
+
+def random_checklist(rng: random.Random) -> list:
+    checklist = []
+    for _ in range(rng.choice([0, 1, 8, 8])):
+        total = rng.choice([0, 1, 5, 100, 3000])
+        failed = rng.randint(0, total)
+        checklist.append(ChecklistItem(
+            "check", "1.1.1", "", "pass" if failed == 0 else "fail",
+            rng.choice(["High", "Medium", "Low"]), total, total - failed, failed, ""
+        ))
+    return checklist
+
+
+def test_batch_matches_calculate(monkeypatch):
+    rng = random.Random(0)
+    checklists = [random_checklist(rng) for _ in range(2000)]
+    columns = ScoreColumns.from_checklists(checklists)
+    for profile in PROFILES:
+        engine = ScoringEngine(profile)
+        expected = [engine.calculate(checklist)["overall_score"] for checklist in checklists]
+        assert [int(score) for score in engine.score_batch(columns)] == expected
+        # Pure-Python fallback without numpy
+        monkeypatch.setattr(scorer, "np", None)
+        assert list(engine.score_batch(columns)) == expected
+        monkeypatch.undo()
+
+
+def test_compare_profiles_reports_deltas():
+    rng = random.Random(1)
+    columns = ScoreColumns.from_checklists(random_checklist(rng) for _ in range(200))
+    comparison = compare_profiles(columns, *PROFILES)
+    assert comparison["baseline"]["count"] == comparison["candidate"]["count"] == 200
+    assert sum(comparison["candidate"]["bands"].values()) == 200
+    assert comparison["changes"]["max_decrease"] <= 0
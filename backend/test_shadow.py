@@ -0,0 +1,53 @@
+"""
+Checks shadow comparisons of an alternate engine configuration
+Run with: python -m pytest test_shadow.py
+"""
+
+import copy
+import time
+
+import pytest
+
+from analyzer.pipeline import analyze_html
+from analyzer.shadow import EngineConfig, ShadowRunner
+
+HTML = (
+    "<html lang='en'><head><title>Shadow</title><script>var x = '<a href=/>';</script></head><body>"
+    "<h1>Title</h1><img src='a.png'><a href='/x'>click here</a><button></button>"
+    "<label for='e'>Email</label><input id='e'><input name='q'></body></html>"
+)
+
+
+def test_engine_config_from_spec():
+    assert EngineConfig.parse("parse_mode=full, parser=lxml") == EngineConfig("full", "lxml")
+    assert EngineConfig.parse("") == EngineConfig()
+    with pytest.raises(ValueError):
+        EngineConfig.parse("parse_mode=fast")
+    with pytest.raises(ValueError):
+        EngineConfig.parse("engine=single-pass")
+    assert not ShadowRunner(None, sample_rate=1.0).enabled
+
+
+def test_shadow_runs_record_count_differences_and_deltas():
+    runner = ShadowRunner(EngineConfig.parse("parse_mode=full"), sample_rate=1.0)
+    try:
+        result = analyze_html(HTML, "https://example.test/")
+        assert runner.maybe_submit(HTML, "https://example.test/", result)
+
+        # A served result that disagrees with the engines on one check
+        drifted = copy.deepcopy(result)
+        links = next(item for item in drifted["checklist"] if item["check"] == "Links are descriptive")
+        links["failed"] += 2
+        assert runner.maybe_submit(HTML, "https://example.test/drifted", drifted)
+
+        deadline = time.monotonic() + 60
+        while runner.stats()["completed"] + runner.stats()["errors"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        stats = runner.stats()
+        assert (stats["completed"], stats["errors"], stats["identical"]) == (2, 0, 1)
+        assert stats["checks"] == {"Links are descriptive": {"pages": 1, "total_delta": 0, "failed_delta": -2}}
+        assert stats["recent_differences"][0]["url"] == "https://example.test/drifted"
+        assert stats["latency_ms"]["primary"] > 0 and stats["peak_memory_kb"]["shadow"] > 0
+    finally:
+        runner.shutdown()
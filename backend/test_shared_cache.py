@@ -0,0 +1,80 @@
+"""
+Checks the shared SQLite cache: LRU eviction to 90% of the bound, and connections after a fork
+Run with: python -m pytest test_shared_cache.py
+"""
+
+import os
+import sqlite3
+
+import pytest
+
+from analyzer import shared_cache
+from analyzer.shared_cache import SharedCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+def total_size(path: str) -> tuple:
+    with sqlite3.connect(path) as conn:
+        recorded = conn.execute("SELECT size FROM totals").fetchone()[0]
+        actual = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    return recorded, actual
+
+
+def test_least_recently_used_entries_are_evicted_to_90_percent(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(shared_cache.time, "time", clock.time)
+    path = str(tmp_path / "cache.db")
+    cache = SharedCache(path, max_bytes=10_000)
+
+    # Ten 1000-byte entries (value plus key) fill the cache exactly
+    for index in range(10):
+        clock.now += 1
+        cache.set("page", f"k{index:02d}", b"x" * 997)
+    assert total_size(path) == (10_000, 10_000)
+
+    # Reads older than TOUCH_INTERVAL refresh an entry's place in the LRU order
+    clock.now += SharedCache.TOUCH_INTERVAL + 1
+    assert cache.get("page", "k00").value == b"x" * 997
+    assert cache.get("page", "k01").value == b"x" * 997
+
+    clock.now += 1
+    cache.set("analysis", "k10", b"y" * 997)
+    assert total_size(path) == (9_000, 9_000)
+    present = [index for index in range(11) if cache.get("analysis" if index == 10 else "page", f"k{index:02d}")]
+    assert present == [0, 1, 4, 5, 6, 7, 8, 9, 10]
+
+    # Replacing an entry counts only the difference; oversized values are not stored
+    cache.set("page", "k04", b"z" * 497)
+    cache.set("page", "huge", b"h" * 10_001)
+    assert total_size(path) == (8_500, 8_500)
+    assert cache.get("page", "huge") is None
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_children_open_their_own_connection(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    cache.set("page", "parent", b"from parent")
+    parent_conn = cache._connection()
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: must not reuse the parent's connection, and must be able to write
+        status = 1
+        try:
+            if cache._connection() is not parent_conn and cache.get("page", "parent").value == b"from parent":
+                cache.set("page", "child", b"from child")
+                status = 0
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert cache._connection() is parent_conn
+    assert cache.get("page", "child").value == b"from child"
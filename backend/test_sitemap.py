@@ -0,0 +1,129 @@
+"""
+Checks the streaming sitemap reader: gzip, sitemap indexes, nesting depth and size limits
+Run with: python -m pytest test_sitemap.py
+"""
+
+import gzip
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from analyzer.scraper import WebScraper
+from analyzer.sitemap import SitemapReader
+
+NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def urlset(urls, lastmod: str = "") -> bytes:
+    entries = "".join(
+        f"<url><loc> {url} </loc>{f'<lastmod>{lastmod}</lastmod>' if lastmod else ''}</url>" for url in urls
+    )
+    return f"<?xml version='1.0' encoding='UTF-8'?><urlset xmlns='{NS}'>{entries}</urlset>".encode()
+
+
+def index(locations) -> bytes:
+    entries = "".join(f"<sitemap><loc>{location}</loc></sitemap>" for location in locations)
+    return f"<?xml version='1.0' encoding='UTF-8'?><sitemapindex xmlns='{NS}'>{entries}</sitemapindex>".encode()
+
+
+class SmallChunkReader(SitemapReader):
+    # Entries, gzip members and decompressed output all straddle chunk boundaries
+    CHUNK_SIZE = 100
+
+
+def test_gzipped_sitemaps_are_streamed(tmp_path):
+    urls = [f"https://example.test/page/{number}" for number in range(2000)]
+    plain = tmp_path / "sitemap.xml"
+    plain.write_bytes(urlset(urls))
+    packed = tmp_path / "sitemap.xml.gz"
+    packed.write_bytes(gzip.compress(urlset(urls)))
+
+    for path in (plain, packed):
+        assert [entry.url for entry in SmallChunkReader().read(str(path))] == urls
+
+
+def test_multi_member_gzip_is_read_to_the_end(tmp_path):
+    document = urlset([f"https://example.test/page/{number}" for number in range(300)])
+    # gzip files may be concatenated; each member holds part of the document
+    thirds = [document[:1000], document[1000:5000], document[5000:]]
+    path = tmp_path / "sitemap.xml.gz"
+    path.write_bytes(b"".join(gzip.compress(part) for part in thirds))
+
+    for reader in (SitemapReader(), SmallChunkReader()):
+        assert len(list(reader.read(str(path)))) == 300
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def test_remote_indexes_cannot_point_at_local_files(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(WebScraper, "ALLOWED_HOSTS", frozenset({"127.0.0.1"}))
+    secret = tmp_path / "secret.xml"
+    secret.write_bytes(urlset(["https://example.test/from-a-local-file"]))
+    served = tmp_path / "served"
+    served.mkdir()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), lambda *args: QuietHandler(*args, directory=str(served)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        (served / "pages.xml").write_bytes(urlset(["https://example.test/"]))
+        (served / "index.xml").write_bytes(index([secret, f"file://{secret}", f"{base}/pages.xml"]))
+
+        reader = SitemapReader()
+        with caplog.at_level(logging.WARNING, logger="analyzer.sitemap"):
+            assert [entry.url for entry in reader.read(f"{base}/index.xml")] == ["https://example.test/"]
+        assert reader.rejected == 2
+        assert sum("non-HTTP sitemap" in record.message for record in caplog.records) == 2
+
+        # A local index may still list local sitemaps
+        (tmp_path / "index.xml").write_bytes(index([secret]))
+        assert [entry.url for entry in SitemapReader().read(str(tmp_path / "index.xml"))] == [
+            "https://example.test/from-a-local-file"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_indexes_are_followed_and_unchanged_pages_skipped(tmp_path):
+    (tmp_path / "news.xml.gz").write_bytes(gzip.compress(urlset(["https://example.test/news"], "2024-05-01")))
+    (tmp_path / "pages.xml").write_bytes(urlset(["https://example.test/", "https://example.test/about"],
+                                                "2024-05-01T10:00:00+00:00"))
+    (tmp_path / "index.xml").write_bytes(index([tmp_path / "pages.xml", tmp_path / "news.xml.gz"]))
+
+    audited = {"https://example.test/about": datetime(2024, 6, 1, tzinfo=timezone.utc),
+               "https://example.test/news": datetime(2024, 4, 1, tzinfo=timezone.utc)}
+    reader = SmallChunkReader(last_audited=audited.get)
+    entries = list(reader.read(str(tmp_path / "index.xml")))
+    assert [entry.url for entry in entries] == ["https://example.test/", "https://example.test/news"]
+    assert entries[1].lastmod == datetime(2024, 5, 1, tzinfo=timezone.utc)
+    assert reader.skipped == 1
+
+
+def test_nesting_is_limited(tmp_path, caplog):
+    # index-0 -> index-1 -> ... -> index-5 -> pages, and an index that lists itself
+    for level in range(6):
+        (tmp_path / f"index-{level}.xml").write_bytes(index([tmp_path / f"index-{level + 1}.xml"]))
+    (tmp_path / "index-6.xml").write_bytes(urlset(["https://example.test/deep"]))
+    (tmp_path / "loop.xml").write_bytes(index([tmp_path / "loop.xml"]))
+
+    with caplog.at_level(logging.WARNING, logger="analyzer.sitemap"):
+        assert list(SitemapReader().read(str(tmp_path / "index-3.xml"))) != []
+        assert list(SitemapReader().read(str(tmp_path / "index-2.xml"))) == []
+        assert list(SitemapReader().read(str(tmp_path / "loop.xml"))) == []
+    assert sum("too deep" in record.message for record in caplog.records) == 2
+
+
+def test_decompressed_size_is_limited(tmp_path, monkeypatch):
+    monkeypatch.setattr(SitemapReader, "MAX_SITEMAP_SIZE", 64 * 1024)
+    bomb = tmp_path / "bomb.xml.gz"
+    bomb.write_bytes(gzip.compress(urlset(["https://example.test/" + "a" * 1000] * 200)))
+    assert bomb.stat().st_size < 8 * 1024
+
+    with pytest.raises(ValueError, match="maximum size"):
+        list(SmallChunkReader().read(str(bomb)))
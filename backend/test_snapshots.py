@@ -0,0 +1,102 @@
+"""
+Checks the snapshot store: deduplication, per-site dictionaries, random access and offline re-analysis
+Run with: python -m pytest test_snapshots.py
+"""
+
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from analyzer.cli import main
+from analyzer.snapshots import SnapshotStore, zstandard
+
+CODECS = ["zlib", pytest.param("zstd", marks=pytest.mark.skipif(zstandard is None, reason="zstandard not installed"))]
+
+TEMPLATE = (
+    "<html lang='en'><head><title>Page %d</title><link rel='stylesheet' href='/static/site.css'></head><body>\n"
+    "<header class='site-header'><nav aria-label='Main'><a href='/'>Home</a> <a href='/about'>About us</a> "
+    "<a href='/products'>Products</a> <a href='/contact'>Contact</a></nav></header>\n"
+    "<main><h1>Article %d</h1><p>Body text number %d.</p><img src='/img/%d.png'></main>\n"
+    "<footer class='site-footer'><p>Copyright Example Ltd. All rights reserved.</p>"
+    "<a href='/privacy'>Privacy policy</a> <a href='/terms'>Terms of use</a></footer>\n"
+    "</body></html>"
+)
+
+
+def page(index: int) -> str:
+    return TEMPLATE % (index, index, index, index)
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_snapshots_are_deduplicated_and_read_back(codec, tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"), codec=codec, train_after=8, pack_limit=4096)
+    hashes = [store.put(f"https://example.test/page/{index}", page(index), captured_at=index) for index in range(40)]
+    # A second audit in which nothing changed
+    again = [store.put(f"https://example.test/page/{index}", page(index), captured_at=100 + index) for index in range(40)]
+    assert again == hashes
+    store.put("https://other.test/", "<html><body>Other site</body></html>", captured_at=200)
+
+    stats = store.stats()
+    assert (stats["snapshots"], stats["blobs"], stats["dictionaries"]) == (81, 41, 1)
+    assert stats["stored_bytes"] < stats["unique_bytes"]
+
+    # Reads in any order, across packs, with and without a dictionary, from a fresh handle
+    store.close()
+    reopened = SnapshotStore(str(tmp_path / "snapshots"), codec=codec)
+    for index in (39, 0, 17, 8, 3):
+        assert reopened.get(hashes[index]).decode("utf-8") == page(index)
+    assert reopened.get("0" * 64) is None
+    assert len(list((tmp_path / "snapshots" / "packs").iterdir())) > 1
+
+    latest = list(reopened.snapshots(site="example.test", latest=True))
+    assert [row["captured_at"] for row in latest] == [100 + index for index in range(40)]
+    assert [row["url"] for row in reopened.snapshots(since=39, until=101)] == [
+        "https://example.test/page/39", "https://example.test/page/0"]
+
+
+def test_concurrent_writers_share_one_dictionary_and_failed_appends_are_undone(tmp_path):
+    root = tmp_path / "snapshots"
+    store = SnapshotStore(str(root), train_after=8)
+
+    def write(offset: int) -> None:
+        for index in range(offset, 60, 4):
+            store.put(f"https://example.test/page/{index}", page(index))
+
+    threads = [threading.Thread(target=write, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.stats()["dictionaries"] == 1
+    for row in store.snapshots():
+        assert store.get(row["hash"]).decode("utf-8") == page(int(row["url"].rsplit("/", 1)[1]))
+
+    # A transaction that fails after the append leaves no dead bytes behind
+    pack = root / "packs" / "pack-00001.dat"
+    size = pack.stat().st_size
+    with sqlite3.connect(str(root / "index.db")) as conn:
+        conn.execute("CREATE TRIGGER refuse BEFORE INSERT ON snapshots BEGIN SELECT RAISE(ABORT, 'refused'); END")
+    with pytest.raises(sqlite3.IntegrityError):
+        store.put("https://example.test/new", page(1000))
+    assert pack.stat().st_size == size
+    assert store.stats()["blobs"] == 60
+
+
+def test_reanalyze_command_runs_offline_from_snapshots(tmp_path):
+    root = str(tmp_path / "snapshots")
+    store = SnapshotStore(root, train_after=4)
+    for index in range(6):
+        store.put(f"https://example.test/page/{index}", page(index), captured_at=1767225600 + index)
+    store.put("https://example.test/page/0", page(99), captured_at=1767312000)
+    store.close()
+
+    output = tmp_path / "results.jsonl"
+    assert main(["reanalyze", "--snapshots", root, "--since", "2026-01-01", "--latest",
+                 "-o", str(output), "--workers", "2"]) == 0
+    records = {record["source"]: record for record in map(json.loads, output.read_text().splitlines())}
+    assert len(records) == 6
+    assert records["https://example.test/page/0"]["metadata"]["title"] == "Page 99"
+    assert records["https://example.test/page/0"]["snapshot"]["captured_at"] == 1767312000
+    assert all("overall_score" in record for record in records.values())
@@ -0,0 +1,32 @@
+"""
+Checks that template deduplication gives the same scores as a full analysis
+Run with: python -m pytest test_templates.py
+"""
+
+from analyzer.pipeline import analyze_html
+from analyzer.templates import TemplateRegistry, find_template_regions
+from analyzer.parsing import parse_html
+from pages import site_page
+
+
+def test_pages_match_full_analysis():
+    registry = TemplateRegistry()
+    for index in range(5):
+        html = site_page(index, 40)
+        expected = analyze_html(html, "test")
+        result = analyze_html(html, "test", templates=registry)
+        assert len(result.pop("templates")) == 3
+        assert result["checklist"] == expected["checklist"]
+        assert result["overall_score"] == expected["overall_score"]
+    # header, footer and cookie banner are analyzed on the first page only
+    assert registry.misses == 3
+    assert registry.hits == 12
+
+
+def test_regions_are_outermost_and_outside_main():
+    soup = parse_html(
+        "<body><header><nav><a href='/'>Home</a></nav></header>"
+        "<main><article><header>Post</header></article></main>"
+        "<a href='/x'><nav>Inside a link</nav></a><div id='cookie-consent'>Cookies</div></body>"
+    )
+    assert [region.name for region in find_template_regions(soup)] == ["header", "div"]
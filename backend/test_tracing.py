@@ -0,0 +1,50 @@
+"""
+Checks that analyses produce traces with a span per stage
+Run with: python -m pytest test_tracing.py
+"""
+
+from analyzer.pipeline import analyze_html
+from analyzer.tracing import InMemorySpanExporter, Tracer, set_tracer, start_trace
+from analyzer.rules import RuleBasedAnalyzer
+
+HTML = "<html lang='en'><body><h1>Title</h1><a href='/x'>here</a><img src='a.png'></body></html>"
+
+
+def traced(tracer: Tracer, traceparent: str = None) -> None:
+    set_tracer(tracer)
+    try:
+        with start_trace("test", traceparent):
+            analyze_html(HTML, "test")
+    finally:
+        set_tracer(Tracer())
+
+
+def test_trace_has_a_span_per_stage():
+    exporter = InMemorySpanExporter()
+    traced(Tracer(exporter))
+
+    spans = {span.name: span for span in exporter.spans}
+    root = spans["test"]
+    assert {span.trace_id for span in exporter.spans} == {root.trace_id}
+    assert spans["pipeline.analyze"].parent_id == root.span_id
+    for check in RuleBasedAnalyzer.CHECKS:
+        assert spans[f"rules.{check}"].parent_id == spans["rules.analyze"].span_id
+    assert spans["rules.links"].attributes == {"elements": 1, "failed": 1}
+    assert spans["pipeline.parse"].attributes["html_bytes"] == len(HTML)
+    assert {"ml.analyze", "checklist.generate", "scoring.calculate"} <= set(spans)
+
+
+def test_sampling_and_traceparent():
+    exporter = InMemorySpanExporter()
+    traced(Tracer(exporter, sample_rate=0))
+    assert exporter.spans == []
+
+    # The caller's sampling decision and trace id win
+    traced(Tracer(exporter, sample_rate=0), "00-" + "ab" * 16 + "-" + "cd" * 8 + "-01")
+    root = next(span for span in exporter.spans if span.name == "test")
+    assert root.trace_id == "ab" * 16 and root.parent_id == "cd" * 8
+
+    # Slow traces are kept even when not sampled
+    exporter.spans.clear()
+    traced(Tracer(exporter, sample_rate=0, slow_ms=0))
+    assert exporter.spans
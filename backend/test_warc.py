@@ -0,0 +1,114 @@
+"""
+Checks WARC reading, splitting and analysis of archived responses
+Run with: python -m pytest test_warc.py
+"""
+
+import gzip
+import json
+
+import pytest
+
+from analyzer.cli import main
+from analyzer.warc import WarcArchive, html_responses
+
+PAGE = b"<html lang='en'><head><title>Page %d</title></head><body><img src='a.png'><a href='/'>home</a></body></html>"
+
+
+def warc_record(warc_type: str, uri: str, block: bytes, content_type: str = "application/http; msgtype=response") -> bytes:
+    headers = (
+        f"WARC/1.0\r\nWARC-Type: {warc_type}\r\nWARC-Record-ID: <urn:uuid:{abs(hash((uri, warc_type)))}>\r\n"
+        f"WARC-Target-URI: {uri}\r\nWARC-Date: 2026-01-02T03:04:05Z\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(block)}\r\n\r\n"
+    )
+    return headers.encode("ascii") + block + b"\r\n\r\n"
+
+
+def http_response(body: bytes, status: str = "200 OK", content_type: str = "text/html; charset=utf-8",
+                  extra: str = "") -> bytes:
+    return f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n{extra}\r\n".encode("ascii") + body
+
+
+def build_records(count: int) -> list:
+    records = [warc_record("warcinfo", "", b"software: test\r\n", "application/warc-fields")]
+    for index in range(count):
+        uri = f"https://example.test/page/{index}"
+        records.append(warc_record("request", uri, f"GET /page/{index} HTTP/1.1\r\n\r\n".encode(),
+                                   "application/http; msgtype=request"))
+        body = PAGE % index
+        if index % 3 == 1:
+            # Stored as received: chunked and gzip-encoded
+            encoded = gzip.compress(body)
+            body = b"%x\r\n%s\r\n0\r\n\r\n" % (len(encoded), encoded)
+            records.append(warc_record("response", uri, http_response(
+                body, extra="Transfer-Encoding: chunked\r\nContent-Encoding: gzip\r\n")))
+        else:
+            records.append(warc_record("response", uri, http_response(body)))
+    records.append(warc_record("response", "https://example.test/missing", http_response(b"gone", "404 Not Found")))
+    records.append(warc_record("response", "https://example.test/logo.png", http_response(b"\x89PNG", content_type="image/png")))
+    return records
+
+
+@pytest.fixture(params=["warc", "warc.gz"])
+def archive_path(request, tmp_path):
+    records = build_records(30)
+    path = tmp_path / f"crawl.{request.param}"
+    if request.param == "warc.gz":
+        path.write_bytes(b"".join(gzip.compress(record) for record in records))
+    else:
+        path.write_bytes(b"".join(records))
+    return str(path)
+
+
+def test_ranges_cover_every_record_once(archive_path):
+    with WarcArchive(archive_path) as archive:
+        everything = archive.index()
+        assert len(everything) == 63
+        assert sum(ref.length for ref in everything) == archive.size
+
+        for parts in (1, 4, 7, 50):
+            ranges = archive.split(parts)
+            split = [ref for start, end in ranges for ref in archive.index(start, end)]
+            assert split == everything
+
+        uris = [record.target_uri for record, _ in html_responses(archive)]
+        assert uris == [f"https://example.test/page/{index}" for index in range(30)]
+        record, body = next(html_responses(archive, everything[5].offset))
+        assert bytes(body) == PAGE % 2
+        assert archive.read(record.offset).target_uri == record.target_uri
+
+
+def test_members_holding_several_records_are_read_in_full(tmp_path):
+    records = build_records(5)
+    whole = tmp_path / "whole.warc.gz"
+    whole.write_bytes(gzip.compress(b"".join(records)))
+    # Per-record members followed by one member with the rest
+    mixed = tmp_path / "mixed.warc.gz"
+    mixed.write_bytes(b"".join(gzip.compress(record) for record in records[:4]) + gzip.compress(b"".join(records[4:])))
+
+    for path in (whole, mixed):
+        with WarcArchive(str(path)) as archive:
+            assert [record.target_uri for record, _ in html_responses(archive)] == [
+                f"https://example.test/page/{index}" for index in range(5)]
+            everything = archive.index()
+            assert len(everything) == len(records)
+            assert sum(ref.length for ref in everything) == archive.size
+            for parts in (1, 3):
+                assert [ref for start, end in archive.split(parts) for ref in archive.index(start, end)] == everything
+            # Records sharing a member share its offset; reading it gives the member's first record
+            first = 0 if path == whole else 4
+            assert {ref.offset for ref in everything[first:]} == {everything[first].offset}
+            assert archive.read(everything[-1].offset).ref() == everything[first]
+
+
+def test_warc_command_analyzes_archived_pages(archive_path, tmp_path):
+    output = tmp_path / "results.jsonl"
+    assert main(["warc", archive_path, "-o", str(output), "--workers", "2"]) == 0
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(record["source"] for record in records) == sorted(
+        f"https://example.test/page/{index}" for index in range(30))
+    for record in records:
+        index = int(record["source"].rsplit("/", 1)[1])
+        assert record["metadata"]["title"] == f"Page {index}"
+        assert record["warc"]["date"] == "2026-01-02T03:04:05Z"
+        assert "overall_score" in record
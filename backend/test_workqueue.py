@@ -0,0 +1,71 @@
+"""
+Checks the work queue's leases, crash recovery and worker loop
+Run with: python -m pytest test_workqueue.py
+"""
+
+import threading
+import time
+
+from analyzer.workqueue import QueueWorker, TaskQueue
+
+
+def test_leases_and_crash_recovery(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), wal=True, max_attempts=2)
+    assert queue.enqueue([("url", "https://a.test/"), ("url", "https://b.test/")]) == 2
+    assert queue.enqueue([("url", "https://a.test/"), ("file", "c.html")]) == 1
+
+    claimed = queue.claim("w1", lease_seconds=0.05, limit=2)
+    assert [task["source"] for task in claimed] == ["https://a.test/", "https://b.test/"]
+
+    # w1 stops renewing; its tasks go to w2 and w1's late result is discarded
+    time.sleep(0.1)
+    taken = queue.claim("w2", lease_seconds=60, limit=3)
+    assert [task["attempts"] for task in taken] == [2, 2, 1]
+    assert not queue.complete(claimed[0]["id"], "w1", {"source": "https://a.test/"})
+    assert queue.complete(taken[0]["id"], "w2", {"source": "https://a.test/", "overall_score": 90})
+    assert queue.complete(taken[2]["id"], "w2", {"source": "c.html", "error": "not found"})
+
+    # A task that keeps losing its worker is failed rather than retried forever
+    assert queue.renew("w2", lease_seconds=0) == 1
+    time.sleep(0.01)
+    assert queue.claim("w3", lease_seconds=60) == []
+    assert queue.stats()["tasks"] == {"queued": 0, "running": 0, "done": 1, "failed": 2}
+    assert [record["source"] for record in queue.results()] == ["https://a.test/", "c.html"]
+    assert queue.requeue_failed() == 2 and queue.pending() == 2
+
+
+def test_workers_renew_leases_and_drain_the_queue(tmp_path):
+    path = str(tmp_path / "queue.db")
+    TaskQueue(path, wal=True).enqueue(("file", f"page{index}.html") for index in range(12))
+
+    def process(task):
+        time.sleep(0.1)  # longer than the lease, which the heartbeat keeps renewing
+        return {"source": task[1]}, 0
+
+    workers = [QueueWorker(TaskQueue(path), process, worker_id=f"w{index}", lease_seconds=0.06,
+                           batch_size=2, poll_interval=0.01) for index in range(3)]
+    threads = [threading.Thread(target=worker.run) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    queue = TaskQueue(path)
+    stats = queue.stats()
+    assert stats["tasks"]["done"] == 12 and stats["results"] == 12
+    assert sum(worker.processed for worker in workers) == 12
+    assert len(stats["workers"]) == 3
+
+
+def test_restarted_worker_does_not_inherit_leases(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"))
+    queue.enqueue([("url", "https://a.test/")])
+    dead = QueueWorker(queue, lambda task: ({"source": task[1]}, 0))
+    task = queue.claim(dead.worker_id, lease_seconds=60)[0]
+
+    # Same host and pid, as after a container restart, but a new identity
+    restarted = QueueWorker(queue, lambda task: ({"source": task[1]}, 0))
+    assert restarted.worker_id != dead.worker_id
+    assert restarted.worker_id.rsplit(":", 1)[0] == dead.worker_id.rsplit(":", 1)[0]
+    assert queue.renew(restarted.worker_id, lease_seconds=60) == 0
+    assert not queue.complete(task["id"], restarted.worker_id, {"source": "https://a.test/"})